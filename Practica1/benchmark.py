@@ -0,0 +1,374 @@
+"""
+benchmark.py
+Last update: 19/10/2026
+
+Program to evaluate and compare the search engines of the course over the same corpus and query set.
+For each engine it reports retrieval quality against relevance judgements (P@k, MAP and nDCG@k) and performance
+(index build time, index size on disk, queries per second and p50/p95/p99 query latency).
+Engines: whoosh_tfidf and whoosh_bm25f (MyIndex/MySearcher), numpy_tfidf and numpy_bm25f (NpIndex/NpSearcher), gensim_tfidf and gensim_okapi (gensim_demo) and word2vec (embeddings).
+The relevance judgements (qrels) are required and can be a file with the query number and document identifier on each line
+(all relevant), a file with a third column with the relevance grade, or a TREC qrels file (query, 0, document, grade).
+They must not come from one of the evaluated engines (salida.txt is the output of whoosh_tfidf).
+It also includes a generator of synthetic corpora that scales the recordsdc collection to any number of documents.
+Usage: python benchmark.py -docs <docs folder> -infoNeeds <query file> -qrels <qrels file> [-engines <engine,engine...>]
+                           [-k <cutoff>] [-repeat <times>] [-work <work folder>] [-output <report file>]
+       python benchmark.py -synthetic <number of documents> -docs <source docs folder> -output <target docs folder>
+"""
+
+import os
+import re
+import sys
+import io
+import json
+import math
+import time
+import random
+import shutil
+import importlib.util
+import contextlib
+import xml.etree.ElementTree as ET
+from xml.sax.saxutils import escape
+import numpy as np
+from index import MyIndex, ns
+from search import MySearcher
+from npindex import NpIndex
+from npsearch import NpSearcher
+
+ENGINES = ['whoosh_tfidf', 'whoosh_bm25f', 'numpy_tfidf', 'numpy_bm25f', 'gensim_tfidf', 'gensim_okapi', 'word2vec']
+ROOT_FOLDER = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+def load_module(name, path):
+    """
+    Carga un módulo de otra carpeta del repositorio con un nombre propio, ya que varios programas se llaman index.py.
+
+    """
+    spec = importlib.util.spec_from_file_location(name, os.path.join(ROOT_FOLDER, path))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+def free_text(query_text):
+    """
+    Convierte una consulta con campos, operadores y rangos (autor:Martínez AND agno:[2005 TO 2010]) en texto libre
+    para los motores que no los soportan.
+
+    """
+    return ' '.join(re.sub(r'\b\w+:|\b(AND|OR|NOT|TO)\b|[()"\[\]{}<>=]', ' ', query_text).split())
+
+def document_identifiers(docs_folder):
+    """
+    Devuelve el identificador (dc:identifier) de cada fichero de la colección, en el orden en que se indexan.
+    Los motores que no guardan campos devuelven números de documento y se traducen con esta lista. Igual que MyIndex,
+    si un fichero tiene varios dc:identifier se unen todos separados por espacios.
+
+    """
+    identifiers = []
+    for file in sorted(os.listdir(docs_folder)):
+        if file.endswith('.xml'):
+            nodes = ET.parse(os.path.join(docs_folder, file)).getroot().findall('dc:identifier', ns)
+            identifiers.append(' '.join(node.text.strip() for node in nodes if node.text) or file)
+        elif file.endswith('.txt'):
+            identifiers.append(file)
+    return identifiers
+
+def folder_size(folder):
+    return sum(os.path.getsize(os.path.join(path, file)) for path, _, files in os.walk(folder) for file in files)
+
+# ------------------------------------------------------------------------------
+# Motores. Todos tienen el mismo interfaz: build crea el índice de la colección y search devuelve la lista ordenada
+# de identificadores de los k primeros documentos de una consulta.
+# ------------------------------------------------------------------------------
+
+class WhooshEngine:
+    def __init__(self, model_type, index_class=MyIndex, searcher_class=MySearcher):
+        self.model_type = model_type
+        self.index_class = index_class
+        self.searcher_class = searcher_class
+
+    def build(self, docs_folder, index_folder):
+        self.index_class(index_folder).index_docs(docs_folder)
+        self.searcher = self.searcher_class(index_folder, self.model_type)
+        return index_folder
+
+    def search(self, query_text, k):
+        with contextlib.redirect_stdout(io.StringIO()): # search muestra el resumen de los resultados
+            results = self.searcher.search(query_text, False, k)
+        return [result.get('identificador') for result in results]
+
+class GensimEngine:
+    def __init__(self, model_type):
+        self.model_type = model_type
+
+    def build(self, docs_folder, index_folder):
+        from gensim import corpora, models, similarities
+        self.index = load_module('gensim_index', 'gensim_demo/index.py')
+        self.index.LANGUAGE = 'spanish'
+        with contextlib.redirect_stdout(io.StringIO()): # create_index muestra el diccionario completo
+            self.index.create_index(index_folder, docs_folder, self.model_type)
+        self.dictionary = corpora.Dictionary.load(self.index.get_dictionary_file_name(index_folder))
+        self.matrix = similarities.SparseMatrixSimilarity.load(self.index.get_index_file_name(index_folder))
+        if self.model_type == 'tfidf':
+            self.model = models.TfidfModel.load(self.index.get_model_file_name(index_folder))
+        else:
+            # Con Okapi BM25 las consultas se representan con sus términos sin ponderar
+            self.model = models.TfidfModel(dictionary=self.dictionary, smartirs='bnn')
+        self.identifiers = document_identifiers(docs_folder)
+        return index_folder
+
+    def search(self, query_text, k):
+        query_bow = self.dictionary.doc2bow(self.index.generate_terms(free_text(query_text)))
+        sims = self.matrix[self.model[query_bow]]
+        top = np.argsort(-sims, kind='stable')[:k]
+        return [self.identifiers[doc] for doc in top if sims[doc] > 0]
+
+class Word2VecEngine:
+    def build(self, docs_folder, index_folder):
+        from gensim import utils
+        self.word2vec = load_module('word2vec_test', 'embeddings/word2vec_test.py')
+        self.utils = utils
+        with contextlib.redirect_stdout(io.StringIO()): # Se muestran las palabras que no están en el modelo
+            self.wv = self.word2vec.load_word_vec_model()
+            vectors = [self.word2vec.generate_vector_from_words(self.wv, self.word2vec.process_text_file(docs_folder, file))
+                       for file in sorted(os.listdir(docs_folder)) if file.endswith(('.xml', '.txt'))]
+        self.doc_vectors = np.nan_to_num(np.array(vectors)) # Documentos sin ninguna palabra del modelo
+        self.identifiers = document_identifiers(docs_folder)
+        # El índice es la matriz de vectores de los documentos, se guarda para medir su tamaño
+        os.makedirs(index_folder, exist_ok=True)
+        np.save(os.path.join(index_folder, 'doc_vectors.npy'), self.doc_vectors)
+        return index_folder
+
+    def search(self, query_text, k):
+        with contextlib.redirect_stdout(io.StringIO()):
+            query_vector = self.word2vec.generate_vector_from_words(self.wv, self.utils.simple_preprocess(free_text(query_text)))
+        if not np.all(np.isfinite(query_vector)):
+            return []
+        sims = self.doc_vectors @ query_vector
+        return [self.identifiers[doc] for doc in np.argsort(-sims, kind='stable')[:k]]
+
+def create_engine(name):
+    if name.startswith('whoosh'):
+        return WhooshEngine('tfidf' if name == 'whoosh_tfidf' else 'bm25f')
+    if name.startswith('numpy'):
+        # Mismo esquema y consultas que Whoosh, con el índice comprimido de NumPy
+        return WhooshEngine('tfidf' if name == 'numpy_tfidf' else 'bm25f', NpIndex, NpSearcher)
+    if name.startswith('gensim'):
+        return GensimEngine(name.split('_')[1])
+    if name == 'word2vec':
+        return Word2VecEngine()
+    raise ValueError(f'Unknown engine: {name}')
+
+# ------------------------------------------------------------------------------
+# Métricas de evaluación.
+# ------------------------------------------------------------------------------
+
+def read_qrels(qrels_file):
+    """
+    Lee los juicios de relevancia: diccionario consulta -> {documento: grado de relevancia}.
+
+    """
+    qrels = {}
+    with open(qrels_file, encoding='utf-8') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 2:
+                query, doc, grade = parts[0], parts[1], 1
+            elif len(parts) == 3:
+                query, doc, grade = parts[0], parts[1], int(parts[2])
+            elif len(parts) == 4:
+                query, doc, grade = parts[0], parts[2], int(parts[3])
+            else:
+                continue
+            if grade > 0:
+                qrels.setdefault(query, {})[doc] = grade
+    return qrels
+
+def precision_at_k(ranking, relevant, k):
+    return sum(1 for doc in ranking[:k] if doc in relevant) / k
+
+def average_precision(ranking, relevant):
+    hits, total = 0, 0.0
+    for position, doc in enumerate(ranking, start=1):
+        if doc in relevant:
+            hits += 1
+            total += hits / position
+    return total / len(relevant) if relevant else 0.0
+
+def ndcg_at_k(ranking, relevant, k):
+    dcg = sum((2 ** relevant.get(doc, 0) - 1) / math.log2(position + 1) for position, doc in enumerate(ranking[:k], start=1))
+    ideal = sorted(relevant.values(), reverse=True)[:k]
+    idcg = sum((2 ** grade - 1) / math.log2(position + 1) for position, grade in enumerate(ideal, start=1))
+    return dcg / idcg if idcg else 0.0
+
+def evaluate(rankings, qrels, k):
+    """
+    Calcula P@k, MAP y nDCG@k medios sobre las consultas que tienen juicios de relevancia.
+
+    """
+    queries = [query for query in rankings if qrels.get(query)]
+    if not queries:
+        return {f'P@{k}': None, 'MAP': None, f'nDCG@{k}': None}
+    return {f'P@{k}': float(np.mean([precision_at_k(rankings[query], qrels[query], k) for query in queries])),
+            'MAP': float(np.mean([average_precision(rankings[query], qrels[query]) for query in queries])),
+            f'nDCG@{k}': float(np.mean([ndcg_at_k(rankings[query], qrels[query], k) for query in queries]))}
+
+# ------------------------------------------------------------------------------
+# Ejecución de la comparativa.
+# ------------------------------------------------------------------------------
+
+def benchmark(engine_name, docs_folder, queries, qrels, k=10, repeat=5, work_folder='../benchmark'):
+    """
+    Crea el índice de un motor y mide su calidad y rendimiento con las consultas indicadas.
+    La evaluación usa los 100 primeros resultados de cada consulta (igual que salida.txt); la latencia se mide
+    repitiendo repeat veces todas las consultas después de una primera pasada de calentamiento.
+
+    """
+    engine = create_engine(engine_name)
+    index_folder = os.path.join(work_folder, engine_name)
+    shutil.rmtree(index_folder, ignore_errors=True)
+    os.makedirs(work_folder, exist_ok=True)
+    start = time.perf_counter()
+    engine.build(docs_folder, index_folder)
+    build_seconds = time.perf_counter() - start
+
+    rankings = {str(qnum): engine.search(query, 100) for qnum, query in enumerate(queries, start=1)}
+    latencies = []
+    for _ in range(repeat):
+        for query in queries:
+            start = time.perf_counter()
+            engine.search(query, k)
+            latencies.append(time.perf_counter() - start)
+    latencies = np.array(latencies) * 1000
+    report = {'engine': engine_name, 'buildSeconds': build_seconds, 'indexBytes': folder_size(index_folder),
+              'qps': len(latencies) / (latencies.sum() / 1000) if len(latencies) else None,
+              'p50Ms': float(np.percentile(latencies, 50)), 'p95Ms': float(np.percentile(latencies, 95)),
+              'p99Ms': float(np.percentile(latencies, 99))}
+    report.update(evaluate(rankings, qrels, k))
+    return report
+
+def print_report(reports, k):
+    columns = ['engine', f'P@{k}', 'MAP', f'nDCG@{k}', 'buildSeconds', 'indexBytes', 'qps', 'p50Ms', 'p95Ms', 'p99Ms']
+    print(' '.join(f'{column:>14}' for column in columns))
+    for report in reports:
+        if 'error' in report:
+            print(f"{report['engine']:>14} {report['error']}")
+            continue
+        values = [report[column] for column in columns]
+        print(' '.join(f'{value:>14.4f}' if isinstance(value, float) else f'{str(value):>14}' for value in values))
+
+# ------------------------------------------------------------------------------
+# Generador de colecciones sintéticas.
+# ------------------------------------------------------------------------------
+
+FIELDS = ['contributor', 'creator', 'date', 'description', 'identifier', 'language', 'publisher', 'subject', 'title', 'type']
+GENERATED_TEXT_FIELDS = ['title', 'description'] # Campos cuyo texto se genera palabra a palabra
+
+def generate_synthetic_corpus(source_folder, target_folder, n_docs, sample=5000, seed=0):
+    """
+    Genera n_docs registros Dublin Core a partir de una muestra de los registros de source_folder.
+    Los campos cortos (autor, departamento, materias, fecha...) toman los valores de un registro de la muestra elegido al azar
+    en cada campo, conservando cuántos valores tiene cada campo. El título y la descripción se generan con palabras
+    elegidas según su frecuencia en la muestra y con la longitud de un texto de la muestra, por lo que el vocabulario
+    y las listas de postings crecen con la colección como en una colección real. Los ficheros se escriben uno a uno,
+    la memoria necesaria no depende de n_docs.
+
+    """
+    rng = random.Random(seed)
+    files = sorted(file for file in os.listdir(source_folder) if file.endswith('.xml'))
+    values = {field: [] for field in FIELDS}
+    for file in rng.sample(files, min(sample, len(files))):
+        root = ET.parse(os.path.join(source_folder, file)).getroot()
+        for field in FIELDS:
+            values[field].append([node.text.strip() for node in root.findall('dc:' + field, ns) if node.text and node.text.strip()])
+    vocabularies = {}
+    for field in GENERATED_TEXT_FIELDS:
+        words = [word for texts in values[field] for text in texts for word in text.split()]
+        vocabulary, counts = np.unique(words, return_counts=True)
+        lengths = [len(' '.join(texts).split()) for texts in values[field]]
+        vocabularies[field] = (list(vocabulary), list(np.cumsum(counts)), lengths)
+
+    os.makedirs(target_folder, exist_ok=True)
+    for doc in range(n_docs):
+        fields = []
+        for field in FIELDS:
+            if field == 'identifier':
+                texts = [f'http://example.org/synthetic/{doc}']
+            elif field in GENERATED_TEXT_FIELDS:
+                vocabulary, cumulative, lengths = vocabularies[field]
+                length = rng.choice(lengths)
+                texts = [' '.join(rng.choices(vocabulary, cum_weights=cumulative, k=length))] if length else []
+            else:
+                texts = rng.choice(values[field])
+            fields.extend(f'    <dc:{field}>{escape(text)}</dc:{field}>\n' for text in texts)
+        with open(os.path.join(target_folder, f'synthetic_{doc:08d}.xml'), 'w', encoding='utf-8') as f:
+            f.write('<?xml version="1.0" encoding="UTF-8"?><oai_dc:dc xmlns:dc="http://purl.org/dc/elements/1.1/" '
+                    'xmlns:oai_dc="http://www.openarchives.org/OAI/2.0/oai_dc/">\n' + ''.join(fields) + '</oai_dc:dc>\n')
+
+
+if __name__ == '__main__':
+    docs_folder = '../recordsdc'
+    infoNeeds = 'querys.txt'
+    qrels_file = None
+    engines = ENGINES
+    k = 10
+    repeat = 5
+    work_folder = '../benchmark'
+    output = None
+    synthetic = None
+
+    # Parse arguments
+    i = 1
+    while i < len(sys.argv):
+        if sys.argv[i] == '-docs':
+            docs_folder = sys.argv[i + 1]
+            i += 1
+        elif sys.argv[i] == '-infoNeeds':
+            infoNeeds = sys.argv[i + 1]
+            i += 1
+        elif sys.argv[i] == '-qrels':
+            qrels_file = sys.argv[i + 1]
+            i += 1
+        elif sys.argv[i] == '-engines':
+            engines = sys.argv[i + 1].split(',')
+            i += 1
+        elif sys.argv[i] == '-k':
+            k = int(sys.argv[i + 1])
+            i += 1
+        elif sys.argv[i] == '-repeat':
+            repeat = int(sys.argv[i + 1])
+            i += 1
+        elif sys.argv[i] == '-work':
+            work_folder = sys.argv[i + 1]
+            i += 1
+        elif sys.argv[i] == '-output':
+            output = sys.argv[i + 1]
+            i += 1
+        elif sys.argv[i] == '-synthetic':
+            synthetic = int(sys.argv[i + 1])
+            i += 1
+        i += 1
+
+    # Generación de una colección sintética
+    if synthetic:
+        generate_synthetic_corpus(docs_folder, output, synthetic)
+        sys.exit(0)
+
+    # Los juicios de relevancia no tienen valor por defecto: salida.txt son los resultados de whoosh_tfidf
+    if qrels_file is None:
+        sys.exit('Usage: python benchmark.py -docs <docs folder> -infoNeeds <query file> -qrels <qrels file> ...')
+    with open(infoNeeds, encoding='utf-8') as qf:
+        queries = [line.strip() for line in qf if line.strip()]
+    qrels = read_qrels(qrels_file)
+
+    reports = []
+    for engine_name in engines:
+        try:
+            reports.append(benchmark(engine_name, docs_folder, queries, qrels, k, repeat, work_folder))
+        except ImportError as e:
+            # Los motores cuyas librerías no están instaladas se indican en el informe y no detienen la comparativa
+            reports.append({'engine': engine_name, 'error': f'skipped ({e})'})
+    print_report(reports, k)
+
+    # El informe en JSON permite comparar ejecuciones y detectar pérdidas de rendimiento
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump({'docs': docs_folder, 'queries': infoNeeds, 'qrels': qrels_file, 'k': k, 'reports': reports}, f, indent=2)
@@ -0,0 +1,116 @@
+"""
+facets.py
+Last update: 19/10/2026
+
+Columnar facet values of the documents of an index, for counting the results of a query by departamento, materia and agno.
+At index time FacetWriter stores, for every facet field, the list of distinct values and, for every document, the codes
+of its values (a document can have several materias). At search time FacetColumns counts the values of all the documents
+that match a query with a single bincount, without reading the stored fields of the documents.
+The files are written in the index folder, next to the Whoosh or NumPy index, and are memory-mapped when searching.
+Usage: python index.py -index <index folder> -docs <docs folder> (the facets are always written)
+       python search.py -index <index folder> -facets
+"""
+
+import os
+import json
+import numpy as np
+
+FACET_FIELDS = ['departamento', 'materia', 'agno']
+FACET_LIMIT = 10 # Valores más frecuentes que se devuelven de cada faceta
+
+class FacetWriter:
+    """
+    Acumula los valores de las facetas de cada documento, en el mismo orden en que se añaden al índice, y al confirmar
+    (commit) escribe las columnas.
+
+    """
+    def __init__(self, index_folder, fields=FACET_FIELDS):
+        self.index_folder = index_folder
+        self.fields = fields
+        self.codes = {field: {} for field in fields} # valor -> código
+        self.documents = {field: [] for field in fields} # códigos de los valores de cada documento
+
+    def add_document(self, **values):
+        """
+        Añade los valores de un documento. Cada campo puede ser un valor, una lista de valores o None (sin valor).
+        Se debe llamar una vez por cada documento del índice, aunque no tenga ningún valor.
+
+        """
+        for field in self.fields:
+            value = values.get(field)
+            value = [] if value is None or value == '' else value if isinstance(value, list) else [value]
+            codes = self.codes[field]
+            self.documents[field].append([codes.setdefault(v, len(codes)) for v in dict.fromkeys(value)])
+
+    def commit(self, order=None):
+        """
+        Escribe las columnas. Si el índice ha fusionado segmentos, sus números de documento ya no siguen el orden en que
+        se añadieron: order indica, para cada número de documento del índice, qué documento añadido es.
+
+        """
+        for field in self.fields:
+            documents = self.documents[field]
+            if order is not None:
+                documents = [documents[i] for i in order]
+            offsets = np.zeros(len(documents) + 1, dtype=np.int64)
+            np.cumsum([len(codes) for codes in documents], out=offsets[1:])
+            codes = np.fromiter((code for codes in documents for code in codes), dtype=np.int32, count=offsets[-1])
+            np.save(os.path.join(self.index_folder, f'facet_{field}_offsets.npy'), offsets)
+            np.save(os.path.join(self.index_folder, f'facet_{field}_codes.npy'), codes)
+        with open(os.path.join(self.index_folder, 'facets.json'), 'w', encoding='utf-8') as f:
+            json.dump({field: list(self.codes[field]) for field in self.fields}, f, ensure_ascii=False)
+
+class FacetColumns:
+    """
+    Columnas de facetas de un índice, proyectadas en memoria (mmap).
+
+    """
+    def __init__(self, index_folder):
+        with open(os.path.join(index_folder, 'facets.json'), encoding='utf-8') as f:
+            self.values = json.load(f)
+        self.offsets = {}
+        self.codes = {}
+        for field in self.values:
+            self.offsets[field] = np.load(os.path.join(index_folder, f'facet_{field}_offsets.npy'), mmap_mode='r')
+            self.codes[field] = np.load(os.path.join(index_folder, f'facet_{field}_codes.npy'), mmap_mode='r')
+
+    @staticmethod
+    def exists(index_folder):
+        return os.path.exists(os.path.join(index_folder, 'facets.json'))
+
+    def field_codes(self, field, docs):
+        """Códigos de los valores de los documentos docs, todos seguidos."""
+        offsets = self.offsets[field]
+        starts = offsets[docs]
+        counts = offsets[docs + 1] - starts
+        if (counts == 1).all(): # Un valor por documento: no hace falta expandir
+            return self.codes[field][starts]
+        # Posición de cada código: el inicio de su documento más su posición dentro del documento
+        first = np.cumsum(counts) - counts
+        return self.codes[field][np.repeat(starts - first, counts) + np.arange(counts.sum())]
+
+    def save(self, index_folder, docs):
+        """Escribe en otra carpeta las columnas de los documentos docs, en ese orden (para una copia del índice)."""
+        docs = np.asarray(docs, dtype=np.int64)
+        for field in self.values:
+            offsets = self.offsets[field]
+            new_offsets = np.zeros(len(docs) + 1, dtype=np.int64)
+            np.cumsum(offsets[docs + 1] - offsets[docs], out=new_offsets[1:])
+            np.save(os.path.join(index_folder, f'facet_{field}_offsets.npy'), new_offsets)
+            np.save(os.path.join(index_folder, f'facet_{field}_codes.npy'), np.asarray(self.field_codes(field, docs)))
+        with open(os.path.join(index_folder, 'facets.json'), 'w', encoding='utf-8') as f:
+            json.dump(self.values, f, ensure_ascii=False)
+
+    def count(self, docs, limit=FACET_LIMIT):
+        """
+        Cuenta los valores de cada faceta en los documentos docs (array de números de documento). Devuelve, para cada
+        campo, la lista de pares (valor, número de documentos) de los limit valores más frecuentes.
+
+        """
+        docs = np.asarray(docs, dtype=np.int64)
+        facets = {}
+        for field, values in self.values.items():
+            counts = np.bincount(self.field_codes(field, docs), minlength=len(values))
+            top = np.argsort(-counts, kind='stable')[:limit]
+            facets[field] = [(values[code], int(counts[code])) for code in top if counts[code]]
+        return facets
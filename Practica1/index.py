@@ -5,17 +5,24 @@ Last update: 23/09/2025
 
 Simple program to create an inverted index with the contents of text/xml files contained in a docs folder
 This program is based on the whoosh library. See https://pypi.org/project/Whoosh/ .
-Usage: python index.py -index <index folder> -docs <docs folder>
+Usage: python index.py -index <index folder> -docs <docs folder> [-engine <whoosh|numpy>]
+                       [-profile] [-profileOutput <JSON lines report file>] [-cprofile <cProfile stats file>]
+                       [-merge <small|tiered|capped|none|bulk>] [-batch <documents per commit>]
+       python index.py -index <index folder> -freeze <snapshot folder>
 """
 
 from whoosh.index import create_in
 from whoosh.fields import *
 from whoosh.analysis import *
 import os
+import re
 import sys
 import xml.etree.ElementTree as ET
 from datetime import datetime
 from nltk.stem.snowball import SnowballStemmer
+from facets import FacetWriter, FacetColumns
+from profiling import BuildProfiler, NULL_PROFILER
+from merging import merge_type, freeze
 
 ns = {'dc': 'http://purl.org/dc/elements/1.1/'}
 
@@ -30,34 +37,83 @@ class SnowballStemFilter(Filter):
             token.text = stemmer.stem(token.text)
             yield token
 
+def create_schema():
+    # Se define un analizador personalizado que incluye el filtro de stemming Snowball en español 
+    analizador = RegexTokenizer() | LowercaseFilter() | StopFilter() | SnowballStemFilter()
+    # Definición del esquema del índice con los campos a indexar.
+    # El año se indexa como número con codificación trie (cada valor se indexa también sin sus 4, 8 y 12 bits de menor
+    # peso), así un rango de años se resuelve con unos pocos términos. Se deja con signo porque con signed=False Whoosh
+    # resuelve mal los rangos abiertos (agno:[TO 2006])
+    return Schema(path=ID(stored=True), modified=STORED, autor=TEXT(analyzer=analizador), director=TEXT(analyzer=analizador),
+                  departamento=TEXT(analyzer=analizador), titulo=TEXT(analyzer=analizador), materia=TEXT(analyzer=analizador),
+                  descripcion=TEXT(analyzer=analizador), agno=NUMERIC(int, bits=16, shift_step=4), identificador=ID(stored=True))
+
 class MyIndex:
-    def __init__(self,index_folder):
-        # Se define un analizador personalizado que incluye el filtro de stemming Snowball en español 
-        analizador = RegexTokenizer() | LowercaseFilter() | StopFilter() | SnowballStemFilter()
-        # Definición del esquema del índice con los campos a indexar
-        schema = Schema(path=ID(stored=True), modified=STORED, autor=TEXT(analyzer=analizador), director=TEXT(analyzer=analizador),
-                        departamento=TEXT(analyzer=analizador), titulo=TEXT(analyzer=analizador), materia=TEXT(analyzer=analizador),
-                        descripcion=TEXT(analyzer=analizador), agno=TEXT(analyzer=analizador), identificador=ID(stored=True))
+    def __init__(self,index_folder, profiler=None, merge_policy='small', batch_size=None):
+        schema = create_schema()
         create_folder(index_folder)
-        index = create_in(index_folder, schema)
-        self.writer = index.writer()
+        self.index = create_in(index_folder, schema)
+        self.writer = self.index.writer()
+        self.facets = FacetWriter(index_folder)
+        # Con profiler (BuildProfiler de profiling.py) se mide el tiempo de cada etapa de la construcción del índice
+        self.profiler = profiler or NULL_PROFILER
+        # Con batch_size se confirma cada batch_size documentos, y cada commit fusiona segmentos con merge_policy (merging.py)
+        self.merge_policy = merge_policy
+        self.batch_size = batch_size
 
     def index_docs(self,docs_folder):
+        files = []
         if (os.path.exists(docs_folder)):
-            for file in sorted(os.listdir(docs_folder)):
-                if file.endswith('.xml'):
-                    self.index_xml_doc(docs_folder, file)
-                elif file.endswith('.txt'):
-                    self.index_txt_doc(docs_folder, file)
-        self.writer.commit()
+            files = [file for file in sorted(os.listdir(docs_folder)) if file.endswith(('.xml', '.txt'))]
+        batch_size = self.batch_size or len(files) or 1
+        for start in range(0, max(len(files), 1), batch_size):
+            if start:
+                self.writer = self.index.writer()
+            with self.profiler.analysis(self.writer.schema):
+                for file in files[start:start + batch_size]:
+                    if file.endswith('.xml'):
+                        self.index_xml_doc(docs_folder, file)
+                    else:
+                        self.index_txt_doc(docs_folder, file)
+            with self.profiler.stage('commit'):
+                self.commit(files, final=start + batch_size >= len(files))
+        self.profiler.finish()
+
+    def commit(self, files, final=True):
+        """
+        Confirma los documentos añadidos con la política de fusión. En el último commit se escriben las facetas: si ha
+        habido varios commits, las fusiones han cambiado el orden de los documentos y se busca cada uno por su path.
+
+        """
+        self.writer.commit(mergetype=merge_type(self.merge_policy, final))
+        if final:
+            order = None
+            if self.batch_size:
+                position = {file: i for i, file in enumerate(files)}
+                with self.index.reader() as reader:
+                    order = [position[fields['path']] for _, fields in reader.iter_docs()]
+            self.facets.commit(order)
 
     def index_txt_doc(self, foldername,filename):
         file_path = os.path.join(foldername, filename)
-        with open(file_path, encoding="utf-8") as fp:
-            text = ' '.join(line for line in fp if line)
-        mod_time = os.path.getmtime(file_path)
+        with self.profiler.stage('read'):
+            with open(file_path, encoding="utf-8") as fp:
+                text = ' '.join(line for line in fp if line)
+            mod_time = os.path.getmtime(file_path)
+        self.profiler.add_document(len(text.encode('utf-8')))
         mod_date = datetime.fromtimestamp(mod_time).isoformat()
-        self.writer.add_document(path=filename, content=text, modified=mod_date)
+        with self.profiler.stage('write'):
+            self.writer.add_document(path=filename, content=text, modified=mod_date)
+            self.facets.add_document()
+
+    def extraer_valores(self, root, etiqueta):
+        """
+        Extrae el texto de cada uno de los nodos que coinciden con la etiqueta dada
+        en el árbol XML representado por root.
+
+        """
+        nodos = root.findall(etiqueta, ns)
+        return [nodo.text.strip() for nodo in nodos if nodo.text]
 
     def extraer_texto(self, root, etiqueta):
         """
@@ -65,8 +121,16 @@ class MyIndex:
         en el árbol XML representado por root.
 
         """
-        nodos = root.findall(etiqueta, ns)
-        return ' '.join(nodo.text.strip() for nodo in nodos if nodo.text)
+        return ' '.join(self.extraer_valores(root, etiqueta))
+
+    def extraer_agno(self, root):
+        """
+        Extrae el año de la fecha del documento (dc:date) como número: el primer grupo de cuatro cifras, de forma que
+        sirven tanto '2009' como '2009-06-15'. Devuelve None si el documento no tiene fecha.
+
+        """
+        agno = re.search(r'(?<!\d)\d{4}(?!\d)', self.extraer_texto(root, 'dc:date'))
+        return int(agno.group()) if agno else None
     
     def index_xml_doc(self, foldername, filename):
         """
@@ -74,27 +138,43 @@ class MyIndex:
 
         """
         file_path = os.path.join(foldername, filename)
-        tree = ET.parse(file_path)
-        root = tree.getroot()
-
-        texto_autor = self.extraer_texto(root, 'dc:creator')
-        texto_director = self.extraer_texto(root, 'dc:contributor')
-        texto_departamento = self.extraer_texto(root, 'dc:publisher')
-        texto_titulo = self.extraer_texto(root, 'dc:title')
-        texto_subject = self.extraer_texto(root, 'dc:subject')
-        texto_descripcion = self.extraer_texto(root, 'dc:description')
-        texto_agno = self.extraer_texto(root, 'dc:date')
-        texto_identificador = self.extraer_texto(root, 'dc:identifier')
-        mod_time = os.path.getmtime(file_path)
-        mod_date = datetime.fromtimestamp(mod_time).isoformat()
-        # Añadir el documento al índice con los campos extraídos
-        self.writer.add_document(path=filename, modified=mod_date, autor=texto_autor, director=texto_director, departamento=texto_departamento,
-                                titulo=texto_titulo, materia=texto_subject, descripcion=texto_descripcion, agno=texto_agno, identificador=texto_identificador)
+        with self.profiler.stage('read'):
+            with open(file_path, 'rb') as fp:
+                data = fp.read()
+            mod_time = os.path.getmtime(file_path)
+        self.profiler.add_document(len(data))
+        with self.profiler.stage('parse'):
+            root = ET.fromstring(data)
+
+        with self.profiler.stage('extract'):
+            texto_autor = self.extraer_texto(root, 'dc:creator')
+            texto_director = self.extraer_texto(root, 'dc:contributor')
+            texto_departamento = self.extraer_texto(root, 'dc:publisher')
+            texto_titulo = self.extraer_texto(root, 'dc:title')
+            materias = self.extraer_valores(root, 'dc:subject')
+            texto_subject = ' '.join(materias)
+            texto_descripcion = self.extraer_texto(root, 'dc:description')
+            agno = self.extraer_agno(root)
+            texto_identificador = self.extraer_texto(root, 'dc:identifier')
+            mod_date = datetime.fromtimestamp(mod_time).isoformat()
+        with self.profiler.stage('write'):
+            # Añadir el documento al índice con los campos extraídos
+            self.writer.add_document(path=filename, modified=mod_date, autor=texto_autor, director=texto_director, departamento=texto_departamento,
+                                    titulo=texto_titulo, materia=texto_subject, descripcion=texto_descripcion, agno=agno, identificador=texto_identificador)
+            # Valores de las facetas del documento, para contar los resultados por departamento, materia y año
+            self.facets.add_document(departamento=texto_departamento, materia=materias, agno=agno)
 
 if __name__ == '__main__':
 
     index_folder = '../whooshindex'
     docs_folder = '../docs'
+    engine = 'whoosh'
+    profile = False
+    profile_output = None
+    cprofile = None
+    merge_policy = 'small'
+    batch_size = None
+    freeze_folder = None
     i = 1
     while i < len(sys.argv):
         if sys.argv[i] == '-index':
@@ -103,7 +183,56 @@ if __name__ == '__main__':
         elif sys.argv[i] == '-docs':
             docs_folder = sys.argv[i + 1]
             i = i + 1
+        elif sys.argv[i] == '-engine':
+            engine = sys.argv[i + 1]
+            i = i + 1
+        elif sys.argv[i] == '-profile':
+            profile = True
+        elif sys.argv[i] == '-profileOutput':
+            profile = True
+            profile_output = sys.argv[i + 1]
+            i = i + 1
+        elif sys.argv[i] == '-cprofile':
+            cprofile = sys.argv[i + 1]
+            i = i + 1
+        elif sys.argv[i] == '-merge':
+            merge_policy = sys.argv[i + 1]
+            i = i + 1
+        elif sys.argv[i] == '-batch':
+            batch_size = int(sys.argv[i + 1])
+            i = i + 1
+        elif sys.argv[i] == '-freeze':
+            freeze_folder = sys.argv[i + 1]
+            i = i + 1
         i = i + 1
 
-    my_index = MyIndex(index_folder)
-    my_index.index_docs(docs_folder)
+    if freeze_folder:
+        # Copia de solo lectura del índice con un único segmento, con las facetas en el orden de sus documentos
+        docs = freeze(index_folder, freeze_folder)
+        if FacetColumns.exists(index_folder):
+            FacetColumns(index_folder).save(freeze_folder, docs)
+        sys.exit(0)
+
+    profiler = BuildProfiler() if profile else None
+    if engine == 'numpy':
+        # Índice comprimido de NumPy (npindex.py), con el mismo esquema y la misma extracción de campos
+        from npindex import NpIndex
+        my_index = NpIndex(index_folder, profiler)
+    else:
+        my_index = MyIndex(index_folder, profiler, merge_policy, batch_size)
+
+    if cprofile:
+        # Perfil de todas las funciones, para verlo con pstats o snakeviz
+        import cProfile
+        cprofiler = cProfile.Profile()
+        cprofiler.enable()
+        my_index.index_docs(docs_folder)
+        cprofiler.disable()
+        cprofiler.dump_stats(cprofile)
+    else:
+        my_index.index_docs(docs_folder)
+
+    if profiler is not None:
+        profiler.print_report()
+        if profile_output:
+            profiler.append_report(profile_output, index=index_folder, docs=docs_folder, engine=engine)
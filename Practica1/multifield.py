@@ -0,0 +1,201 @@
+"""
+multifield.py
+Last update: 19/10/2026
+
+Multi-field queries with field-weighted BM25F scoring for MySearcher and NpSearcher.
+BM25FParser parses the words without a field prefix against all the text fields of the schema (Whoosh MultifieldPlugin),
+and collapses the query of each word in all the fields into a single MultiFieldTerm. A MultiFieldTerm is scored with
+BM25F: the frequency of the word in each field is normalized by the field length and multiplied by the field weight, the
+weighted frequencies of all the fields are added, and the saturation and the idf (computed over the documents that contain
+the word in any field) are applied once per document, instead of scoring the word once per field and adding the scores.
+The field weights can be tuned against relevance judgements with tune.py.
+Words with a field prefix (autor:Martínez) are scored as usual.
+Usage: python search.py -index <index folder> -multifield | -weights <field weights file, from tune.py>
+"""
+
+import weakref
+from collections import OrderedDict
+import numpy as np
+from whoosh.qparser import QueryParser, MultifieldPlugin, OrGroup, GtLtPlugin
+from whoosh import query as whoosh_query
+from whoosh.matching import ListMatcher, NullMatcher
+
+# Peso de cada campo de texto en BM25F
+FIELD_WEIGHTS = {'titulo': 2.0, 'materia': 1.5, 'descripcion': 1.0, 'autor': 1.0, 'director': 0.5, 'departamento': 0.5}
+FIELD_B = {} # Normalización por la longitud de cada campo, si es distinta de B
+B = 0.75 # Mismos parámetros por defecto que BM25F de Whoosh
+K1 = 1.2
+POSTINGS_CACHE_SIZE = 4096 # Listas de postings leídas que se guardan por segmento (segment_postings)
+SEGMENT_POSTINGS = weakref.WeakKeyDictionary() # Postings leídas de cada segmento abierto
+
+def field_b(field):
+    return FIELD_B.get(field, B)
+
+def segment_postings(segment_reader, field, text):
+    """
+    Documentos de un término del campo en un segmento, la frecuencia del término en cada uno y la longitud del campo en
+    cada uno (la longitud aproximada en un byte que usa el BM25F de Whoosh), como arrays.
+    Whoosh solo da las postings de una en una, así que se leen una vez y se guardan las de los POSTINGS_CACHE_SIZE
+    términos usados más recientemente en cada segmento; las consultas siguientes con el término se calculan con NumPy.
+
+    """
+    cache = SEGMENT_POSTINGS.setdefault(segment_reader, OrderedDict())
+    key = (field, text)
+    if key in cache:
+        cache.move_to_end(key)
+        return cache[key]
+    docs, frequencies = [], []
+    if (field, text) in segment_reader:
+        matcher = segment_reader.postings(field, text)
+        is_active, doc, frequency, next_posting = matcher.is_active, matcher.id, matcher.weight, matcher.next
+        while is_active():
+            docs.append(doc())
+            frequencies.append(frequency())
+            next_posting()
+    doc_field_length = segment_reader.doc_field_length
+    lengths = [doc_field_length(docnum, field, 0) or 0 for docnum in docs]
+    cache[key] = postings = (np.array(docs, dtype=np.int64), np.array(frequencies, dtype=np.float64),
+                             np.array(lengths, dtype=np.float64))
+    if len(cache) > POSTINGS_CACHE_SIZE:
+        cache.popitem(last=False)
+    return postings
+
+def bm25f_scores(doc_count, postings, boost=1.0, k1=K1):
+    """
+    Puntuación BM25F de una palabra. postings tiene, por cada campo, sus documentos (ordenados), la frecuencia de la
+    palabra en cada uno, la longitud del campo en cada uno, la longitud media del campo y el peso del campo.
+    Devuelve los documentos con la palabra en algún campo y su puntuación.
+
+    """
+    postings = [posting for posting in postings if len(posting[0])]
+    if not postings:
+        return np.empty(0, dtype=np.int64), np.empty(0)
+    docs, inverse = np.unique(np.concatenate([docs for docs, _, _, _, _, _ in postings]), return_inverse=True)
+    # Frecuencia de la palabra en cada campo normalizada por su longitud y multiplicada por el peso del campo
+    weighted = np.concatenate([weight * frequencies / ((1 - b) + b * lengths / avg_length)
+                               for _, frequencies, lengths, avg_length, weight, b in postings])
+    frequency = np.bincount(inverse, weights=weighted, minlength=len(docs))
+    idf = np.log(doc_count / (len(docs) + 1)) + 1
+    return docs, idf * frequency * (k1 + 1) / (frequency + k1) * boost
+
+class MultiFieldTerm(whoosh_query.Query):
+    """
+    Palabra buscada a la vez en varios campos, con el peso de cada campo, y puntuada con BM25F.
+
+    """
+    def __init__(self, text, weights, boost=1.0):
+        self.text = text
+        self.weights = weights
+        self.boost = boost
+
+    def __repr__(self):
+        return f'{self.__class__.__name__}({self.text!r}, {self.weights!r}, boost={self.boost})'
+
+    def __unicode__(self):
+        return '(' + ' OR '.join(f'{field}:{self.text}^{weight}' for field, weight in self.weights.items()) + ')'
+
+    __str__ = __unicode__
+
+    def __eq__(self, other):
+        return (other and self.__class__ is other.__class__ and self.text == other.text
+                and self.weights == other.weights and self.boost == other.boost)
+
+    def __hash__(self):
+        return hash((self.__class__.__name__, self.text, tuple(sorted(self.weights.items())), self.boost))
+
+    def is_leaf(self):
+        return True
+
+    def field(self):
+        return None
+
+    def has_terms(self):
+        return True
+
+    def terms(self, phrases=False):
+        for field in self.weights:
+            yield field, self.text
+
+    def estimate_size(self, ixreader):
+        return sum(ixreader.doc_frequency(field, self.text) for field in self.weights)
+
+    def scores(self, searcher):
+        """Documentos (números globales del índice) y puntuaciones BM25F, calculados una vez para todos los segmentos."""
+        postings = []
+        for field, weight in self.weights.items():
+            docs, frequencies, lengths = [], [], []
+            for segment_reader, offset in searcher.reader().leaf_readers():
+                segment_docs, segment_frequencies, segment_lengths = segment_postings(segment_reader, field, self.text)
+                docs.append(segment_docs + offset)
+                frequencies.append(segment_frequencies)
+                lengths.append(segment_lengths)
+            if docs:
+                postings.append((np.concatenate(docs), np.concatenate(frequencies), np.concatenate(lengths),
+                                 searcher.avg_field_length(field) or 1, weight, field_b(field)))
+        return bm25f_scores(searcher.doc_count_all(), postings, self.boost)
+
+    def matcher(self, searcher, context=None):
+        # La puntuación se calcula sobre todo el índice (el buscador padre) y cada segmento recibe sus documentos
+        parent = searcher.get_parent()
+        if getattr(self, '_scores', (None,))[0] is not parent:
+            self._scores = (parent,) + self.scores(parent)
+        _, docs, scores = self._scores
+        offset = 0
+        if parent is not searcher:
+            offset = next(offset for subsearcher, offset in parent.subsearchers if subsearcher is searcher)
+        segment = (docs >= offset) & (docs < offset + searcher.doc_count_all())
+        if not segment.any():
+            return NullMatcher()
+        return ScoreMatcher((docs[segment] - offset).tolist(), scores[segment].tolist(), scores[segment].max())
+
+class ScoreMatcher(ListMatcher):
+    """
+    ListMatcher con las puntuaciones ya calculadas. ListMatcher calcula la puntuación máxima recorriendo todas las
+    puntuaciones cada vez que el colector la pide para descartar el matcher; aquí se calcula una vez.
+
+    """
+    def __init__(self, ids, scores, max_score, position=0):
+        super().__init__(ids, scores, position=position)
+        self._max_score = max_score
+
+    def copy(self):
+        return self.__class__(self._ids, self._weights, self._max_score, self._i)
+
+    def block_max_weight(self):
+        return self._max_score
+
+def collapse_fields(q, weights):
+    """
+    Sustituye en la consulta cada grupo de términos de la misma palabra en los campos con peso (los que crea
+    MultifieldPlugin para las palabras sin campo) por un MultiFieldTerm.
+
+    """
+    if isinstance(q, whoosh_query.Or) and len(q.subqueries) > 1 and all(
+            isinstance(sub, whoosh_query.Term) and sub.fieldname in weights for sub in q.subqueries):
+        texts = {sub.text for sub in q.subqueries}
+        fields = [sub.fieldname for sub in q.subqueries]
+        if len(texts) == 1 and len(set(fields)) == len(fields):
+            first = q.subqueries[0]
+            return MultiFieldTerm(first.text, {sub.fieldname: weights[sub.fieldname] for sub in q.subqueries},
+                                  boost=first.boost / weights[first.fieldname] * q.boost)
+    if q.is_leaf():
+        return q
+    return q.apply(lambda sub: collapse_fields(sub, weights))
+
+class BM25FParser(QueryParser):
+    """
+    Analizador de consultas que busca las palabras sin campo en todos los campos con peso, puntuadas con BM25F.
+    Los campos con peso 0 no se usan.
+
+    """
+    def __init__(self, schema, weights=FIELD_WEIGHTS):
+        weights = {field: weight for field, weight in weights.items() if weight > 0}
+        super().__init__(None, schema, group=OrGroup)
+        self.add_plugin(MultifieldPlugin(list(weights), fieldboosts=weights))
+        self.weights = weights
+        self.add_plugin(GtLtPlugin())
+
+    def parse(self, text, normalize=True, debug=False):
+        # Se agrupan los términos antes de normalizar, porque al normalizar se mezclan los de todas las palabras
+        q = collapse_fields(super().parse(text, normalize=False, debug=debug), self.weights)
+        return q.normalize() if normalize else q
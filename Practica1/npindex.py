@@ -0,0 +1,253 @@
+"""
+npindex.py
+Last update: 19/10/2026
+
+Program to create a compressed inverted index with the contents of the xml files contained in a docs folder.
+It is an alternative to the Whoosh index of index.py with the same interface (MyIndex) and the same schema and analyzers,
+but the index is stored in NumPy arrays: a sorted term dictionary that can be memory-mapped, posting lists of document
+gaps and frequencies compressed with variable-byte encoding, an array with the length of every field of every document
+and a column with the value of every numeric field (agno) of every document.
+The phrase fields (titulo and descripcion) also store the positions of every term in every document, compressed in the
+same way, with a skip pointer every SKIP_INTERVAL documents so that a phrase query only decodes the blocks of positions
+of the documents that contain all its terms.
+The index is searched with NpSearcher (npsearch.py).
+Usage: python npindex.py -index <index folder> -docs <docs folder>
+"""
+
+import os
+import sys
+import json
+from collections import Counter
+import numpy as np
+from whoosh.util.numeric import byte_to_length
+from whoosh.fields import NUMERIC
+from index import MyIndex, create_schema, create_folder
+from facets import FacetWriter
+from profiling import NULL_PROFILER
+
+KEY_SEPARATOR = '\x1f' # Separa el campo del término en las claves del diccionario (campo + separador + término)
+PHRASE_FIELDS = ['titulo', 'descripcion'] # Campos con posiciones, para las consultas de frases y de proximidad
+SKIP_INTERVAL = 64 # Documentos de cada bloque de posiciones (uno por puntero de salto)
+BYTE_LENGTHS = np.array([byte_to_length(b) for b in range(256)], dtype=np.float64) # Longitud aproximada de cada byte
+
+def length_bytes(lengths):
+    """
+    Aproxima las longitudes de los campos en un byte, igual que Whoosh (length_to_byte), pero para todo el array a la vez.
+
+    """
+    return np.minimum(np.searchsorted(BYTE_LENGTHS, lengths, side='left'), 255).astype(np.uint8)
+
+def vbyte_encode(values):
+    """
+    Codifica una lista de enteros no negativos con bytes de longitud variable: 7 bits del valor en cada byte, empezando
+    por los de menor peso, y el bit alto activado en el último byte de cada valor.
+    Se codifica toda la lista de una vez con operaciones vectoriales.
+
+    """
+    values = np.asarray(values, dtype=np.uint64)
+    if len(values) == 0:
+        return np.empty(0, dtype=np.uint8)
+    nbytes = np.ones(len(values), dtype=np.int64)
+    for shift in (7, 14, 21, 28, 35):
+        nbytes += values >= (1 << shift)
+    ends = np.cumsum(nbytes)
+    starts = ends - nbytes
+    encoded = np.empty(ends[-1], dtype=np.uint8)
+    for byte in range(int(nbytes.max())):
+        mask = nbytes > byte
+        encoded[starts[mask] + byte] = (values[mask] >> np.uint64(7 * byte)) & np.uint64(0x7f)
+    encoded[ends - 1] |= 0x80
+    return encoded
+
+def vbyte_decode(encoded):
+    """
+    Decodifica una secuencia de bytes generada con vbyte_encode y devuelve el array de valores.
+
+    """
+    encoded = np.asarray(encoded, dtype=np.uint8)
+    if len(encoded) == 0:
+        return np.empty(0, dtype=np.int64)
+    ends = np.flatnonzero(encoded & 0x80)
+    starts = np.empty(len(ends), dtype=np.int64)
+    starts[0] = 0
+    starts[1:] = ends[:-1] + 1
+    shifts = (np.arange(len(encoded)) - np.repeat(starts, ends - starts + 1)) * 7
+    parts = (encoded & 0x7f).astype(np.int64) << shifts
+    return np.add.reduceat(parts, starts)
+
+class NpWriter:
+    """
+    Acumula en memoria los documentos que se añaden al índice y al confirmar (commit) escribe los ficheros del índice.
+    Tiene los mismos métodos que el writer de Whoosh que usa MyIndex (add_document y commit).
+
+    """
+    def __init__(self, index_folder, schema):
+        self.index_folder = index_folder
+        self.schema = schema
+        self.fields = [name for name in schema.names() if schema[name].indexed and not isinstance(schema[name], NUMERIC)]
+        # Los campos numéricos no tienen postings: se guarda el valor de cada documento en una columna
+        self.numeric_fields = [name for name in schema.names() if isinstance(schema[name], NUMERIC)]
+        self.numbers = {field: [] for field in self.numeric_fields}
+        self.postings = {} # clave del término -> (lista de documentos, lista de frecuencias)
+        self.positions = {} # clave del término de un campo de frases -> posiciones del término en cada documento
+        self.lengths = {field: [] for field in self.fields}
+        self.documents = [] # Campos almacenados de cada documento
+
+    def add_document(self, **fields):
+        docnum = len(self.documents)
+        for field in self.fields:
+            value = fields.get(field)
+            if field in PHRASE_FIELDS:
+                terms = self.add_positions(field, value)
+            else:
+                terms = Counter(self.schema[field].process_text(value)) if value else {}
+            self.lengths[field].append(sum(terms.values()))
+            for term, frequency in terms.items():
+                entry = self.postings.get(field + KEY_SEPARATOR + term)
+                if entry is None:
+                    entry = self.postings[field + KEY_SEPARATOR + term] = ([], [])
+                entry[0].append(docnum)
+                entry[1].append(frequency)
+        for field in self.numeric_fields:
+            self.numbers[field].append(fields.get(field))
+        self.documents.append({name: fields[name] for name in self.schema.stored_names() if fields.get(name) is not None})
+
+    def add_positions(self, field, value):
+        """
+        Guarda la posición de cada término del campo en el documento, con el mismo análisis que hace Whoosh al indexar.
+        Devuelve la frecuencia de cada término, para no analizar el texto dos veces.
+
+        """
+        positions = {}
+        for token in self.schema[field].analyzer(value, positions=True, mode='index') if value else ():
+            positions.setdefault(token.text, []).append(token.pos)
+        for term, term_positions in positions.items():
+            self.positions.setdefault(field + KEY_SEPARATOR + term, []).append(term_positions)
+        return {term: len(term_positions) for term, term_positions in positions.items()}
+
+    def commit(self):
+        create_folder(self.index_folder)
+        encoded_keys = sorted(key.encode('utf-8') for key in self.postings)
+        entries = [self.postings[key.decode('utf-8')] for key in encoded_keys]
+
+        # Diccionario de términos: las claves ordenadas, concatenadas en un fichero, y la posición donde empieza cada una
+        key_offsets = np.zeros(len(encoded_keys) + 1, dtype=np.int64)
+        np.cumsum([len(key) for key in encoded_keys], out=key_offsets[1:])
+        with open(os.path.join(self.index_folder, 'terms.bin'), 'wb') as f:
+            f.write(b''.join(encoded_keys))
+        np.save(os.path.join(self.index_folder, 'terms.npy'), key_offsets)
+
+        # Postings: por cada término, los saltos entre documentos consecutivos y después las frecuencias.
+        # Se codifican todos los valores del índice de una sola vez.
+        counts = np.array([len(docs) for docs, _ in entries], dtype=np.int64)
+        docs = np.fromiter((doc for docs, _ in entries for doc in docs), dtype=np.int64, count=counts.sum())
+        frequencies = np.fromiter((tf for _, tfs in entries for tf in tfs), dtype=np.int64, count=counts.sum())
+        first = np.cumsum(counts) - counts # Posición del primer posting de cada término
+        gaps = np.diff(docs, prepend=0)
+        gaps[first] = docs[first]
+        position = np.arange(len(docs)) + np.repeat(first, counts) # Posición de cada salto en la secuencia de valores
+        values = np.empty(2 * len(docs), dtype=np.int64)
+        values[position] = gaps
+        values[position + np.repeat(counts, counts)] = frequencies
+        encoded = vbyte_encode(values)
+        value_ends = np.flatnonzero(encoded & 0x80) + 1 # Fin de cada valor en los bytes codificados
+        value_starts = np.concatenate(([0], value_ends[:-1]))
+        term_info = np.empty((len(entries), 4), dtype=np.int64) # inicio, fin de los documentos, fin, número de documentos
+        term_info[:, 0] = value_starts[2 * first]
+        term_info[:, 1] = value_starts[2 * first + counts]
+        term_info[:, 2] = value_ends[2 * first + 2 * counts - 1]
+        term_info[:, 3] = counts
+        encoded.tofile(os.path.join(self.index_folder, 'postings.bin'))
+        np.save(os.path.join(self.index_folder, 'terminfo.npy'), term_info)
+        self.write_positions(encoded_keys, counts)
+
+        # Longitud de cada campo en cada documento, necesaria para BM25. Se guarda aproximada en un byte como en Whoosh,
+        # así el buscador la usa directamente desde el fichero
+        lengths = np.array([self.lengths[field] for field in self.fields], dtype=np.int64).reshape(len(self.fields), -1)
+        np.save(os.path.join(self.index_folder, 'lengths.npy'), length_bytes(lengths))
+
+        # Valor de cada campo numérico en cada documento, NaN si el documento no lo tiene (no cumple ningún rango)
+        numbers = np.array([[np.nan if value is None else value for value in self.numbers[field]] for field in self.numeric_fields],
+                           dtype=np.float64).reshape(len(self.numeric_fields), -1)
+        np.save(os.path.join(self.index_folder, 'numbers.npy'), numbers)
+
+        # Campos almacenados: el JSON de cada documento, concatenados en un fichero, y la posición donde empieza cada uno
+        stored = [json.dumps(document, ensure_ascii=False).encode('utf-8') for document in self.documents]
+        stored_offsets = np.zeros(len(stored) + 1, dtype=np.int64)
+        np.cumsum([len(document) for document in stored], out=stored_offsets[1:])
+        with open(os.path.join(self.index_folder, 'stored.bin'), 'wb') as f:
+            f.write(b''.join(stored))
+        np.save(os.path.join(self.index_folder, 'stored.npy'), stored_offsets)
+        with open(os.path.join(self.index_folder, 'info.json'), 'w', encoding='utf-8') as f:
+            json.dump({'docCount': len(self.documents), 'fields': self.fields, 'numericFields': self.numeric_fields,
+                       'phraseFields': PHRASE_FIELDS, 'skipInterval': SKIP_INTERVAL,
+                       'fieldLengths': {field: int(sum(self.lengths[field])) for field in self.fields}}, f)
+
+    def write_positions(self, encoded_keys, counts):
+        """
+        Escribe las posiciones de los términos de los campos de frases. Por cada término y documento se guardan los saltos
+        entre posiciones consecutivas, todos codificados de una vez, y cada SKIP_INTERVAL documentos (sin contar el primero)
+        un puntero de salto con el byte donde empiezan las posiciones de ese documento.
+        En posinfo.npy cada término tiene el inicio y el fin de sus posiciones y su primer puntero de salto (-1 si el
+        término no es de un campo de frases).
+
+        """
+        terms = np.array([i for i, key in enumerate(encoded_keys) if key.decode('utf-8') in self.positions], dtype=np.int64)
+        term_positions = [self.positions[encoded_keys[i].decode('utf-8')] for i in terms]
+        frequencies = np.fromiter((len(doc) for docs in term_positions for doc in docs), dtype=np.int64)
+        positions = np.fromiter((pos for docs in term_positions for doc in docs for pos in doc), dtype=np.int64,
+                                count=frequencies.sum())
+        first = np.cumsum(frequencies) - frequencies # Primera posición de cada documento de cada término
+        gaps = np.diff(positions, prepend=0)
+        gaps[first] = positions[first]
+        encoded = vbyte_encode(gaps)
+        value_ends = np.flatnonzero(encoded & 0x80) + 1
+        value_starts = np.concatenate(([0], value_ends[:-1]))
+
+        # Rango de bytes de cada término y punteros de salto al primer documento de cada bloque
+        counts = counts[terms]
+        term_values = np.add.reduceat(frequencies, np.cumsum(counts) - counts) if len(terms) else np.empty(0, dtype=np.int64)
+        term_first = np.cumsum(term_values) - term_values
+        blocks = (counts - 1) // SKIP_INTERVAL # Bloques después del primero, que empieza donde empiezan las posiciones del término
+        first_block = np.cumsum(blocks) - blocks
+        block_docs = np.repeat(np.cumsum(counts) - counts, blocks) + (np.arange(blocks.sum()) - np.repeat(first_block, blocks) + 1) * SKIP_INTERVAL
+        pos_info = np.full((len(encoded_keys), 3), -1, dtype=np.int64)
+        pos_info[terms, 0] = value_starts[term_first]
+        pos_info[terms, 1] = value_ends[term_first + term_values - 1]
+        pos_info[terms, 2] = first_block
+        encoded.tofile(os.path.join(self.index_folder, 'positions.bin'))
+        np.save(os.path.join(self.index_folder, 'posinfo.npy'), pos_info)
+        np.save(os.path.join(self.index_folder, 'skips.npy'), value_starts[first[block_docs]])
+
+class NpIndex(MyIndex):
+    """
+    Índice con el mismo interfaz y la misma extracción de campos que MyIndex, pero guardado con NpWriter.
+
+    """
+    def __init__(self, index_folder, profiler=None):
+        self.writer = NpWriter(index_folder, create_schema())
+        self.facets = FacetWriter(index_folder)
+        self.profiler = profiler or NULL_PROFILER
+        self.batch_size = None # NpWriter escribe el índice completo en un único commit
+
+    def commit(self, files, final=True):
+        self.writer.commit()
+        self.facets.commit()
+
+
+if __name__ == '__main__':
+
+    index_folder = '../npindex'
+    docs_folder = '../docs'
+    i = 1
+    while i < len(sys.argv):
+        if sys.argv[i] == '-index':
+            index_folder = sys.argv[i + 1]
+            i = i + 1
+        elif sys.argv[i] == '-docs':
+            docs_folder = sys.argv[i + 1]
+            i = i + 1
+        i = i + 1
+
+    my_index = NpIndex(index_folder)
+    my_index.index_docs(docs_folder)
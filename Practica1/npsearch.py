@@ -0,0 +1,519 @@
+"""
+npsearch.py
+Last update: 19/10/2026
+
+Searcher of the NumPy inverted index created by npindex.py, with the same interface as MySearcher (search.py).
+Queries are parsed with the Whoosh query parser and the same schema, and are evaluated over the compressed posting lists
+with vectorized operations: each term is scored for all its documents at once (TF-IDF or BM25F, with the same formulas
+and field length approximation as Whoosh), and boolean operators are solved with sorted array intersections and unions.
+Numeric fields (agno) are kept as a column with the value of every document, so a year or a range of years is solved by
+comparing the whole column at once.
+The results can include the facet counts (facets.py) of all the documents that match the query.
+Phrase queries on the phrase fields (titulo and descripcion) first intersect the documents of their terms with binary
+searches (galloping), starting with the rarest term, and then decode only the blocks of positions of those documents,
+using the skip pointers of the index. Optionally, the score of a query is boosted by the proximity of its terms
+(proximity.py), and the words without a field are searched in all the text fields with BM25F (multifield.py).
+The time of each stage of a query can be traced with a QueryTracer (tracing.py).
+All the index files (term dictionary, postings, field lengths and stored fields) are memory-mapped and used without copies,
+so several search processes over the same index share a single copy of it in the operating system page cache.
+Usage: python search.py -index <NumPy index folder> -engine numpy [-processes <number of processes>]
+"""
+
+import os
+import re
+import io
+import contextlib
+import json
+import time
+import bisect
+import fnmatch
+from multiprocessing import Pool
+import numpy as np
+from whoosh.qparser import QueryParser, OrGroup, GtLtPlugin
+from whoosh import query as whoosh_query
+from index import create_schema
+from npindex import KEY_SEPARATOR, BYTE_LENGTHS, vbyte_decode
+from facets import FacetColumns
+from proximity import proximity_query
+from multifield import MultiFieldTerm, BM25FParser, bm25f_scores, field_b
+from tracing import QueryTracer, MetricsRegistry, REGISTRY, NULL_TRACE
+
+POSITION_LIMIT = 1 << 32 # Mayor que cualquier posición de un término en un campo
+B = 0.75 # Parámetros de BM25F, los mismos que usa Whoosh por defecto
+K1 = 1.2
+MULTI_TERM_SCORED_DOCS = 5000 # Como en Whoosh, las consultas que se expanden en varios términos solo se puntúan en los
+MULTI_TERM_MAX_SCORED = 1024 # índices de más de 5000 documentos y si se expanden en menos de 1024 términos (ver expanded)
+
+def map_file(path, in_memory=False):
+    """
+    Proyecta en memoria (mmap) un fichero de bytes, o lo lee entero si in_memory es True.
+
+    """
+    if in_memory or os.path.getsize(path) == 0: # mmap no admite ficheros vacíos
+        return np.fromfile(path, dtype=np.uint8)
+    return np.memmap(path, dtype=np.uint8, mode='r')
+
+def load_array(path, in_memory=False):
+    return np.load(path) if in_memory else np.load(path, mmap_mode='r')
+
+class TermDictionary:
+    """
+    Diccionario de términos ordenado y proyectado en memoria (mmap). Se busca con búsqueda binaria.
+
+    """
+    def __init__(self, index_folder, in_memory=False):
+        self.keys = map_file(os.path.join(index_folder, 'terms.bin'), in_memory)
+        self.offsets = load_array(os.path.join(index_folder, 'terms.npy'), in_memory)
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return self.keys[self.offsets[i]:self.offsets[i + 1]].tobytes()
+
+    def find(self, key):
+        """Posición de la clave en el diccionario o None si no está."""
+        key = key.encode('utf-8')
+        i = bisect.bisect_left(self, key)
+        return i if i < len(self) and self[i] == key else None
+
+    def prefix_range(self, prefix):
+        """Posiciones de las claves que empiezan por el prefijo."""
+        prefix = prefix.encode('utf-8')
+        return range(bisect.bisect_left(self, prefix), bisect.bisect_left(self, prefix + b'\xff'))
+
+    def key_range(self, prefix, start=None, end=None, startexcl=False, endexcl=False):
+        """
+        Posiciones de las claves que empiezan por el prefijo y cuyo resto está entre start y end (None si no tiene límite),
+        incluidos salvo que startexcl o endexcl sean True.
+
+        """
+        keys = self.prefix_range(prefix)
+        first, last = keys.start, keys.stop
+        if start is not None:
+            first = (bisect.bisect_right if startexcl else bisect.bisect_left)(self, (prefix + start).encode('utf-8'), first, last)
+        if end is not None:
+            last = (bisect.bisect_left if endexcl else bisect.bisect_right)(self, (prefix + end).encode('utf-8'), first, last)
+        return range(first, last)
+
+class StoredFields:
+    """
+    Campos almacenados de los documentos (path, identificador, modified), leídos del fichero proyectado en memoria
+    solo para los documentos que se muestran.
+
+    """
+    def __init__(self, index_folder, in_memory=False):
+        self.documents = map_file(os.path.join(index_folder, 'stored.bin'), in_memory)
+        self.offsets = load_array(os.path.join(index_folder, 'stored.npy'), in_memory)
+
+    def __getitem__(self, docnum):
+        return json.loads(self.documents[self.offsets[docnum]:self.offsets[docnum + 1]].tobytes())
+
+class NpHit:
+    """
+    Documento de un resultado. Como los resultados de Whoosh, tiene su puntuación (score) y sus campos almacenados (get).
+
+    """
+    def __init__(self, searcher, docnum, score, rank):
+        self.searcher = searcher
+        self.docnum = docnum
+        self.score = score
+        self.rank = rank
+        self._fields = None
+
+    def fields(self):
+        if self._fields is None:
+            self._fields = self.searcher.stored_fields(self.docnum)
+        return self._fields
+
+    def get(self, field, default=None):
+        return self.fields().get(field, default)
+
+    def __getitem__(self, field):
+        return self.fields()[field]
+
+class NpResults:
+    """
+    Resultados de una consulta: los k primeros documentos, el número total de documentos que la cumplen (len) y,
+    si se han pedido, las facetas de todos ellos.
+
+    """
+    def __init__(self, query, hits, total, runtime, facets=None):
+        self.query = query
+        self.hits = hits
+        self.total = total
+        self.runtime = runtime
+        self.facets = facets
+
+    def __len__(self):
+        return self.total
+
+    def __iter__(self):
+        return iter(self.hits)
+
+    def __getitem__(self, n):
+        return self.hits[n]
+
+    def scored_length(self):
+        return len(self.hits)
+
+    def __repr__(self):
+        return f'<Top {len(self.hits)} Results for {self.query!r} runtime={self.runtime}>'
+
+class NpSearcher:
+    """
+    Con in_memory=True los ficheros del índice se leen enteros en memoria en vez de proyectarlos, lo que solo tiene sentido
+    con un único proceso y un índice pequeño. Con proximity=True la puntuación de las consultas aumenta con la proximidad
+    de sus términos en titulo y descripcion. Con field_weights (campo -> peso) las palabras sin campo se buscan en todos
+    esos campos y se puntúan con BM25F, y el resto de términos con BM25 (se ignora model_type para no sumar puntuaciones
+    de TF-IDF y de BM25F en la misma consulta). Con tracer (QueryTracer de tracing.py) se mide cada etapa de las consultas.
+
+    """
+    def __init__(self, index_folder, model_type='tfidf', in_memory=False, proximity=False, field_weights=None,
+                 tracer=None):
+        with open(os.path.join(index_folder, 'info.json'), encoding='utf-8') as f:
+            info = json.load(f)
+        self.doc_count = info['docCount']
+        self.fields = {field: i for i, field in enumerate(info['fields'])}
+        self.avg_lengths = {field: (length / self.doc_count if self.doc_count else 0) or 1 for field, length in info['fieldLengths'].items()}
+        self.dictionary = TermDictionary(index_folder, in_memory)
+        self.term_info = load_array(os.path.join(index_folder, 'terminfo.npy'), in_memory)
+        self.postings = map_file(os.path.join(index_folder, 'postings.bin'), in_memory)
+        self.lengths = load_array(os.path.join(index_folder, 'lengths.npy'), in_memory) # Longitudes aproximadas en un byte
+        self.numeric_fields = {field: i for i, field in enumerate(info['numericFields'])}
+        self.numbers = load_array(os.path.join(index_folder, 'numbers.npy'), in_memory)
+        self.phrase_fields = set(info['phraseFields'])
+        self.skip_interval = info['skipInterval']
+        self.positions = map_file(os.path.join(index_folder, 'positions.bin'), in_memory)
+        self.pos_info = load_array(os.path.join(index_folder, 'posinfo.npy'), in_memory)
+        self.skips = load_array(os.path.join(index_folder, 'skips.npy'), in_memory)
+        self.proximity = proximity
+        self.documents = StoredFields(index_folder, in_memory)
+        self.model_type = 'bm25f' if field_weights else model_type
+        self.schema = create_schema()
+        self.parser = QueryParser("titulo", self.schema, group=OrGroup)
+        # agno es numérico: agno:2009 busca un año, agno:[2005 TO 2010] un rango de años y agno:>=2005 un rango abierto
+        self.parser.add_plugin(GtLtPlugin())
+        if field_weights:
+            self.parser = BM25FParser(self.schema, field_weights)
+        self.facets = FacetColumns(index_folder) if FacetColumns.exists(index_folder) else None
+        self.tracer = tracer
+
+    def stored_fields(self, docnum):
+        return self.documents[docnum]
+
+    def read_postings(self, term):
+        """Documentos y frecuencias de la entrada term del diccionario."""
+        start, doc_end, end, _ = self.term_info[term]
+        docs = np.cumsum(vbyte_decode(self.postings[start:doc_end]))
+        return docs, vbyte_decode(self.postings[doc_end:end])
+
+    def score_postings(self, field, term, boost=1.0):
+        """Documentos de un término del campo y su puntuación, calculada para todos a la vez."""
+        docs, frequencies = self.read_postings(term)
+        return docs, self.term_scores(field, term, docs, frequencies, boost)
+
+    def term_scores(self, field, term, docs, frequencies, boost=1.0):
+        """Puntuación del término del campo en los documentos docs, en los que aparece frequencies veces."""
+        idf = np.log(self.doc_count / (self.term_info[term][3] + 1)) + 1
+        if self.model_type == 'tfidf':
+            return frequencies * idf * boost
+        if not self.schema[field].scorable: # BM25F puntúa los campos sin frecuencias (ID) solo con su peso
+            return frequencies * boost
+        lengths = BYTE_LENGTHS[self.lengths[self.fields[field], docs]]
+        norm = K1 * ((1 - B) + B * lengths / self.avg_lengths[field])
+        return idf * (frequencies * (K1 + 1)) / (frequencies + norm) * boost
+
+    def bm25f(self, q):
+        """Documentos de una palabra buscada en varios campos y su puntuación BM25F, calculada una vez por documento."""
+        postings = []
+        for field, weight in q.weights.items():
+            term = self.dictionary.find(field + KEY_SEPARATOR + q.text) if field in self.fields else None
+            if term is not None:
+                docs, frequencies = self.read_postings(term)
+                lengths = BYTE_LENGTHS[self.lengths[self.fields[field], docs]]
+                postings.append((docs, frequencies, lengths, self.avg_lengths[field], weight, field_b(field)))
+        return bm25f_scores(self.doc_count, postings, q.boost)
+
+    def read_positions(self, term, postings, frequencies):
+        """
+        Posiciones del término en los documentos que ocupan los lugares postings (ordenados) de su lista de postings.
+        Solo se decodifican los bloques de SKIP_INTERVAL documentos que contienen alguno de ellos.
+        Devuelve, por cada posición, el lugar del documento en la lista de postings y la posición.
+
+        """
+        start, end, first_block = self.pos_info[term]
+        skip = self.skip_interval
+        block_starts = np.concatenate(([start], self.skips[first_block:first_block + (len(frequencies) - 1) // skip]))
+        blocks = np.unique(postings // skip)
+        data = [self.positions[block_starts[b]:block_starts[b + 1] if b + 1 < len(block_starts) else end] for b in blocks]
+        values = vbyte_decode(np.concatenate(data)) if data else np.empty(0, dtype=np.int64)
+        # Documentos de los bloques decodificados y número de posiciones de cada uno
+        sizes = np.minimum(skip, len(frequencies) - blocks * skip)
+        owners = np.repeat(blocks * skip, sizes) + np.arange(sizes.sum()) - np.repeat(np.cumsum(sizes) - sizes, sizes)
+        counts = frequencies[owners]
+        # Las posiciones se guardan como saltos desde la anterior del mismo documento
+        totals = np.cumsum(values)
+        first = np.cumsum(counts) - counts
+        positions = totals - np.repeat(totals[first] - values[first], counts)
+        owners = np.repeat(owners, counts)
+        keep = np.isin(owners, postings, assume_unique=False)
+        return owners[keep], positions[keep]
+
+    def phrase(self, q, within=None):
+        """
+        Documentos en los que las palabras de la frase aparecen en orden, cada una a una distancia entre 1 y q.slop de la
+        anterior (como en Whoosh). Puntúan con la suma de la puntuación de sus términos.
+        Si se indica within (documentos ordenados), solo se buscan las frases en esos documentos.
+
+        """
+        terms = [self.dictionary.find(q.fieldname + KEY_SEPARATOR + word) for word in q.words]
+        if not terms or any(term is None for term in terms):
+            return empty_result()
+        postings = [self.read_postings(term) for term in terms]
+        # Documentos con todos los términos: cada documento del término más raro se busca en los demás (búsqueda binaria)
+        candidates = min(postings, key=lambda posting: len(posting[0]))[0]
+        if within is not None:
+            candidates = within[gallop(candidates, within) >= 0] if len(within) < len(candidates) else candidates[gallop(within, candidates) >= 0]
+        for docs, _ in postings:
+            candidates = candidates[gallop(docs, candidates) >= 0]
+        places = [gallop(docs, candidates) for docs, _ in postings] # Lugar de cada candidato en cada lista de postings
+        if len(terms) > 1 and q.fieldname in self.phrase_fields and len(candidates):
+            # Cada posición se identifica por el candidato y la posición en el documento (candidato * POSITION_LIMIT + posición).
+            # Las posiciones alcanzables son las del primer término; en cada término siguiente, las suyas que están a una
+            # distancia entre 1 y slop de alguna posición alcanzable del término anterior
+            reachable = None
+            for term, (docs, frequencies), place in zip(terms, postings, places):
+                owners, positions = self.read_positions(term, place, frequencies)
+                keys = np.searchsorted(place, owners) * POSITION_LIMIT + positions
+                if reachable is None:
+                    reachable = keys
+                else:
+                    reachable = np.unique(np.concatenate([np.intersect1d(reachable + d, keys, assume_unique=True)
+                                                          for d in range(1, q.slop + 1)]))
+            matches = np.unique(reachable // POSITION_LIMIT)
+            candidates = candidates[matches]
+            places = [place[matches] for place in places]
+        scores = sum(self.term_scores(q.fieldname, term, docs[place], frequencies[place], q.boost)
+                     for term, (docs, frequencies), place in zip(terms, postings, places))
+        return candidates, scores
+
+    def numeric_range(self, field, start, end, startexcl=False, endexcl=False):
+        """Documentos cuyo valor del campo numérico está en el rango (None si no tiene límite)."""
+        values = self.numbers[self.numeric_fields[field]]
+        match = ~np.isnan(values)
+        if start is not None:
+            match &= values > start if startexcl else values >= start
+        if end is not None:
+            match &= values < end if endexcl else values <= end
+        return np.flatnonzero(match)
+
+    def evaluate(self, q):
+        """
+        Evalúa una consulta de Whoosh y devuelve los documentos que la cumplen (array ordenado) y sus puntuaciones.
+
+        """
+        if isinstance(q, whoosh_query.NumericRange) and q.fieldname in self.numeric_fields:
+            # Como en Whoosh, los rangos puntúan igual todos sus documentos
+            docs = self.numeric_range(q.fieldname, q.start, q.end, q.startexcl, q.endexcl)
+            return docs, np.full(len(docs), q.boost)
+        if isinstance(q, whoosh_query.Term) and q.fieldname in self.numeric_fields:
+            value = self.schema[q.fieldname].from_bytes(q.text)
+            docs = self.numeric_range(q.fieldname, value, value)
+            idf = np.log(self.doc_count / (len(docs) + 1)) + 1 if self.model_type == 'tfidf' else 1.0
+            return docs, np.full(len(docs), idf * q.boost)
+        if isinstance(q, whoosh_query.Term):
+            term = self.dictionary.find(q.fieldname + KEY_SEPARATOR + q.text) if q.fieldname in self.fields else None
+            return self.score_postings(q.fieldname, term, q.boost) if term is not None else empty_result()
+        if isinstance(q, (whoosh_query.Prefix, whoosh_query.Wildcard)) and q.fieldname in self.fields:
+            # Términos que empiezan por el prefijo (en un comodín, la parte anterior al primer *, ? o [)
+            prefix = re.split(r'[*?\[]', q.text)[0]
+            pattern = re.compile(fnmatch.translate(q.text)) if isinstance(q, whoosh_query.Wildcard) else None
+            terms = [term for term in self.dictionary.prefix_range(q.fieldname + KEY_SEPARATOR + prefix)
+                     if pattern is None or pattern.match(self.dictionary[term].decode('utf-8').split(KEY_SEPARATOR, 1)[1])]
+            return self.expanded(q.fieldname, terms, q.boost)
+        if isinstance(q, whoosh_query.TermRange) and q.fieldname in self.fields:
+            # Los términos del rango son consecutivos en el diccionario ordenado
+            terms = self.dictionary.key_range(q.fieldname + KEY_SEPARATOR, q.start, q.end, q.startexcl, q.endexcl)
+            return self.expanded(q.fieldname, list(terms), q.boost)
+        if isinstance(q, MultiFieldTerm):
+            return self.bm25f(q)
+        if isinstance(q, whoosh_query.Or):
+            return union([self.evaluate(sub) for sub in q.subqueries])
+        if isinstance(q, whoosh_query.And):
+            positive = [sub for sub in q.subqueries if not isinstance(sub, (whoosh_query.Not, whoosh_query.Phrase))]
+            phrases = [sub for sub in q.subqueries if isinstance(sub, whoosh_query.Phrase)]
+            negative = [sub for sub in q.subqueries if isinstance(sub, whoosh_query.Not)]
+            result = intersection([self.evaluate(sub) for sub in positive]) if positive else None
+            for sub in phrases:
+                # Las posiciones de las frases solo se comprueban en los documentos que cumplen el resto de la consulta
+                phrase = self.phrase(sub, within=result[0] if result is not None else None)
+                result = intersection([result, phrase]) if result is not None else phrase
+            if result is None:
+                result = self.every()
+            if not negative:
+                return result
+            # Como en Whoosh, cada negación suma su peso a la puntuación de los documentos que no la cumplen
+            docs, scores = difference(result, union([self.evaluate(sub.query) for sub in negative]))
+            return docs, scores + sum(sub.boost for sub in negative)
+        if isinstance(q, whoosh_query.AndNot):
+            return difference(self.evaluate(q.a), self.evaluate(q.b))
+        if isinstance(q, whoosh_query.AndMaybe):
+            return maybe(self.evaluate(q.a), self.evaluate(q.b))
+        if isinstance(q, whoosh_query.Not):
+            # Como en Whoosh, los documentos que no cumplen la consulta puntúan con el peso de la negación
+            return difference((np.arange(self.doc_count), np.full(self.doc_count, q.boost)), self.evaluate(q.query))
+        if isinstance(q, whoosh_query.Phrase):
+            # En los campos sin posiciones una frase se evalúa como la intersección de sus términos
+            return self.phrase(q)
+        if isinstance(q, whoosh_query.Every):
+            return self.every()
+        if isinstance(q, type(whoosh_query.NullQuery)):
+            return empty_result()
+        raise NotImplementedError(f'Query type not supported by the NumPy index: {q!r}')
+
+    def expanded(self, field, terms, boost=1.0):
+        """
+        Documentos y puntuación de una consulta que se expande en varios términos del campo (prefijo, comodín o rango).
+        Se puntúa como en Whoosh: si se expande en un solo término, como ese término (sin el peso de la consulta); si se
+        expande en varios, la puntuación es constante y todos sus documentos puntúan 1. Whoosh solo suma las puntuaciones
+        de los términos (por el peso de la consulta) cuando son dos o el índice tiene más de 5000 documentos, porque
+        entonces une los términos de uno en uno en vez de marcar los documentos en un array.
+
+        """
+        if len(terms) == 1:
+            return self.score_postings(field, terms[0])
+        if len(terms) == 2 or (self.doc_count > MULTI_TERM_SCORED_DOCS and len(terms) < MULTI_TERM_MAX_SCORED):
+            docs, scores = union([self.score_postings(field, term) for term in terms])
+            return docs, scores * boost
+        docs, _ = union([(docs, np.ones(len(docs))) for docs, _ in map(self.read_postings, terms)])
+        return docs, np.ones(len(docs))
+
+    def every(self):
+        return np.arange(self.doc_count), np.zeros(self.doc_count)
+
+    def top(self, docs, scores, max_results):
+        """Los max_results documentos de mayor puntuación; a igual puntuación, primero el de menor número (como Whoosh)."""
+        if max_results is not None and len(docs) > max_results:
+            candidates = np.argpartition(-scores, max_results - 1)[:max_results]
+            threshold = scores[candidates].min()
+            candidates = np.flatnonzero(scores >= threshold) # Se incluyen todos los empates del último valor
+        else:
+            candidates = np.arange(len(docs))
+        order = candidates[np.lexsort((docs[candidates], -scores[candidates]))][:max_results]
+        return docs[order], scores[order]
+
+    def search(self, query_text, info, max_results=100, facets=False):
+        start = time.perf_counter()
+        trace = self.tracer.start('numpy', query_text) if self.tracer is not None else NULL_TRACE
+        with trace.stage('parse'):
+            query = self.parser.parse(query_text)
+            if self.proximity:
+                query = proximity_query(query)
+        with trace.stage('score'):
+            docs, scores = self.evaluate(query)
+        with trace.stage('topk'):
+            top_docs, top_scores = self.top(docs, scores, max_results)
+            hits = [NpHit(self, int(doc), float(score), rank) for rank, (doc, score) in enumerate(zip(top_docs, top_scores))]
+        if self.tracer is not None:
+            # Se leen aquí los campos almacenados para medirlos; los resultados los guardan y no se vuelven a leer
+            with trace.stage('stored'):
+                for hit in hits:
+                    hit.fields()
+        counts = None
+        if facets and self.facets is not None:
+            with trace.stage('facets'):
+                counts = self.facets.count(docs)
+        results = NpResults(query, hits, len(docs), time.perf_counter() - start, counts)
+        if self.tracer is not None:
+            self.tracer.finish(trace, len(hits))
+        print(results)
+        return results
+
+# ------------------------------------------------------------------------------
+# Operaciones sobre resultados parciales (documentos ordenados y sus puntuaciones).
+# ------------------------------------------------------------------------------
+
+def empty_result():
+    return np.empty(0, dtype=np.int64), np.empty(0)
+
+def union(results):
+    """Documentos de alguno de los resultados, con la suma de sus puntuaciones."""
+    results = [result for result in results if len(result[0])]
+    if not results:
+        return empty_result()
+    if len(results) == 1:
+        return results[0]
+    docs, inverse = np.unique(np.concatenate([docs for docs, _ in results]), return_inverse=True)
+    return docs, np.bincount(inverse, weights=np.concatenate([scores for _, scores in results]), minlength=len(docs))
+
+def intersection(results):
+    """Documentos de todos los resultados, con la suma de sus puntuaciones. Se empieza por los resultados más cortos."""
+    results = sorted(results, key=lambda result: len(result[0]))
+    docs, scores = results[0]
+    for other_docs, other_scores in results[1:]:
+        docs, i, j = np.intersect1d(docs, other_docs, assume_unique=True, return_indices=True)
+        scores = scores[i] + other_scores[j]
+    return docs, scores
+
+def gallop(docs, targets):
+    """
+    Lugar de cada documento de targets (ordenados) en docs, o -1 si no está. Cada documento se busca con una búsqueda
+    binaria, así intersecar una lista corta con una larga cuesta en proporción a la corta y no a la suma de las dos.
+
+    """
+    places = np.searchsorted(docs, targets)
+    found = places < len(docs)
+    found[found] = docs[places[found]] == targets[found]
+    return np.where(found, places, -1)
+
+def difference(result, excluded):
+    keep = ~np.isin(result[0], excluded[0], assume_unique=True)
+    return result[0][keep], result[1][keep]
+
+def maybe(required, optional):
+    """Documentos del primer resultado; los que están también en el segundo suman su puntuación."""
+    docs, scores = required[0], required[1].copy()
+    _, i, j = np.intersect1d(docs, optional[0], assume_unique=True, return_indices=True)
+    scores[i] += optional[1][j]
+    return docs, scores
+
+# ------------------------------------------------------------------------------
+# Búsqueda con varios procesos. Cada proceso abre el índice una vez; como los ficheros están proyectados en memoria,
+# abrirlo es inmediato y todos los procesos comparten la misma copia del índice.
+# ------------------------------------------------------------------------------
+
+worker_searcher = None
+
+def open_worker(index_folder, model_type, proximity, field_weights, trace_log):
+    global worker_searcher
+    # Cada proceso tiene su registro de métricas; todos añaden sus trazas al mismo fichero, una línea por consulta
+    tracer = QueryTracer(trace_log, registry=MetricsRegistry()) if trace_log else None
+    worker_searcher = NpSearcher(index_folder, model_type, proximity=proximity, field_weights=field_weights, tracer=tracer)
+
+def search_worker(args):
+    query_text, max_results = args
+    with contextlib.redirect_stdout(io.StringIO()): # search muestra el resumen de los resultados
+        results = worker_searcher.search(query_text, False, max_results)
+    hits = [(hit.get('identificador'), hit.get('path'), hit.score) for hit in results]
+    tracer = worker_searcher.tracer
+    if tracer is None:
+        return hits, None
+    # Las métricas de la consulta se devuelven al proceso principal, que las suma a su registro
+    metrics, tracer.registry = tracer.registry, MetricsRegistry()
+    return hits, metrics
+
+def search_queries(index_folder, queries, processes=None, model_type='tfidf', max_results=100, proximity=False,
+                   field_weights=None, trace_log=None, registry=REGISTRY):
+    """
+    Resuelve una lista de consultas repartiéndolas entre processes procesos. Devuelve, para cada consulta y en el mismo orden,
+    la lista de sus resultados como tuplas (identificador, path, score). Con trace_log las trazas de las consultas se
+    añaden a ese fichero JSON lines y sus métricas, medidas en cada proceso, se suman a registry.
+
+    """
+    with Pool(processes, initializer=open_worker, initargs=(index_folder, model_type, proximity, field_weights, trace_log)) as pool:
+        answers = pool.map(search_worker, [(query_text, max_results) for query_text in queries])
+    for _, metrics in answers:
+        if metrics is not None:
+            registry.merge(metrics)
+    return [hits for hits, _ in answers]
@@ -0,0 +1,140 @@
+"""
+profiling.py
+Last update: 19/10/2026
+
+Build profiling for MyIndex and NpIndex (index.py -profile). BuildProfiler measures the time of each stage of the index
+build (file read, XML parse, field extraction, analysis, posting write and commit) and reports, for every stage, its
+throughput in documents per second and MB of source files per second, together with the total time and the peak resident
+memory (RSS) of the process. The reports can be appended as JSON lines to a file to compare builds over time.
+The analysis of the Whoosh fields is lazy (it runs while the writer adds the postings), so it is measured by consuming the
+output of each field analyzer before the writer uses it. NpIndex analyzes the text inside its writer, so its analysis
+time is part of the posting write stage.
+Usage: python index.py -index <index folder> -docs <docs folder> -profile [-profileOutput <JSON lines report file>]
+"""
+
+import sys
+import json
+import time
+from contextlib import contextmanager, nullcontext
+from tracing import Stage
+
+try:
+    import resource # No está disponible en Windows
+except ImportError:
+    resource = None
+
+BUILD_STAGES = ['read', 'parse', 'extract', 'analysis', 'write', 'commit']
+
+def peak_rss():
+    """Memoria residente máxima del proceso en bytes, o None si no se puede medir."""
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == 'darwin' else rss * 1024 # En Linux se mide en KB
+
+class BuildProfiler:
+    """
+    Tiempos de las etapas de la construcción de un índice, y número y tamaño de los documentos leídos.
+
+    """
+    def __init__(self):
+        self.stages = dict.fromkeys(BUILD_STAGES, 0.0)
+        self.documents = 0
+        self.bytes = 0
+        self.start = time.perf_counter()
+        self.seconds = None
+
+    def stage(self, name):
+        return Stage(self, name)
+
+    def add(self, name, seconds):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def add_document(self, size):
+        self.documents += 1
+        self.bytes += size
+
+    @contextmanager
+    def analysis(self, schema):
+        """
+        Mide el análisis de los campos mientras está activo: cada campo indexado analiza su texto completo antes de
+        devolverlo al writer, y ese tiempo se pasa de la escritura de postings al análisis. Al salir, también si hay una
+        excepción, cada campo recupera su método index, antes de que el writer guarde el esquema al confirmar.
+
+        """
+        originals = [] # (campo, su atributo index propio o None si usa el de su clase), en el orden en que se cambian
+        try:
+            for _, field in schema.items():
+                if field.indexed:
+                    originals.append((field, vars(field).get('index')))
+                    field.index = self.timed_index(field.index)
+            yield
+        finally:
+            # En orden inverso, por si un mismo campo está en el esquema con varios nombres
+            for field, index in reversed(originals):
+                if index is None:
+                    del field.index
+                else:
+                    field.index = index
+
+    def timed_index(self, index):
+        clock = time.perf_counter
+        def timed(value, **kwargs):
+            start = clock()
+            items = list(index(value, **kwargs))
+            seconds = clock() - start
+            self.stages['analysis'] += seconds
+            self.stages['write'] -= seconds
+            return items
+        return timed
+
+    def finish(self):
+        self.seconds = time.perf_counter() - self.start
+
+    def report(self):
+        """Informe de la construcción: tiempo y rendimiento de cada etapa, tiempo total y memoria máxima."""
+        seconds = self.seconds if self.seconds is not None else time.perf_counter() - self.start
+        megabytes = self.bytes / 1e6
+        stages = {name: {'seconds': stage_seconds,
+                         'docsPerSecond': self.documents / stage_seconds if stage_seconds > 0 else None,
+                         'mbPerSecond': megabytes / stage_seconds if stage_seconds > 0 else None}
+                  for name, stage_seconds in self.stages.items()}
+        return {'time': time.time(), 'documents': self.documents, 'bytes': self.bytes, 'seconds': seconds,
+                'docsPerSecond': self.documents / seconds if seconds > 0 else None,
+                'mbPerSecond': megabytes / seconds if seconds > 0 else None,
+                'peakRssBytes': peak_rss(), 'stages': stages}
+
+    def print_report(self, file=sys.stdout):
+        report = self.report()
+        print(f"{'stage':>10} {'seconds':>10} {'share':>7} {'docs/s':>12} {'MB/s':>10}", file=file)
+        for name, stage in report['stages'].items():
+            share = stage['seconds'] / report['seconds'] if report['seconds'] else 0
+            docs_per_second = f"{stage['docsPerSecond']:.1f}" if stage['docsPerSecond'] else '-'
+            mb_per_second = f"{stage['mbPerSecond']:.2f}" if stage['mbPerSecond'] else '-'
+            print(f"{name:>10} {stage['seconds']:>10.3f} {share:>7.1%} {docs_per_second:>12} {mb_per_second:>10}", file=file)
+        print(f"{'total':>10} {report['seconds']:>10.3f} {'':>7} {report['docsPerSecond'] or 0:>12.1f} "
+              f"{report['mbPerSecond'] or 0:>10.2f}", file=file)
+        print(f"{report['documents']} documents, {report['bytes'] / 1e6:.1f} MB", file=file)
+        if report['peakRssBytes'] is not None:
+            print(f"Peak RSS: {report['peakRssBytes'] / 2**20:.1f} MB", file=file)
+
+    def append_report(self, report_file, **info):
+        """Añade el informe, con los datos de info (carpetas, motor...), como una línea JSON al final del fichero."""
+        with open(report_file, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(dict(info, **self.report()), ensure_ascii=False) + '\n')
+
+class NullProfiler:
+    """Profiler que no mide nada, para los índices que se construyen sin -profile."""
+    def stage(self, name):
+        return nullcontext()
+
+    def add_document(self, size):
+        pass
+
+    def analysis(self, schema):
+        return nullcontext()
+
+    def finish(self):
+        pass
+
+NULL_PROFILER = NullProfiler()
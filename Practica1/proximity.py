@@ -0,0 +1,47 @@
+"""
+proximity.py
+Last update: 19/10/2026
+
+Proximity boost for the queries of MySearcher and NpSearcher. The documents that match a query and contain its terms of
+titulo or descripcion in the same order and close to each other (at most PROXIMITY_SLOP positions from the previous term)
+get the score of that sloppy phrase added to their score. The documents that only match the original query keep their
+score, so the boost reorders the results but does not change which documents are returned.
+Usage: python search.py -index <index folder> -proximity
+"""
+
+from whoosh import query as whoosh_query
+from multifield import MultiFieldTerm
+
+PROXIMITY_FIELDS = ['titulo', 'descripcion']
+PROXIMITY_SLOP = 5 # Distancia máxima entre un término y el anterior
+PROXIMITY_BOOST = 1.0 # Peso de la frase aproximada respecto a la consulta
+
+def positive_terms(q):
+    """Términos de la consulta en su orden, sin los que están negados (NOT)."""
+    if isinstance(q, whoosh_query.Not):
+        return
+    if isinstance(q, whoosh_query.AndNot):
+        yield from positive_terms(q.a)
+    elif isinstance(q, whoosh_query.Term):
+        yield q.fieldname, q.text
+    elif isinstance(q, MultiFieldTerm):
+        yield from q.terms()
+    elif not q.is_leaf():
+        for sub in q.children():
+            yield from positive_terms(sub)
+
+def proximity_query(q, fields=PROXIMITY_FIELDS, slop=PROXIMITY_SLOP, boost=PROXIMITY_BOOST):
+    """
+    Añade a la consulta, como parte opcional (AndMaybe), una frase aproximada por cada campo de proximidad en el que la
+    consulta tiene al menos dos términos distintos. Las consultas sin esos términos se devuelven sin cambios.
+
+    """
+    terms = list(positive_terms(q))
+    phrases = []
+    for field in fields:
+        words = list(dict.fromkeys(text for fieldname, text in terms if fieldname == field))
+        if len(words) > 1:
+            phrases.append(whoosh_query.Phrase(field, words, slop=slop, boost=boost))
+    if not phrases:
+        return q
+    return whoosh_query.AndMaybe(q, phrases[0] if len(phrases) == 1 else whoosh_query.Or(phrases))
@@ -4,27 +4,71 @@ Author: Enrique Martínez Casanova
 Last update: 23/09/2025
 
 Extended with -infoNeeds and -output functionality
-Usage: python search.py -index <index folder> [-info] [-infoNeeds <query file> -output <results file>]
+Usage: python search.py -index <index folder> [-engine <whoosh|numpy>] [-info] [-facets] [-proximity]
+                        [-multifield] [-weights <field weights file, from tune.py>] [-trace <JSON lines trace file>]
+                        [-infoNeeds <query file> -output <results file>] [-processes <number of processes, numpy engine only>]
 """
 
 import sys
-from whoosh.qparser import QueryParser, OrGroup
+import json
+import numpy as np
+from whoosh.qparser import QueryParser, OrGroup, GtLtPlugin
 from whoosh import scoring
 import whoosh.index as index
 from index import SnowballStemFilter
+from npsearch import NpSearcher, search_queries
+from facets import FacetColumns
+from proximity import proximity_query
+from multifield import BM25FParser, FIELD_WEIGHTS
+from tracing import QueryTracer, TracingCollector, NULL_TRACE, REGISTRY
 
 class MySearcher:
-    def __init__(self, index_folder, model_type='tfidf'):
+    def __init__(self, index_folder, model_type='tfidf', proximity=False, field_weights=None, tracer=None):
         ix = index.open_dir(index_folder)
-        if model_type == 'tfidf':
+        # Con field_weights se usa siempre BM25F, para no sumar puntuaciones de TF-IDF y de BM25F en la misma consulta
+        if model_type == 'tfidf' and not field_weights:
             self.searcher = ix.searcher(weighting=scoring.TF_IDF())
         else:
             self.searcher = ix.searcher()
         self.parser = QueryParser("titulo", ix.schema, group=OrGroup)
+        # agno es numérico: agno:2009 busca un año, agno:[2005 TO 2010] un rango de años y agno:>=2005 un rango abierto
+        self.parser.add_plugin(GtLtPlugin())
+        if field_weights:
+            # Las palabras sin campo se buscan en todos los campos de field_weights (campo -> peso) y se puntúan con BM25F
+            self.parser = BM25FParser(ix.schema, field_weights)
+        self.facets = FacetColumns(index_folder) if FacetColumns.exists(index_folder) else None
+        # Con proximity=True la puntuación aumenta cuando los términos de titulo o descripcion aparecen juntos y en orden
+        self.proximity = proximity
+        # Con tracer (QueryTracer de tracing.py) se mide el tiempo de cada etapa de las consultas
+        self.tracer = tracer
 
-    def search(self, query_text, info, max_results=100):
-        query = self.parser.parse(query_text)
-        results = self.searcher.search(query, limit=max_results)
+    def search(self, query_text, info, max_results=100, facets=False):
+        """
+        Busca la consulta y devuelve los max_results primeros resultados. Con facets=True los resultados incluyen además
+        (results.facets) el número de documentos de todos los que cumplen la consulta por departamento, materia y año.
+
+        """
+        trace = self.tracer.start('whoosh', query_text) if self.tracer is not None else NULL_TRACE
+        with trace.stage('parse'):
+            query = self.parser.parse(query_text)
+            if self.proximity:
+                query = proximity_query(query)
+        if self.tracer is None:
+            results = self.searcher.search(query, limit=max_results)
+        else:
+            # El mismo colector que usa search, envuelto para medir los matchers, la puntuación y la ordenación
+            collector = TracingCollector(self.searcher.collector(limit=max_results), trace)
+            self.searcher.search_with_collector(query, collector)
+            results = collector.results()
+            with trace.stage('stored'):
+                results.load_fields()
+        results.facets = None
+        if facets and self.facets is not None:
+            # Se cuentan todos los documentos que cumplen la consulta, no solo los primeros, sin puntuarlos
+            with trace.stage('facets'):
+                results.facets = self.facets.count(np.fromiter(self.searcher.docs_for_query(query), dtype=np.int64))
+        if self.tracer is not None:
+            self.tracer.finish(trace, results.scored_length())
         print(results)
         return results
 
@@ -34,6 +78,12 @@ if __name__ == '__main__':
     info = False
     infoNeeds = None
     output = None
+    engine = 'whoosh'
+    processes = None
+    facets = False
+    proximity = False
+    field_weights = None
+    trace_log = None
 
     # Parse arguments
     i = 1
@@ -49,29 +99,71 @@ if __name__ == '__main__':
         elif sys.argv[i] == '-output':
             output = sys.argv[i + 1]
             i += 1
+        elif sys.argv[i] == '-engine':
+            engine = sys.argv[i + 1]
+            i += 1
+        elif sys.argv[i] == '-processes':
+            processes = int(sys.argv[i + 1])
+            i += 1
+        elif sys.argv[i] == '-facets':
+            facets = True
+        elif sys.argv[i] == '-proximity':
+            proximity = True
+        elif sys.argv[i] == '-multifield':
+            field_weights = FIELD_WEIGHTS
+        elif sys.argv[i] == '-weights':
+            with open(sys.argv[i + 1], encoding='utf-8') as f:
+                field_weights = json.load(f)
+            i += 1
+        elif sys.argv[i] == '-trace':
+            trace_log = sys.argv[i + 1]
+            i += 1
         i += 1
 
-    searcher = MySearcher(index_folder)
+    # Con -trace se mide cada consulta: las trazas se añaden al fichero y al terminar se muestra el resumen
+    tracer = QueryTracer(trace_log) if trace_log else None
+
+    # El índice de NumPy (npindex.py) se consulta con NpSearcher, que tiene el mismo interfaz que MySearcher
+    if engine == 'numpy':
+        searcher = NpSearcher(index_folder, proximity=proximity, field_weights=field_weights, tracer=tracer)
+    else:
+        searcher = MySearcher(index_folder, proximity=proximity, field_weights=field_weights, tracer=tracer)
 
     # Se procesan las consultas desde un fichero si se ha indicado y se guarda la salida en otro fichero
     if infoNeeds and output:
         with open(infoNeeds, "r", encoding="utf-8") as qf, open(output, "w", encoding="utf-8") as rf:
             queries = [line.strip() for line in qf if line.strip()]
-            for qnum, query in enumerate(queries, start=1):
-                results = searcher.search(query, info, max_results=100)
-                for result in results:
-                    doc_id = result.get("identificador")
-                    if doc_id:
-                        rf.write(f"{qnum}\t{doc_id}\n")
+            if engine == 'numpy' and processes:
+                # Las consultas se reparten entre varios procesos que comparten el índice proyectado en memoria
+                for qnum, results in enumerate(search_queries(index_folder, queries, processes, proximity=proximity,
+                                                                            field_weights=field_weights,
+                                                                            trace_log=trace_log), start=1):
+                    for doc_id, _, _ in results:
+                        if doc_id:
+                            rf.write(f"{qnum}\t{doc_id}\n")
+            else:
+                for qnum, query in enumerate(queries, start=1):
+                    results = searcher.search(query, info, max_results=100)
+                    for result in results:
+                        doc_id = result.get("identificador")
+                        if doc_id:
+                            rf.write(f"{qnum}\t{doc_id}\n")
 
     # Se procesan las consultas desde la entrada estándar
     else:
         query = input("Introduce una consulta: ")
         while query != 'q':
-            results = searcher.search(query, info)
+            results = searcher.search(query, info, facets=facets)
             print("Returned documents:")
             for i, result in enumerate(results, start=1):
                 print(f"{i} - File path: {result.get('path')}, Similarity score: {result.score}")
                 if info:
                     print(f"    Modified: {result.get('modified')}")
+            if results.facets:
+                for field, counts in results.facets.items():
+                    print(f"{field}: " + ', '.join(f"{value} ({count})" for value, count in counts))
             query = input("Introduce una consulta ('q' para salir): ")
+
+    if tracer is not None:
+        tracer.close()
+        REGISTRY.print_summary()
@@ -0,0 +1,259 @@
+"""
+tracing.py
+Last update: 19/10/2026
+
+Query tracing for MySearcher and NpSearcher. A QueryTracer times every stage of each query (parse, matcher construction,
+scoring, top-k collection, stored field retrieval and facet counting), adds the times to an in-process metrics registry
+(counters and latency histograms with fixed buckets) and, optionally, writes one JSON line per query to a log file and
+calls the registered hooks with the same record. Timing a stage only reads the clock twice, so tracing can be left on.
+Each process has its own registry; the registries of worker processes are merged into the parent one with
+MetricsRegistry.merge (npsearch.search_queries does it for its workers).
+The Whoosh stages are measured with a collector that wraps the usual one (TracingCollector); the NumPy engine has no
+matchers, so its scoring stage includes reading the postings.
+Usage: python search.py -index <index folder> -trace <JSON lines trace file> [-processes <number of processes>]
+"""
+
+import sys
+import json
+import time
+from bisect import bisect_left
+from contextlib import nullcontext
+from whoosh.collectors import WrappingCollector
+from whoosh.searching import Results, Hit
+
+STAGES = ['parse', 'matcher', 'score', 'topk', 'stored', 'facets']
+# Límites superiores (en milisegundos) de los intervalos de los histogramas de latencia
+LATENCY_BUCKETS = [0.1, 0.2, 0.5, 1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000]
+
+class Histogram:
+    """
+    Histograma de latencias con intervalos fijos: guarda el número de valores de cada intervalo, su suma y su máximo.
+
+    """
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1) # El último intervalo no tiene límite
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.total += value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, p):
+        """Límite superior del intervalo que contiene el percentil p (el máximo si es el último intervalo)."""
+        if not self.count:
+            return None
+        rank = p / 100 * self.count
+        seen = 0
+        for bucket, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                return self.buckets[bucket] if bucket < len(self.buckets) else self.max
+        return self.max
+
+    def merge(self, other):
+        """Suma los valores de otro histograma con los mismos intervalos (por ejemplo, el de otro proceso)."""
+        self.counts = [count + other_count for count, other_count in zip(self.counts, other.counts)]
+        self.count += other.count
+        self.total += other.total
+        self.max = max(self.max, other.max)
+
+    def snapshot(self):
+        return {'count': self.count, 'mean': self.total / self.count if self.count else None, 'max': self.max,
+                'p50': self.percentile(50), 'p95': self.percentile(95), 'p99': self.percentile(99),
+                'buckets': dict(zip([str(bucket) for bucket in self.buckets] + ['inf'], self.counts))}
+
+class MetricsRegistry:
+    """
+    Registro de métricas del proceso: contadores y histogramas, identificados por su nombre.
+
+    """
+    def __init__(self):
+        self.counters = {}
+        self.histograms = {}
+
+    def increment(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def observe(self, name, value):
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram()
+        histogram.observe(value)
+
+    def merge(self, other):
+        """Suma al registro los contadores y los histogramas de otro registro (por ejemplo, el de otro proceso)."""
+        for name, value in other.counters.items():
+            self.increment(name, value)
+        for name, histogram in other.histograms.items():
+            if name not in self.histograms:
+                self.histograms[name] = Histogram(histogram.buckets)
+            self.histograms[name].merge(histogram)
+
+    def snapshot(self):
+        return {'counters': dict(self.counters),
+                'histograms': {name: histogram.snapshot() for name, histogram in self.histograms.items()}}
+
+    def reset(self):
+        self.counters.clear()
+        self.histograms.clear()
+
+    def print_summary(self, file=sys.stdout):
+        """Muestra los contadores y la latencia (media y percentiles, en milisegundos) de cada histograma."""
+        for name, value in sorted(self.counters.items()):
+            print(f"{name}: {value}", file=file)
+        for name, histogram in sorted(self.histograms.items()):
+            print(f"{name}: n={histogram.count} mean={histogram.total / histogram.count:.3f}ms "
+                  f"p50<={histogram.percentile(50)}ms p95<={histogram.percentile(95)}ms max={histogram.max:.3f}ms",
+                  file=file)
+
+REGISTRY = MetricsRegistry() # Registro por defecto de todos los buscadores del proceso
+
+class Stage:
+    """Contexto que mide una etapa de una consulta y suma su duración a la traza."""
+    __slots__ = ('trace', 'name', 'start')
+
+    def __init__(self, trace, name):
+        self.trace = trace
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.trace.add(self.name, time.perf_counter() - self.start)
+
+class QueryTrace:
+    """
+    Tiempos de las etapas de una consulta. Una etapa puede medirse varias veces (por ejemplo, una vez por segmento)
+    y se suman sus duraciones.
+
+    """
+    def __init__(self, engine, query_text):
+        self.engine = engine
+        self.query_text = query_text
+        self.stages = {}
+        self.start = time.perf_counter()
+
+    def stage(self, name):
+        return Stage(self, name)
+
+    def add(self, name, seconds):
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+class NullTrace:
+    """Traza que no mide nada, para los buscadores sin tracer."""
+    engine = query_text = None
+
+    def stage(self, name):
+        return nullcontext()
+
+    def add(self, name, seconds):
+        pass
+
+NULL_TRACE = NullTrace()
+
+class QueryTracer:
+    """
+    Crea las trazas de las consultas y, al terminar cada una, actualiza el registro de métricas, escribe la traza en el
+    fichero JSON lines log_file (si se indica, añadiendo al final) y llama a los hooks con el mismo diccionario.
+
+    """
+    def __init__(self, log_file=None, registry=REGISTRY, hooks=()):
+        self.registry = registry
+        self.hooks = list(hooks)
+        self.log = open(log_file, 'a', encoding='utf-8', buffering=1) if log_file else None # Una línea por escritura
+
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+
+    def start(self, engine, query_text):
+        return QueryTrace(engine, query_text)
+
+    def finish(self, trace, hits):
+        """Termina la traza de una consulta que ha devuelto hits documentos y devuelve su registro."""
+        total = (time.perf_counter() - trace.start) * 1000
+        stages = {name: seconds * 1000 for name, seconds in trace.stages.items()}
+        registry = self.registry
+        registry.increment(f'queries.{trace.engine}')
+        registry.increment(f'hits.{trace.engine}', hits)
+        if not hits:
+            registry.increment(f'empty.{trace.engine}')
+        registry.observe(f'latency.{trace.engine}', total)
+        for name, ms in stages.items():
+            registry.observe(f'latency.{trace.engine}.{name}', ms)
+        record = {'time': time.time(), 'engine': trace.engine, 'query': trace.query_text, 'hits': hits,
+                  'totalMs': round(total, 4), 'stages': {name: round(ms, 4) for name, ms in stages.items()}}
+        if self.log is not None:
+            self.log.write(json.dumps(record, ensure_ascii=False) + '\n')
+        for hook in self.hooks:
+            hook(record)
+        return record
+
+    def close(self):
+        if self.log is not None:
+            self.log.close()
+            self.log = None
+
+# ------------------------------------------------------------------------------
+# Etapas de Whoosh: el colector envuelve al que usa Searcher.search y mide la creación de los matchers de cada
+# segmento, la puntuación de los documentos (que incluye añadirlos al montículo de los k mejores) y la ordenación final.
+# ------------------------------------------------------------------------------
+
+class TracingCollector(WrappingCollector):
+    def __init__(self, child, trace):
+        super().__init__(child)
+        self.trace = trace
+
+    def set_subsearcher(self, subsearcher, offset):
+        with self.trace.stage('matcher'):
+            super().set_subsearcher(subsearcher, offset)
+
+    def collect_matches(self):
+        with self.trace.stage('score'):
+            self.child.collect_matches()
+
+    def results(self):
+        with self.trace.stage('topk'):
+            results = self.child.results()
+        return StoredResults(results)
+
+class StoredResults(Results):
+    """
+    Resultados de Whoosh que guardan los campos almacenados de sus documentos después de leerlos (load_fields),
+    así leerlos en la traza no obliga a leerlos otra vez al recorrer los resultados. Se crean a partir de los resultados
+    del colector, con los mismos documentos y datos.
+
+    """
+    def __init__(self, results):
+        super().__init__(results.searcher, results.q, results.top_n, docset=results.docset,
+                         facetmaps=results._facetmaps, runtime=results.runtime, highlighter=results.highlighter)
+        self.collector = results.collector
+        self.stored = {}
+
+    def load_fields(self):
+        for _, docnum in self.top_n:
+            if docnum not in self.stored:
+                self.stored[docnum] = self.searcher.stored_fields(docnum)
+
+    def hit(self, n):
+        score, docnum = self.top_n[n]
+        hit = Hit(self, docnum, n, score)
+        hit._fields = self.stored.get(docnum)
+        return hit
+
+    def __getitem__(self, n):
+        if isinstance(n, slice):
+            return [self.hit(i) for i in range(*n.indices(len(self.top_n)))]
+        if n >= len(self.top_n):
+            raise IndexError(f"results[{n!r}]: Results only has {len(self.top_n)} hits")
+        return self.hit(n)
+
+    def __iter__(self):
+        for n in range(len(self.top_n)):
+            yield self.hit(n)
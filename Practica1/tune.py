@@ -0,0 +1,120 @@
+"""
+tune.py
+Last update: 19/10/2026
+
+Program to tune the field weights of the multi-field BM25F scoring (multifield.py) against relevance judgements.
+The queries are searched as free text (without fields or operators), so every word is searched in all the weighted fields.
+The weights are tuned by coordinate ascent: in each round every field tries every value of WEIGHT_VALUES with the other
+weights fixed and keeps the one with the best mean metric (MAP, nDCG@k or P@k, see benchmark.py), until a round does not
+improve it. The best weights are written as JSON and can be used with search.py -weights.
+With only a few queries the weights fit those queries; they should be checked with a different query set.
+Usage: python tune.py -index <index folder> -qrels <qrels file> [-engine <numpy|whoosh>] [-infoNeeds <query file>]
+                      [-metric <MAP|nDCG|P>] [-k <cutoff>] [-rounds <max rounds>] [-output <weights file>]
+"""
+
+import io
+import sys
+import json
+import contextlib
+from index import SnowballStemFilter # El esquema del índice de Whoosh guarda el analizador con este filtro
+from search import MySearcher
+from npsearch import NpSearcher
+from multifield import BM25FParser, FIELD_WEIGHTS
+from benchmark import free_text, read_qrels, evaluate
+
+WEIGHT_VALUES = [0, 0.25, 0.5, 1, 1.5, 2, 3, 4]
+
+def rank(searcher, weights, queries, max_results=100):
+    """
+    Busca las consultas con los pesos indicados y devuelve, por número de consulta, la lista ordenada de identificadores.
+
+    """
+    searcher.parser = BM25FParser(searcher.parser.schema, weights)
+    rankings = {}
+    with contextlib.redirect_stdout(io.StringIO()): # search muestra el resumen de los resultados
+        for qnum, query in enumerate(queries, start=1):
+            results = searcher.search(query, False, max_results)
+            rankings[str(qnum)] = [result.get('identificador') for result in results]
+    return rankings
+
+def tune(searcher, queries, qrels, weights=FIELD_WEIGHTS, metric='MAP', k=10, rounds=5, values=WEIGHT_VALUES):
+    """
+    Ajusta los pesos de los campos por ascenso coordenado. Devuelve los mejores pesos y el valor de la métrica con ellos.
+
+    """
+    weights = dict(weights)
+    best = evaluate(rank(searcher, weights, queries), qrels, k)[metric]
+    print(f"Initial {metric}: {best:.4f} {weights}")
+    for iteration in range(1, rounds + 1):
+        improved = False
+        for field in weights:
+            for value in values:
+                candidate = dict(weights, **{field: value})
+                if value == weights[field] or not any(candidate.values()):
+                    continue
+                result = evaluate(rank(searcher, candidate, queries), qrels, k)[metric]
+                if result > best:
+                    best, weights, improved = result, candidate, True
+        print(f"Round {iteration} {metric}: {best:.4f} {weights}")
+        if not improved:
+            break
+    return weights, best
+
+if __name__ == '__main__':
+    index_folder = '../whooshindex'
+    engine = 'numpy'
+    infoNeeds = 'querys.txt'
+    qrels_file = None
+    metric = 'MAP'
+    k = 10
+    rounds = 5
+    output = 'weights.json'
+
+    # Parse arguments
+    i = 1
+    while i < len(sys.argv):
+        if sys.argv[i] == '-index':
+            index_folder = sys.argv[i + 1]
+            i += 1
+        elif sys.argv[i] == '-engine':
+            engine = sys.argv[i + 1]
+            i += 1
+        elif sys.argv[i] == '-infoNeeds':
+            infoNeeds = sys.argv[i + 1]
+            i += 1
+        elif sys.argv[i] == '-qrels':
+            qrels_file = sys.argv[i + 1]
+            i += 1
+        elif sys.argv[i] == '-metric':
+            metric = sys.argv[i + 1]
+            i += 1
+        elif sys.argv[i] == '-k':
+            k = int(sys.argv[i + 1])
+            i += 1
+        elif sys.argv[i] == '-rounds':
+            rounds = int(sys.argv[i + 1])
+            i += 1
+        elif sys.argv[i] == '-output':
+            output = sys.argv[i + 1]
+            i += 1
+        i += 1
+
+    # Los juicios de relevancia no tienen valor por defecto: salida.txt son los resultados de uno de los buscadores
+    if qrels_file is None:
+        sys.exit('Usage: python tune.py -index <index folder> -qrels <qrels file> ...')
+    with open(infoNeeds, encoding='utf-8') as qf:
+        queries = [free_text(line.strip()) for line in qf if line.strip()]
+    qrels = read_qrels(qrels_file)
+    if metric != 'MAP':
+        metric = f'{metric}@{k}'
+
+    # Cada evaluación repite todas las consultas, por eso se usa por defecto el motor de NumPy
+    if engine == 'numpy':
+        searcher = NpSearcher(index_folder, 'bm25f', field_weights=FIELD_WEIGHTS)
+    else:
+        searcher = MySearcher(index_folder, 'bm25f', field_weights=FIELD_WEIGHTS)
+    weights, best = tune(searcher, queries, qrels, metric=metric, k=k, rounds=rounds)
+
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(weights, f, indent=2)
+    print(f"Best {metric}: {best:.4f}, weights saved to {output}")
@@ -5,17 +5,20 @@ Last update: 23/09/2025
 
 Simple program to create an inverted index with the contents of text/xml files contained in a docs folder
 This program is based on the whoosh library. See https://pypi.org/project/Whoosh/ .
-Usage: python index.py -index <index folder> -docs <docs folder>
+Usage: python index.py -index <index folder> -docs <docs folder> [-merge <small|tiered|capped|none|bulk>] [-batch <documents per commit>]
+       python index.py -index <index folder> -freeze <snapshot folder>
 """
 
 from whoosh.index import create_in
 from whoosh.fields import *
 from whoosh.analysis import *
 import os
+import re
 import sys
 import xml.etree.ElementTree as ET
 from datetime import datetime
 from nltk.stem.snowball import SnowballStemmer
+from merging import merge_type, freeze
 
 ns = {'dc': 'http://purl.org/dc/elements/1.1/'}
 esp = {'ows': 'http://www.opengis.net/ows'}
@@ -33,26 +36,38 @@ class SnowballStemFilter(Filter):
             yield token
 
 class MyIndex:
-    def __init__(self,index_folder):
+    def __init__(self,index_folder, merge_policy='small', batch_size=None):
         # Se define un analizador personalizado que incluye el filtro de stemming Snowball en español 
         analizador = RegexTokenizer() | LowercaseFilter() | StopFilter() | SnowballStemFilter()
-        # Definición del esquema del índice con los campos a indexar
+        # Definición del esquema del índice con los campos a indexar.
+        # El año se indexa como número con codificación trie (cada valor se indexa también sin sus 4, 8 y 12 bits de menor
+        # peso), así un rango de años se resuelve con unos pocos términos. Se deja con signo porque con signed=False Whoosh
+        # resuelve mal los rangos abiertos (agno:[TO 2006])
         schema = Schema(path=ID(stored=True), modified=STORED, autor=TEXT(analyzer=analizador), director=TEXT(analyzer=analizador),
                         departamento=TEXT(analyzer=analizador), titulo=TEXT(analyzer=analizador), materia=TEXT(analyzer=analizador),
-                        descripcion=TEXT(analyzer=analizador), agno=TEXT(analyzer=analizador), identificador=ID(stored=True),
+                        descripcion=TEXT(analyzer=analizador), agno=NUMERIC(int, bits=16, shift_step=4), identificador=ID(stored=True),
                         norte=NUMERIC(stored=True), sur=NUMERIC(stored=True), este=NUMERIC(stored=True), oeste=NUMERIC(stored=True))
         create_folder(index_folder)
-        index = create_in(index_folder, schema)
-        self.writer = index.writer()
+        self.index = create_in(index_folder, schema)
+        self.writer = self.index.writer()
+        # Con batch_size se confirma cada batch_size documentos, y cada commit fusiona segmentos con merge_policy (merging.py)
+        self.merge_policy = merge_policy
+        self.batch_size = batch_size
 
     def index_docs(self,docs_folder):
+        files = []
         if (os.path.exists(docs_folder)):
-            for file in sorted(os.listdir(docs_folder)):
+            files = [file for file in sorted(os.listdir(docs_folder)) if file.endswith(('.xml', '.txt'))]
+        batch_size = self.batch_size or len(files) or 1
+        for start in range(0, max(len(files), 1), batch_size):
+            if start:
+                self.writer = self.index.writer()
+            for file in files[start:start + batch_size]:
                 if file.endswith('.xml'):
                     self.index_xml_doc(docs_folder, file)
-                elif file.endswith('.txt'):
+                else:
                     self.index_txt_doc(docs_folder, file)
-        self.writer.commit()
+            self.writer.commit(mergetype=merge_type(self.merge_policy, final=start + batch_size >= len(files)))
 
     def index_txt_doc(self, foldername,filename):
         file_path = os.path.join(foldername, filename)
@@ -70,6 +85,15 @@ class MyIndex:
         """
         nodos = root.findall(etiqueta, url)
         return ' '.join(nodo.text.strip() for nodo in nodos if nodo.text)
+
+    def extraer_agno(self, root):
+        """
+        Extrae el año de la fecha del documento (dc:date) como número: el primer grupo de cuatro cifras, de forma que
+        sirven tanto '2009' como '2009-06-15'. Devuelve None si el documento no tiene fecha.
+
+        """
+        agno = re.search(r'(?<!\d)\d{4}(?!\d)', self.extraer_texto(root, 'dc:date', ns))
+        return int(agno.group()) if agno else None
     
     def index_xml_doc(self, foldername, filename):
         """
@@ -86,7 +110,7 @@ class MyIndex:
         texto_titulo = self.extraer_texto(root, 'dc:title', ns)
         texto_subject = self.extraer_texto(root, 'dc:subject', ns)
         texto_descripcion = self.extraer_texto(root, 'dc:description', ns)
-        texto_agno = self.extraer_texto(root, 'dc:date', ns)
+        agno = self.extraer_agno(root)
         texto_identificador = self.extraer_texto(root, 'dc:identifier', ns)
         bbox = root.find('.//ows:BoundingBox', esp)
         if bbox is not None:
@@ -108,13 +132,16 @@ class MyIndex:
         mod_date = datetime.fromtimestamp(mod_time).isoformat()
         # Añadir el documento al índice con los campos extraídos
         self.writer.add_document(path=filename, modified=mod_date, autor=texto_autor, director=texto_director, departamento=texto_departamento,
-                                titulo=texto_titulo, materia=texto_subject, descripcion=texto_descripcion, agno=texto_agno, identificador=texto_identificador,
+                                titulo=texto_titulo, materia=texto_subject, descripcion=texto_descripcion, agno=agno, identificador=texto_identificador,
                                 norte=norte, sur=sur, este=este, oeste=oeste)
 
 if __name__ == '__main__':
 
     index_folder = '../whooshindex'
     docs_folder = '../docs'
+    merge_policy = 'small'
+    batch_size = None
+    freeze_folder = None
     i = 1
     while i < len(sys.argv):
         if sys.argv[i] == '-index':
@@ -123,7 +150,21 @@ if __name__ == '__main__':
         elif sys.argv[i] == '-docs':
             docs_folder = sys.argv[i + 1]
             i = i + 1
+        elif sys.argv[i] == '-merge':
+            merge_policy = sys.argv[i + 1]
+            i = i + 1
+        elif sys.argv[i] == '-batch':
+            batch_size = int(sys.argv[i + 1])
+            i = i + 1
+        elif sys.argv[i] == '-freeze':
+            freeze_folder = sys.argv[i + 1]
+            i = i + 1
         i = i + 1
 
-    my_index = MyIndex(index_folder)
+    if freeze_folder:
+        # Copia de solo lectura del índice con un único segmento
+        freeze(index_folder, freeze_folder)
+        sys.exit(0)
+
+    my_index = MyIndex(index_folder, merge_policy, batch_size)
     my_index.index_docs(docs_folder)
@@ -0,0 +1,131 @@
+"""
+merging.py
+Last update: 19/10/2026
+
+Segment merge policies for the Whoosh indexes and read-only snapshots.
+Every commit of a Whoosh writer adds a new segment and then applies a merge policy, a function that merges some of the
+existing segments into the new one. Searches open all the segments, so an index updated many times without merging gets
+slower. The policies are:
+  small   Whoosh default: merges the smallest segments (fibonacci heuristic).
+  tiered  groups the segments in tiers by size (powers of SEGMENTS_PER_TIER documents) and merges a tier when it has
+          SEGMENTS_PER_TIER segments, so the number of segments grows with the logarithm of the index size.
+  capped  merges the smallest segments while the merged segment stays below MAX_SEGMENT_DOCS documents; larger segments
+          are never merged again.
+  none    never merges.
+  bulk    does not merge in the intermediate commits of a bulk load and merges everything into one segment in the last one.
+freeze copies an index into a new folder as a single segment without deleted documents, for serving it read-only. The
+copy is built in a temporary folder and renamed at the end; an existing folder is only replaced if it is empty or a
+previous snapshot.
+Merging changes the document numbers, so data stored by document number outside the index (the facet columns of
+Practica1, facets.py) must be reordered.
+Usage: python index.py ... [-merge <small|tiered|capped|none|bulk>] [-batch <documents per commit>]
+       python index.py -index <index folder> -freeze <snapshot folder>
+"""
+
+import os
+import tempfile
+import shutil
+import whoosh.index as index
+from whoosh.writing import MERGE_SMALL, NO_MERGE, OPTIMIZE
+from whoosh.reading import SegmentReader
+
+SEGMENTS_PER_TIER = 10
+MAX_SEGMENT_DOCS = 100000
+MERGE_POLICIES = ['small', 'tiered', 'capped', 'none', 'bulk']
+SNAPSHOT_FILE = 'SNAPSHOT' # Marca las carpetas creadas por freeze, las únicas que freeze reemplaza
+
+def merge_into(writer, segments):
+    """Añade los documentos de los segmentos al segmento nuevo del writer."""
+    for segment in segments:
+        reader = SegmentReader(writer.storage, writer.schema, segment)
+        writer.add_reader(reader)
+        reader.close()
+
+def tier_of(doc_count, segments_per_tier=SEGMENTS_PER_TIER):
+    """Nivel de un segmento: el exponente de la mayor potencia de segments_per_tier que no supera su tamaño."""
+    tier = 0
+    while doc_count >= segments_per_tier:
+        doc_count //= segments_per_tier
+        tier += 1
+    return tier
+
+def tiered_merge(segments_per_tier=SEGMENTS_PER_TIER):
+    def merge(writer, segments):
+        tiers = {}
+        for segment in segments:
+            tiers.setdefault(tier_of(segment.doc_count(), segments_per_tier), []).append(segment)
+        # Se fusiona el nivel más pequeño que está lleno (el segmento nuevo solo puede recibir una fusión)
+        full = [tier for tier, tier_segments in tiers.items() if len(tier_segments) >= segments_per_tier]
+        if not full:
+            return segments
+        merged = tiers[min(full)]
+        merge_into(writer, merged)
+        return [segment for segment in segments if segment not in merged]
+    return merge
+
+def size_capped_merge(max_docs=MAX_SEGMENT_DOCS):
+    def merge(writer, segments):
+        total = writer.doc_count()
+        merged = []
+        for segment in sorted(segments, key=lambda segment: segment.doc_count()):
+            if total + segment.doc_count() > max_docs:
+                break
+            total += segment.doc_count()
+            merged.append(segment)
+        if len(merged) < 2 and not (merged and writer.doc_count()):
+            return segments
+        merge_into(writer, merged)
+        return [segment for segment in segments if segment not in merged]
+    return merge
+
+def merge_type(policy, final=True):
+    """Función de fusión de Whoosh (mergetype de commit) de la política, para un commit intermedio o el último."""
+    if policy == 'small':
+        return MERGE_SMALL
+    if policy == 'tiered':
+        return tiered_merge()
+    if policy == 'capped':
+        return size_capped_merge()
+    if policy == 'none':
+        return NO_MERGE
+    if policy == 'bulk':
+        return OPTIMIZE if final else NO_MERGE
+    raise ValueError(f'Unknown merge policy: {policy}')
+
+def freeze(index_folder, snapshot_folder):
+    """
+    Copia el índice en snapshot_folder con un único segmento y sin documentos borrados. Devuelve, para cada documento de la
+    copia, su número de documento en el índice original.
+    La copia se escribe en una carpeta temporal junto a snapshot_folder y se renombra al terminar. Si snapshot_folder ya
+    existe, solo se reemplaza si está vacía o es una copia anterior (tiene el fichero SNAPSHOT_FILE).
+
+    """
+    if os.path.abspath(index_folder) == os.path.abspath(snapshot_folder):
+        raise ValueError('The snapshot folder must be different from the index folder')
+    if os.path.exists(snapshot_folder) and not (os.path.isdir(snapshot_folder) and not os.listdir(snapshot_folder)) \
+            and not os.path.isfile(os.path.join(snapshot_folder, SNAPSHOT_FILE)):
+        raise FileExistsError(f'{snapshot_folder} already exists and is not a snapshot, it will not be replaced')
+    parent, name = os.path.split(os.path.abspath(snapshot_folder))
+    os.makedirs(parent, exist_ok=True)
+    temp_folder = tempfile.mkdtemp(prefix=f'.{name}.', dir=parent)
+    try:
+        ix = index.open_dir(index_folder)
+        snapshot = index.create_in(temp_folder, ix.schema)
+        writer = snapshot.writer()
+        with ix.reader() as reader:
+            docs = list(reader.all_doc_ids())
+            # Los segmentos se copian en orden, así los documentos conservan su orden relativo
+            for segment_reader, _ in reader.leaf_readers():
+                writer.add_reader(segment_reader)
+        writer.commit(mergetype=NO_MERGE)
+        ix.close()
+        snapshot.close()
+        with open(os.path.join(temp_folder, SNAPSHOT_FILE), 'w', encoding='utf-8') as f:
+            f.write(os.path.abspath(index_folder) + '\n')
+        if os.path.exists(snapshot_folder):
+            shutil.rmtree(snapshot_folder)
+        os.rename(temp_folder, snapshot_folder)
+    except BaseException:
+        shutil.rmtree(temp_folder, ignore_errors=True)
+        raise
+    return docs
@@ -8,7 +8,7 @@ Usage: python search.py -index <index folder> [-info] [-infoNeeds <query file> -
 """
 
 import sys
-from whoosh.qparser import QueryParser, OrGroup
+from whoosh.qparser import QueryParser, OrGroup, GtLtPlugin
 from whoosh import scoring
 import whoosh.index as index
 from whoosh.query import NumericRange, And, Or
@@ -22,6 +22,8 @@ class MySearcher:
         else:
             self.searcher = ix.searcher()
         self.parser = QueryParser("titulo", ix.schema, group=OrGroup)
+        # agno es numérico: agno:2009 busca un año, agno:[2005 TO 2010] un rango de años y agno:>=2005 un rango abierto
+        self.parser.add_plugin(GtLtPlugin())
 
     def search(self, query_text, info, max_results=100):
         query = self.parser.parse(query_text)
@@ -4,9 +4,12 @@
 
 # Importaciones requeridas.
 import os, re, unicodedata
+# Perfil de entrenamiento: 'reproducible' (por defecto) para los experimentos o 'performance' para entrenar rápido.
+# Se elige con la variable de entorno TRAINING_PROFILE, ya que parte de la configuración debe hacerse antes de importar tensorflow.
+PROFILE = os.environ.get('TRAINING_PROFILE', 'reproducible')
 # Configuración necesaria antes de importar keras/tensorflow/numpy.
 # Desactiva ciertas operaciones en la gráfica que aceleran la ejecución pero impiden la reproducibilidad.
-os.environ["TF_ENABLE_ONEDNN_OPTS"] = "0" 
+os.environ["TF_ENABLE_ONEDNN_OPTS"] = "1" if PROFILE == 'performance' else "0" 
 # Ocultamos warnings de configuración que pueden dar las librerías de keras.
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '2'
 
@@ -16,7 +19,7 @@ import  numpy as np, random, tensorflow, time, matplotlib.pyplot as plt, tensorf
 # El texto asociado a cada import oculta estos errores en Intelij y Visual Studio code.
 from keras import layers, Input, Model
 # noinspection PyUnresolvedReferences
-from keras.models import load_model, Sequential # type: ignore
+from keras.models import load_model, clone_model, Sequential # type: ignore
 # noinspection PyUnresolvedReferences
 from keras.optimizers import Adam, RMSprop # type: ignore
 # noinspection PyUnresolvedReferences
@@ -25,6 +28,68 @@ from keras.layers import Dense, Embedding, LSTM, GlobalAveragePooling1D, RepeatV
 from keras_nlp.layers import TransformerEncoder, TokenAndPositionEmbedding, TransformerDecoder # type: ignore 
 # noinspection PyUnresolvedReferences
 from keras.utils import set_random_seed, to_categorical, pad_sequences # type: ignore
+# noinspection PyUnresolvedReferences
+from keras.callbacks import Callback, BackupAndRestore, EarlyStopping # type: ignore
+# noinspection PyUnresolvedReferences
+from keras.export import ExportArchive # type: ignore
+# noinspection PyUnresolvedReferences
+from keras import mixed_precision # type: ignore
+
+
+#-------------------------------------------------------------------------------
+# Comprueba si la CPU tiene instrucciones para operar en bfloat16. Sin ellas la precisión mixta es más lenta que float32.
+#-------------------------------------------------------------------------------
+def __cpuSupportsBfloat16():
+    try:
+        with open('/proc/cpuinfo') as f: flags = f.read()
+    except OSError:
+        return False
+    return 'avx512_bf16' in flags or 'amx_bf16' in flags
+
+#-------------------------------------------------------------------------------
+# Perfil de rendimiento: además de oneDNN, configura el número de hilos de cálculo dentro de cada operación (intra-op)
+# y entre operaciones independientes (inter-op), y permite la precisión mixta bfloat16 si la CPU la soporta.
+# La compilación XLA del entrenamiento se activa en cada modelo con configureModel.
+# Cada opción puede ajustarse con las variables de entorno TRAINING_INTRA_THREADS, TRAINING_INTER_THREADS, TRAINING_XLA (0/1)
+# y TRAINING_PRECISION (float32/mixed_bfloat16). La precisión mixta no está activa por defecto: en CPUs sin suficientes núcleos
+# puede ser más lenta que float32, conviene medirlo con el tiempo por epoch de testResults.txt.
+#-------------------------------------------------------------------------------
+PROFILE_SETTINGS = {'oneDNN': False, 'intraOpThreads': 'default', 'interOpThreads': 'default', 'xla': False, 'precision': 'float32'}
+if PROFILE == 'performance':
+    PROFILE_SETTINGS['oneDNN'] = True
+    PROFILE_SETTINGS['intraOpThreads'] = int(os.environ.get('TRAINING_INTRA_THREADS', os.cpu_count()))
+    PROFILE_SETTINGS['interOpThreads'] = int(os.environ.get('TRAINING_INTER_THREADS', 2))
+    PROFILE_SETTINGS['xla'] = os.environ.get('TRAINING_XLA', '1') == '1'
+    precision = os.environ.get('TRAINING_PRECISION', 'float32')
+    PROFILE_SETTINGS['precision'] = precision if precision != 'mixed_bfloat16' or __cpuSupportsBfloat16() else 'float32'
+    tensorflow.config.threading.set_intra_op_parallelism_threads(PROFILE_SETTINGS['intraOpThreads'])
+    tensorflow.config.threading.set_inter_op_parallelism_threads(PROFILE_SETTINGS['interOpThreads'])
+    mixed_precision.set_global_policy(PROFILE_SETTINGS['precision'])
+
+#-------------------------------------------------------------------------------
+# Aplica a un modelo ya compilado la configuración del perfil activo. En el perfil de rendimiento compila con XLA
+# los pasos de entrenamiento de model.fit.
+#-------------------------------------------------------------------------------
+def configureModel(model):
+    if PROFILE_SETTINGS['xla']: model.jit_compile = True
+    return model
+
+#-------------------------------------------------------------------------------
+# Agrupa en batches un dataset de secuencias de longitud parecida (bucketing). Normalmente cada batch se rellena hasta su
+# secuencia más larga, pero con XLA cada forma distinta de batch se vuelve a compilar, así que en ese caso cada batch se
+# rellena hasta el límite de su grupo y solo hay una forma por grupo. Para ello el último límite debe ser mayor que la
+# longitud máxima de las secuencias (maxLength).
+#-------------------------------------------------------------------------------
+def bucketByLength(ds, length, boundaries, batchSize, maxLength):
+    pad = PROFILE_SETTINGS['xla']
+    if pad: boundaries = [boundary for boundary in boundaries if boundary <= maxLength] + [maxLength + 1]
+    return ds.bucket_by_sequence_length(length, boundaries, [batchSize] * (len(boundaries) + 1), pad_to_bucket_boundary=pad)
+
+#-------------------------------------------------------------------------------
+# Descripción del perfil activo, para guardarla junto a los resultados del entrenamiento.
+#-------------------------------------------------------------------------------
+def profileDescription():
+    return PROFILE + ' (' + ', '.join(f'{key}: {value}' for key, value in PROFILE_SETTINGS.items()) + ')'
 
 
 #-------------------------------------------------------------------------------
@@ -57,7 +122,43 @@ class Chronometer:
         minutes = int(duration // 60)
         seconds = duration % 60
         self.message = f'{minutes} min {seconds:.2f} s'
-        
+
+#-------------------------------------------------------------------------------
+# Callback de keras que mide el tiempo de cada epoch del entrenamiento.
+# Sirve para comparar configuraciones de entrenamiento (por ejemplo, con y sin agrupamiento por longitud).
+#-------------------------------------------------------------------------------
+class EpochTimer(Callback):
+    def on_train_begin(self, logs=None):
+        self.times = []
+
+    def on_epoch_begin(self, epoch, logs=None):
+        self.start = time.time()
+
+    def on_epoch_end(self, epoch, logs=None):
+        self.times.append(time.time() - self.start)
+
+    def message(self):
+        return f'{np.mean(self.times):.2f} s (first epoch {self.times[0]:.2f} s)' if self.times else '-'
+
+#-------------------------------------------------------------------------------
+# Callbacks para entrenamientos largos. Guardan periódicamente una copia del estado del entrenamiento (pesos del modelo,
+# estado del optimizador y epoch) en el directorio de resultados; si el entrenamiento se interrumpe, al volver a lanzarlo
+# continúa desde la última copia. La copia se borra al terminar el entrenamiento.
+# Si se indica patience, el entrenamiento se para cuando el error de validación no mejora en ese número de epochs
+# y se recuperan los pesos del mejor epoch.
+#-------------------------------------------------------------------------------
+def trainingCallbacks(dir, patience=None, saveFreq='epoch'):
+    callbacks = [BackupAndRestore(backup_dir=dir + '/checkpoints', save_freq=saveFreq)]
+    if patience: callbacks.append(EarlyStopping(monitor='val_loss', patience=patience, restore_best_weights=True))
+    return callbacks
+
+#-------------------------------------------------------------------------------
+# Número de epochs entrenados en total. Al reanudar, BackupAndRestore empieza en el epoch de la copia (_initial_epoch) y
+# history solo tiene los epochs de esta ejecución, que pueden ser ninguno si la copia ya era del último epoch.
+#-------------------------------------------------------------------------------
+def trainedEpochs(model, history):
+    return (getattr(model, '_initial_epoch', None) or 0) + len(history.epoch)
+
 #-------------------------------------------------------------------------------     
 # Método para guardar la gráfica de una serie de datos. Se usa para guardar la evolución del entrenamiento (precisión/error).
 #-------------------------------------------------------------------------------
@@ -79,23 +180,25 @@ def saveResults(model, history, trainingTime, dir):
     print('----------------------------------------------------')
     # Código no relevante para la práctica pero útil en contextos más avanzados.
     # Para usar el modelo entrenado sin tener que reentrenarlo continuamente, hay que guardarlo después de entrenar
-    # y lo recuperaríamos en otro programa para usarlo directamente.
+    # y lo recuperaríamos en otro programa para usarlo directamente con: model = load_model(dir+'/modelo.keras')
     model.save(dir+'/modelo.keras')
-    model = load_model(dir+'/modelo.keras') # Este sería la instrucción para cargarlo
     
     # Se guarda la estructura del modelo entrenado.
     summary_str = []; model.summary(print_fn=lambda x: summary_str.append(x)) # type: ignore
     summary = '\n'.join(summary_str)
     
     # Se guarda la evolución de la precisión y error durante el entrenamiento.
-    saveTrainingGraph(history.history['accuracy'], None, "Accuracy", None, 'Epoch', 'Precision', dir+'/trainingAccuracy.jpg')
-    saveTrainingGraph(history.history['loss'], history.history['val_loss'], 'Training Loss', 'Validation Loss','Epoch', 'Error', dir+'/trainingLoss.jpg')
+    # Si se continúa un entrenamiento que ya había hecho todas sus épocas, fit no entrena ninguna y no hay gráficas que guardar.
+    if history.epoch:
+        saveTrainingGraph(history.history['accuracy'], None, "Accuracy", None, 'Epoch', 'Precision', dir+'/trainingAccuracy.jpg')
+        saveTrainingGraph(history.history['loss'], history.history['val_loss'], 'Training Loss', 'Validation Loss','Epoch', 'Error', dir+'/trainingLoss.jpg')
     
     # Se guarda el tiempo de entrenamiento, estructura del modelo y su precisión.
     with open(dir+'/testResults.txt', 'w', encoding='utf-8', errors='ignore') as f:
         printAll = lambda *args: (print(*args), print(*args, file=f)) # Función que lo que guarda en fichero lo muestra por pantalla.   
         print('----------------------------------------------------', file=f)
         printAll('Model training time: ' + trainingTime)
+        printAll('Training profile: ' + profileDescription())
         print('----------------------------------------------------', file=f)
         printAll(summary)
         
\ No newline at end of file
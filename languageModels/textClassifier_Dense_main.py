@@ -24,7 +24,9 @@ def createModel():
 # Carga de datos, entrenamiento y test del modelo anteriormente definido.
 #-------------------------------------------------------------------------------
 EPOCHS = 80 # Número de iteraciones en los datos a entrenar. 3 minutos de entrenamiento.
+PATIENCE = 5 # Epochs sin mejorar el error de validación tras los que se para el entrenamiento.
+PIPELINE = False # Si es True, los datos se leen en streaming con tf.data en vez de cargarse completos en memoria.
 if __name__ == '__main__': 
     set_random_seed(0) # Fijamos las semillas de los generadores de números aleatorios usados para tener reproducibilidad.
-    data, _, _ = dataReader(normalize = True) # Los ficheros de entrenamiento y test a leer son fijos en la práctica. Normalizamos las X de entrenamiento para pasárselos a la red densa.
-    trainerTester(createModel(), data, EPOCHS, 'textClassifier_Dense') # El destino de los resultados generados también es fijo en la práctica.
+    data, _, _, vectorizer = dataReader(normalize = True, pipeline = PIPELINE) # Los ficheros de entrenamiento y test a leer son fijos en la práctica. Normalizamos las X de entrenamiento para pasárselos a la red densa.
+    trainerTester(createModel(), data, EPOCHS, 'textClassifier_Dense', vectorizer, normalize = True, patience = PATIENCE) # El destino de los resultados generados también es fijo en la práctica.
@@ -8,7 +8,7 @@
 
 # Importaciones requeridas.
 import commonFunctions 
-from commonFunctions import set_random_seed, Sequential, Adam, Dense, Embedding, LSTM
+from commonFunctions import set_random_seed, Sequential, Input, Adam, Dense, Embedding, LSTM
 from textClassifier__TrainerTester import trainerTester
 from textClassifier__DataReader import dataReader
 
@@ -20,6 +20,7 @@ from textClassifier__DataReader import dataReader
 def createModel(vocSize):
     EMBEDDINGS_SIZE = 50 # Número de dimensiones del vector de Embeddings.
     model = Sequential()
+    model.add(Input(shape=(None,), dtype='int64')) # Entrada entera explícita. Si no, con precisión mixta las palabras se convertirían a bfloat16 y perderían precisión.
     model.add(Embedding(vocSize, EMBEDDINGS_SIZE, mask_zero=True)) # mask_zero hace que se cree una máscara indicando que posiciones son padding, esto evita que aprenda patrones de las casillas vacías.
     model.add(LSTM(32))
     model.add(Dense(12, activation = 'relu'))
@@ -31,7 +32,10 @@ def createModel(vocSize):
 # Carga de datos, entrenamiento y test del modelo anteriormente definido.
 #-------------------------------------------------------------------------------
 EPOCHS = 20 # Número de iteraciones en los datos a entrenar. 5 min de entrenamiento.
+PATIENCE = 3 # Epochs sin mejorar el error de validación tras los que se para el entrenamiento.
+PIPELINE = False # Si es True, los datos se leen en streaming con tf.data en vez de cargarse completos en memoria.
+BUCKETING = False # Si es True, los batches agrupan frases de longitud parecida y se rellenan solo hasta la más larga del batch.
 if __name__ == '__main__': 
     set_random_seed(0) # Fijamos las semillas de los generadores de números aleatorios usados para tener reproducibilidad.
-    data, _, vocSize = dataReader(0.1) # type: ignore # Los ficheros de entrenamiento y test a leer son fijos en la práctica. La capa de embeddings requiere enteros no normalizados.
-    trainerTester(createModel(vocSize), data, EPOCHS, 'textClassifier_LSTM') # El destino de los resultados generados también es fijo en la práctica.
\ No newline at end of file
+    data, _, vocSize, vectorizer = dataReader(0.1, pipeline = PIPELINE, bucketing = BUCKETING) # type: ignore # Los ficheros de entrenamiento y test a leer son fijos en la práctica. La capa de embeddings requiere enteros no normalizados.
+    trainerTester(createModel(vocSize), data, EPOCHS, 'textClassifier_LSTM', vectorizer, patience = PATIENCE) # El destino de los resultados generados también es fijo en la práctica.
\ No newline at end of file
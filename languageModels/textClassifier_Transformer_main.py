@@ -8,7 +8,7 @@
 
 # Importaciones requeridas.
 import commonFunctions
-from commonFunctions import set_random_seed, Sequential, Adam, Dense, GlobalAveragePooling1D, TransformerEncoder, TokenAndPositionEmbedding # type: ignore
+from commonFunctions import set_random_seed, Sequential, Input, Adam, Dense, GlobalAveragePooling1D, TransformerEncoder, TokenAndPositionEmbedding # type: ignore
 from textClassifier__TrainerTester import trainerTester
 from textClassifier__DataReader import dataReader
 
@@ -20,6 +20,7 @@ from textClassifier__DataReader import dataReader
 def createModel(tamVoc,tamFrase):
     EMBEDDINGS_SIZE = 50 # Número de dimensiones del vector de Embeddings.
     model = Sequential()
+    model.add(Input(shape=(None,), dtype='int64')) # Entrada entera explícita. Si no, con precisión mixta las palabras se convertirían a bfloat16 y perderían precisión.
     # mask_zero hace que se cree una máscara indicando que posiciones son padding, esto evita que aprenda patrones de las casillas vacías.
     # Esta instrucción muestra un warning debido a que la parte de embedding posicional no tiene el uso de máscara implementado.
     model.add(TokenAndPositionEmbedding(tamVoc, tamFrase, EMBEDDINGS_SIZE, mask_zero=True))
@@ -36,7 +37,10 @@ def createModel(tamVoc,tamFrase):
 # Carga de datos, entrenamiento y test del modelo anteriormente definido.
 #-------------------------------------------------------------------------------
 EPOCHS = 10 # Número de iteraciones en los datos a entrenar. 5 minutos de entrenamiento.
+PATIENCE = 3 # Epochs sin mejorar el error de validación tras los que se para el entrenamiento.
+PIPELINE = False # Si es True, los datos se leen en streaming con tf.data en vez de cargarse completos en memoria.
+BUCKETING = False # Si es True, los batches agrupan frases de longitud parecida y se rellenan solo hasta la más larga del batch.
 if __name__ == '__main__': 
     set_random_seed(0) # Fijamos las semillas de los generadores de números aleatorios usados para tener reproducibilidad.
-    data, textSize, vocSize = dataReader(0.1) # type: ignore # Los ficheros de entrenamiento y test a leer son fijos en la práctica. La capa de embeddings requiere enteros no normalizados.
-    trainerTester(createModel(vocSize, textSize), data, EPOCHS, 'textClassifier_Transformer') # El destino de los resultados generados también es fijo en la práctica.
\ No newline at end of file
+    data, textSize, vocSize, vectorizer = dataReader(0.1, pipeline = PIPELINE, bucketing = BUCKETING) # type: ignore # Los ficheros de entrenamiento y test a leer son fijos en la práctica. La capa de embeddings requiere enteros no normalizados.
+    trainerTester(createModel(vocSize, textSize), data, EPOCHS, 'textClassifier_Transformer', vectorizer, patience = PATIENCE) # El destino de los resultados generados también es fijo en la práctica.
\ No newline at end of file
@@ -4,8 +4,13 @@
 #-------------------------------------------------------------------------------
 
 # Importaciones requeridas.
-import pandas as pd, numpy as np
-from commonFunctions import cleanTexts, to_categorical, TextVectorization
+import pandas as pd, numpy as np, os, glob, tensorflow
+from commonFunctions import cleanTexts, to_categorical, TextVectorization, tf_data, bucketByLength
+
+NUM_CLASSES = 4 # Número de categorías de la colección de noticias.
+SEQ_LEN = 200 # Longitud de las secuencias de palabras de entrada a los modelos.
+SHARDS_DIR = 'data/shards' # Directorio donde se guardan los fragmentos (shards) ya limpios de los CSV.
+BUCKET_BOUNDARIES = [16, 32, 48, 64, 96, 128] # Límites de longitud de los grupos de secuencias cuando se agrupa por longitud.
 
 
 #-------------------------------------------------------------------------------
@@ -18,12 +23,108 @@ def __readDataframe(file):
     df.drop(['Title', 'Description'], axis=1, inplace=True)
     return df
 
+#-------------------------------------------------------------------------------
+# Devuelve los textos originales (sin limpiar) y las categorías del conjunto de test.
+# Se usa para probar los modelos exportados, que reciben directamente el texto.
+#-------------------------------------------------------------------------------
+def testTexts():
+    testDataset = __readDataframe('data/clasificacionTest.csv')
+    return testDataset['Text'].tolist(), testDataset['Class Index'].values
+
+#-------------------------------------------------------------------------------
+# Convierte un CSV de clasificación en fragmentos TFRecord con el texto ya limpio y la categoría.
+# El CSV se lee por bloques, por lo que no es necesario que quepa entero en memoria. La separación entre
+# entrenamiento y validación se hace aquí de forma explícita y reproducible (semilla fija), igual que la fracción de datos.
+# Los fragmentos se reutilizan en ejecuciones posteriores con los mismos parámetros.
+#-------------------------------------------------------------------------------
+def __writeShards(file, fraction, valSplit, chunkSize=10000):
+    name = os.path.splitext(os.path.basename(file))[0]
+    shardDir = f'{SHARDS_DIR}/{name}_f{fraction}_v{valSplit}'
+    if os.path.isdir(shardDir): return shardDir
+    os.makedirs(shardDir + '.tmp', exist_ok=True)
+
+    rng = np.random.default_rng(0)
+    for i, chunk in enumerate(pd.read_csv(file, index_col=False, chunksize=chunkSize)):
+        chunk = chunk[rng.random(len(chunk)) < fraction]
+        texts = cleanTexts((chunk['Title'] + '. ' + chunk['Description']).values)
+        isVal = rng.random(len(chunk)) < valSplit
+        writers = {split: tensorflow.io.TFRecordWriter(f'{shardDir}.tmp/{split}-{i:05d}.tfrecord') for split in ('train', 'val')}
+        for text, label, val in zip(texts, chunk['Class Index'].values, isVal):
+            example = tensorflow.train.Example(features=tensorflow.train.Features(feature={
+                'text': tensorflow.train.Feature(bytes_list=tensorflow.train.BytesList(value=[text.encode('utf-8')])),
+                'label': tensorflow.train.Feature(int64_list=tensorflow.train.Int64List(value=[int(label)]))}))
+            writers['val' if val else 'train'].write(example.SerializeToString())
+        for writer in writers.values(): writer.close()
+    # Se renombra al final para que una conversión interrumpida no se confunda con una completa.
+    os.rename(shardDir + '.tmp', shardDir)
+    return shardDir
+
+#-------------------------------------------------------------------------------
+# Lee en streaming los fragmentos de un tipo (train/val) y devuelve un dataset de pares (texto limpio, categoría).
+#-------------------------------------------------------------------------------
+def __readShards(shardDir, split):
+    features = {'text': tensorflow.io.FixedLenFeature([], tensorflow.string), 'label': tensorflow.io.FixedLenFeature([], tensorflow.int64)}
+    files = sorted(glob.glob(f'{shardDir}/{split}-*.tfrecord'))
+    ds = tf_data.TFRecordDataset(files, num_parallel_reads=tf_data.AUTOTUNE)
+    return ds.map(lambda record: tensorflow.io.parse_single_example(record, features), num_parallel_calls=tf_data.AUTOTUNE)
+
+#-------------------------------------------------------------------------------
+# Construye el pipeline de entrada de un conjunto de datos: vectoriza en paralelo dentro del pipeline, guarda en caché en disco
+# el resultado vectorizado, baraja con un buffer acotado (solo entrenamiento), agrupa en batches y solapa la preparación de
+# los siguientes batches con el entrenamiento (prefetch).
+# Si se agrupa por longitud (bucketing), las secuencias no se rellenan a SEQ_LEN sino a la más larga de su batch (con XLA,
+# al límite de su grupo, ver bucketByLength), y cada batch se forma con secuencias de longitud parecida. Así los modelos
+# LSTM y Transformer no gastan cálculo en el relleno.
+#-------------------------------------------------------------------------------
+def __buildPipeline(ds, vectorizer, normalize, vocabSize, batchSize, cacheFile, shuffleBuffer=None, bucketing=False):
+    def vectorize(example):
+        X = vectorizer(tensorflow.reshape(example['text'], [1]))[0][:SEQ_LEN]
+        # Igual que en memoria y en el modelo exportado, se normaliza respecto al tamaño del vocabulario.
+        if normalize: X = tensorflow.cast(X, tensorflow.float32) / (vocabSize - 1)
+        return X, tensorflow.one_hot(example['label'] - 1, NUM_CLASSES)
+    ds = ds.map(vectorize, num_parallel_calls=tf_data.AUTOTUNE).cache(cacheFile)
+    if shuffleBuffer: ds = ds.shuffle(shuffleBuffer, seed=0)
+    if bucketing:
+        ds = bucketByLength(ds, lambda X, y: tensorflow.shape(X)[0], BUCKET_BOUNDARIES, batchSize, SEQ_LEN)
+    else:
+        ds = ds.batch(batchSize)
+    return ds.prefetch(tf_data.AUTOTUNE)
+
+#-------------------------------------------------------------------------------
+# Versión en streaming de dataReader. Devuelve datasets de tf.data en vez de tensores en memoria, lo que permite entrenar
+# con colecciones mayores que la memoria disponible. La validación es un conjunto separado y no una fracción del entrenamiento.
+#-------------------------------------------------------------------------------
+def __pipelineDataReader(fraction, normalize, batchSize, valSplit, shuffleBuffer, bucketing):
+    trainDir = __writeShards('data/clasificacionEntrenamiento.csv', fraction, valSplit)
+    testDir = __writeShards('data/clasificacionTest.csv', 1, 0)
+
+    # El vectorizador se ajusta también en streaming, solo con los datos de entrenamiento.
+    # Con agrupamiento por longitud no se rellenan las secuencias, el relleno lo hace cada batch.
+    vectorizer = TextVectorization(max_tokens=None, output_mode='int', output_sequence_length=None if bucketing else SEQ_LEN)
+    vectorizer.adapt(__readShards(trainDir, 'train').map(lambda example: example['text']).batch(1024))
+    vocabSize = len(vectorizer.get_vocabulary())
+
+    # Cada caché depende de los parámetros de vectorización, por eso se guarda junto a los fragmentos y con un sufijo propio.
+    # El vocabulario se ajusta con los fragmentos de entrenamiento, así que la caché de test lleva también su nombre
+    # (fracción y validación): los fragmentos de test son los mismos para todos y se vectorizan con cada vocabulario.
+    cacheSuffix = f'_cache_n{int(normalize)}_b{int(bucketing)}'
+    testCacheSuffix = f'_{os.path.basename(trainDir)}{cacheSuffix}'
+    train_ds = __buildPipeline(__readShards(trainDir, 'train'), vectorizer, normalize, vocabSize, batchSize, trainDir + '/train' + cacheSuffix, shuffleBuffer, bucketing)
+    val_ds = __buildPipeline(__readShards(trainDir, 'val'), vectorizer, normalize, vocabSize, batchSize, trainDir + '/val' + cacheSuffix, bucketing=bucketing)
+    test_ds = __buildPipeline(__readShards(testDir, 'train'), vectorizer, normalize, vocabSize, batchSize, testDir + '/test' + testCacheSuffix, bucketing=bucketing)
+    return (train_ds, val_ds, test_ds), SEQ_LEN, vocabSize, vectorizer
+
 #-------------------------------------------------------------------------------
 # Devuelve los datos de entrenamiento y test del clasificador de texto, limpios, segmentados, transformados a codificación numérica y
 # normalizados entre 0 y 1 cuando es necesario. Las categorías las convierte a la representación one-hot.
 # Selecciona un fracción de los datos (aleatorio). Esto esta hecho en el ejercicio para que el entrenamiento sea más rápido a costa de precisión.
+# Con pipeline=True devuelve datasets de tf.data (entrenamiento, validación y test) leídos en streaming en vez de tensores en memoria.
+# Con bucketing=True además agrupa las secuencias por longitud y las rellena solo hasta la más larga de cada batch. Solo se
+# puede hacer con tf.data, por lo que implica pipeline=True. No sirve para la red densa, que necesita una longitud de entrada fija.
 #-------------------------------------------------------------------------------
-def dataReader(fraction = 1, normalize = False):
+def dataReader(fraction = 1, normalize = False, pipeline = False, batchSize = 64, valSplit = 0.2, shuffleBuffer = 10000, bucketing = False):
+    if pipeline or bucketing: return __pipelineDataReader(fraction, normalize, batchSize, valSplit, shuffleBuffer, bucketing)
+
     # Cargamos los datos de entrenamiento y test.
     trainingDataset = __readDataframe('data/clasificacionEntrenamiento.csv')
     trainingDataset = trainingDataset.sample(frac=fraction, random_state=0)
@@ -34,7 +135,7 @@ def dataReader(fraction = 1, normalize = False):
     X_test = cleanTexts(testDataset['Text'].values)
     
     #Convertimos el texto en secuencias numéricas y las categorías a representación one-hot.
-    vectorizer = TextVectorization(max_tokens=None,output_mode='int', output_sequence_length=200)
+    vectorizer = TextVectorization(max_tokens=None,output_mode='int', output_sequence_length=SEQ_LEN)
     vectorizer.adapt(X_train)
     X_train = vectorizer(X_train)
     X_test = vectorizer(X_test)
@@ -42,10 +143,13 @@ def dataReader(fraction = 1, normalize = False):
     y_test = to_categorical(testDataset['Class Index'].values - 1) # type: ignore
     
     
-    # Si hay que normalizar las Xs, las pasamos al rango 0-1.
+    # Si hay que normalizar las Xs, las pasamos al rango 0-1 respecto al tamaño del vocabulario, igual que en el pipeline y
+    # en el modelo exportado, para que entrenamiento, test e inferencia usen la misma escala.
+    vocabSize = len(vectorizer.get_vocabulary())
     if normalize:
-        X_train = (X_train - np.min(X_train)) / (np.max(X_train) - np.min(X_train))
-        X_test = (X_test - np.min(X_test)) / (np.max(X_test) - np.min(X_test))
+        X_train = tensorflow.cast(X_train, tensorflow.float32) / (vocabSize - 1)
+        X_test = tensorflow.cast(X_test, tensorflow.float32) / (vocabSize - 1)
     
-    # Se devuelven las colecciones de entrenamiento y test empaquetadas, la longitud  de las frases de entrada, y el vocabulario de palabras conocidas.                
-    return (X_train, y_train, X_test, y_test), len(X_train[0]), len(vectorizer.get_vocabulary())
\ No newline at end of file
+    # Se devuelven las colecciones de entrenamiento y test empaquetadas, la longitud  de las frases de entrada, el vocabulario de palabras conocidas
+    # y el vectorizador, necesario para clasificar textos nuevos con el modelo entrenado.                
+    return (X_train, y_train, X_test, y_test), len(X_train[0]), vocabSize, vectorizer
\ No newline at end of file
@@ -0,0 +1,112 @@
+#-------------------------------------------------------------------------------
+# Exportación de los clasificadores de texto a un modelo de inferencia cuantizado (int8 de rango dinámico) y
+# clasificador ligero que lo usa para predecir directamente a partir de textos.
+# Incluye la comparación de latencia, throughput y precisión respecto al modelo original en float.
+#-------------------------------------------------------------------------------
+
+# Importaciones requeridas.
+import numpy as np, os, json, time, tempfile
+from commonFunctions import cleanTexts, tensorflow, TextVectorization, ExportArchive, LSTM, clone_model
+
+EXPORT_BATCH = 64 # Tamaño de batch fijo de los modelos con capas recurrentes, que no se pueden convertir con batch variable.
+MODEL_FILE = 'modelo_int8.tflite' # Modelo cuantizado.
+CONFIG_FILE = 'inferencia.json' # Vocabulario y parámetros de preprocesado necesarios para la inferencia.
+
+#-------------------------------------------------------------------------------
+# Exporta el modelo entrenado a TFLite cuantizando sus pesos a int8 (cuantización de rango dinámico) y guarda junto a él
+# el vocabulario del vectorizador, de modo que el directorio contiene todo lo necesario para clasificar textos.
+# Las entradas de la red densa están normalizadas respecto al tamaño del vocabulario.
+# Los modelos entrenados con precisión mixta se exportan en float32 (sus pesos ya están en float32) antes de cuantizarlos.
+#-------------------------------------------------------------------------------
+def exportQuantized(model, vectorizer, dir, seqLen, normalize=False):
+    if model.dtype_policy.name != 'float32':
+        floatModel = clone_model(model, clone_function=lambda layer: layer.__class__.from_config({**layer.get_config(), 'dtype': 'float32'}))
+        floatModel.set_weights(model.get_weights())
+        model = floatModel
+    batchSize = EXPORT_BATCH if any(isinstance(layer, LSTM) for layer in model.layers) else None
+    dtype = tensorflow.float32 if normalize else tensorflow.int64
+    with tempfile.TemporaryDirectory() as savedModelDir:
+        archive = ExportArchive()
+        archive.track(model)
+        archive.add_endpoint('serve', lambda x: model(x, training=False), input_signature=[tensorflow.TensorSpec([batchSize, seqLen], dtype)])
+        archive.write_out(savedModelDir, verbose=False)
+        converter = tensorflow.lite.TFLiteConverter.from_saved_model(savedModelDir)
+        converter.optimizations = [tensorflow.lite.Optimize.DEFAULT]
+        with open(dir + '/' + MODEL_FILE, 'wb') as f: f.write(converter.convert())
+    with open(dir + '/' + CONFIG_FILE, 'w', encoding='utf-8') as f:
+        json.dump({'seqLen': seqLen, 'normalize': normalize, 'batchSize': batchSize, 'vocabulary': vectorizer.get_vocabulary()}, f, ensure_ascii=False)
+    return dir + '/' + MODEL_FILE
+
+#-------------------------------------------------------------------------------
+# Clasificador de textos que usa el modelo cuantizado exportado. Aplica la misma limpieza y vectorización que en el
+# entrenamiento y clasifica en batches.
+#-------------------------------------------------------------------------------
+class TextClassifier:
+    def __init__(self, dir):
+        with open(dir + '/' + CONFIG_FILE, encoding='utf-8') as f:
+            config = json.load(f)
+        self.seqLen, self.normalize, self.batchSize = config['seqLen'], config['normalize'], config['batchSize']
+        self.vocabSize = len(config['vocabulary'])
+        self.vectorizer = TextVectorization(vocabulary=config['vocabulary'], output_mode='int', output_sequence_length=self.seqLen)
+        # Se usa el intérprete de LiteRT si está instalado, si no el incluido en tensorflow.
+        try:
+            from ai_edge_litert.interpreter import Interpreter # type: ignore
+        except ImportError:
+            Interpreter = tensorflow.lite.Interpreter
+        self.interpreter = Interpreter(model_path=dir + '/' + MODEL_FILE, num_threads=os.cpu_count())
+        self.input = self.interpreter.get_input_details()[0]
+        self.output = self.interpreter.get_output_details()[0]['index']
+        self.currentBatch = None
+
+    # Limpia y vectoriza los textos igual que en el entrenamiento.
+    def vectorize(self, texts):
+        X = self.vectorizer(cleanTexts(texts)).numpy()
+        return X / (self.vocabSize - 1) if self.normalize else X
+
+    # Ejecuta el modelo sobre un batch ya vectorizado. Si el modelo tiene batch fijo se rellena el último batch.
+    def __invoke(self, X):
+        n = len(X)
+        if self.batchSize: X = np.concatenate([X, np.zeros((self.batchSize - n, self.seqLen), X.dtype)])
+        if X.shape[0] != self.currentBatch:
+            self.interpreter.resize_tensor_input(self.input['index'], X.shape)
+            self.interpreter.allocate_tensors()
+            self.currentBatch = X.shape[0]
+        self.interpreter.set_tensor(self.input['index'], X.astype(self.input['dtype']))
+        self.interpreter.invoke()
+        return self.interpreter.get_tensor(self.output)[:n]
+
+    # Clasifica en batches secuencias ya vectorizadas.
+    def predict_vectors(self, X, batchSize=None):
+        batchSize = self.batchSize or batchSize or EXPORT_BATCH
+        return np.concatenate([self.__invoke(X[i:i + batchSize]) for i in range(0, len(X), batchSize)])
+
+    # Devuelve la probabilidad de cada categoría para cada uno de los textos.
+    def predict_texts(self, texts, batchSize=256):
+        return self.predict_vectors(self.vectorize(texts), batchSize)
+
+#-------------------------------------------------------------------------------
+# Compara el modelo original (float) con el cuantizado sobre los mismos textos ya vectorizados: precisión, latencia de
+# un texto (mediana de 100 textos clasificados de uno en uno), throughput en batch y tamaño del modelo en disco.
+# Devuelve las líneas de texto con el resultado para guardarlas en testResults.txt.
+#-------------------------------------------------------------------------------
+def compareInference(model, classifier, texts, labels, dir):
+    X = classifier.vectorize(texts)
+    y = np.asarray(labels) - 1
+
+    def measure(predictOne, predictAll):
+        predictOne(X[:1]) # La primera llamada incluye la preparación del modelo y no se mide.
+        latencies = []
+        for i in range(min(100, len(X))):
+            start = time.perf_counter(); predictOne(X[i:i + 1]); latencies.append(time.perf_counter() - start)
+        start = time.perf_counter(); predictions = predictAll(X); duration = time.perf_counter() - start
+        return np.mean(np.argmax(predictions, axis=1) == y), np.median(latencies) * 1000, len(X) / duration
+
+    floatResults = measure(lambda x: model(x, training=False), lambda x: model.predict(x, batch_size=256, verbose=0))
+    int8Results = measure(classifier.predict_vectors, lambda x: classifier.predict_vectors(x, 256))
+    floatSize = os.path.getsize(dir + '/modelo.keras') / 2**20
+    int8Size = os.path.getsize(dir + '/' + MODEL_FILE) / 2**20
+
+    lines = ['{:<12} {:>10} {:>14} {:>16} {:>10}'.format('Model', 'Accuracy', 'Latency (ms)', 'Throughput (t/s)', 'Size (MB)')]
+    for name, (accuracy, latency, throughput), size in [('float32', floatResults, floatSize), ('int8', int8Results, int8Size)]:
+        lines.append('{:<12} {:>10.2%} {:>14.2f} {:>16.0f} {:>10.2f}'.format(name, accuracy, latency, throughput, size))
+    return lines
@@ -4,42 +4,69 @@
 
 # Importaciones requeridas.
 import numpy as np, os
-from commonFunctions import Chronometer, saveResults
+from commonFunctions import Chronometer, EpochTimer, saveResults, configureModel, trainingCallbacks, trainedEpochs, tf_data
+from textClassifier__DataReader import testTexts, SEQ_LEN
+from textClassifier__Exporter import exportQuantized, compareInference, TextClassifier
 
 #-------------------------------------------------------------------------------
 # Método para entrenar un modelo, con los datos pasados como parámetro, y cierto número de epoch.
 # El modelo y métricas de entrenamiento y test, los deja en el directorio indicado por parámetro.
+# Los datos pueden ser los tensores en memoria o los datasets de tf.data que devuelve dataReader con pipeline=True.
+# Si se pasa el vectorizador, se exporta además el modelo cuantizado para inferencia y se compara con el original.
+# El entrenamiento se puede reanudar si se interrumpe y, con patience, se para antes si la validación deja de mejorar.
 #-------------------------------------------------------------------------------
-def trainerTester(model, data, epochs, dir):
+def trainerTester(model, data, epochs, dir, vectorizer=None, normalize=False, patience=None):
     # Se crea una carpeta donde guardar los resultados.
     dir='results/'+dir
     os.makedirs(dir, exist_ok=True)
     
     # Separamos los datos de entrenamiento y test del conjunto pasado como parámetro. 
     # Los datos que le llegan no están normalizados, ya que la capa de embeddings requiere que cada palabra sea un entero distinto.
-    X_train, y_train, X_test, y_test = data
+    # Con datasets de tf.data la validación es un conjunto separado y el ejemplo de clasificación se toma del primer batch de test.
+    pipeline = isinstance(data[0], tf_data.Dataset)
+    if pipeline:
+        train_ds, val_ds, test_ds = data
+    else:
+        X_train, y_train, X_test, y_test = data
     
     print('----------------------------------------------------')
     print('Training the model')
     print('----------------------------------------------------')
     print('-     -     -     -     -     -     -     -     -     ')
-    # Entrenamos el modelo con los datos disponibles.
+    # Entrenamos el modelo con los datos disponibles, con la configuración del perfil de entrenamiento activo.
+    # Se mide también el tiempo de cada epoch.
+    configureModel(model)
+    epochTimer = EpochTimer()
+    callbacks = [epochTimer] + trainingCallbacks(dir, patience)
     with Chronometer() as chronometer:
-        history = model.fit(X_train, y_train, epochs=epochs, batch_size=64, validation_split=0.2, verbose=0)         
+        if pipeline:
+            history = model.fit(train_ds, epochs=epochs, validation_data=val_ds, verbose=0, callbacks=callbacks)
+        else:
+            history = model.fit(X_train, y_train, epochs=epochs, batch_size=64, validation_split=0.2, verbose=0, callbacks=callbacks)         
 
     # Guardamos el modelo y los resultados del entrenamiento.
     saveResults(model, history, chronometer.message, dir)
     with open(dir+'/testResults.txt', 'a', encoding='utf-8', errors='ignore') as f:
         printAll = lambda *args: (print(*args), print(*args, file=f))
+        printAll('Mean epoch time: ' + epochTimer.message())
+        printAll(f'Epochs trained: {trainedEpochs(model, history)} of {epochs}')
         
         #Guardamos la precisión del modelo en el test set.
-        scores = model.evaluate(X_test, y_test, verbose=0)
+        scores = model.evaluate(test_ds, verbose=0) if pipeline else model.evaluate(X_test, y_test, verbose=0)
         printAll('Model precision: {:.2%}'.format(scores[1])) 
+        if pipeline: X_test, y_test = next(iter(test_ds.take(1)))
         
         # Guardamos un ejemplo de una clasificación.
         printAll('Classification result of first element in test set')
         printAll('Real category: ', np.argmax(y_test[0]) + 1, ' Predicted Category: ',
                 np.argmax(model.predict(np.expand_dims(X_test[0], axis=0), verbose=0)[0]) + 1)
+        
+        # Exportamos el modelo cuantizado y lo comparamos con el original sobre el test set.
+        if vectorizer is not None:
+            exportQuantized(model, vectorizer, dir, SEQ_LEN, normalize)
+            texts, labels = testTexts()
+            printAll('Quantized inference model (int8) compared to the original model:')
+            for line in compareInference(model, TextClassifier(dir), texts, labels, dir): printAll(line)
         print('')
         
         
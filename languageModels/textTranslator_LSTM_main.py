@@ -39,10 +39,12 @@ def createModel(vocabSize):
 # Carga de datos, entrenamiento y test del modelo anteriormente definido.
 #-------------------------------------------------------------------------------
 EPOCHS = 30 # Número de iteraciones en los datos a entrenar. Necesita GPU para grandes datasets
+PATIENCE = 3 # Epochs sin mejorar el error de validación tras los que se para el entrenamiento.
 VOC_SIZE = 15000 # Tamaño del diccionario de palabras.
 LONG_SEQ = 20 # Longitud de las frases.
+BUCKETING = False # Si es True, los batches agrupan frases de longitud parecida y se rellenan solo hasta la más larga del batch.
 if __name__ == "__main__":
     set_random_seed(42)
-    train_ds, val_ds, eng_vec, spa_vec, test_df = dataReader(VOC_SIZE, LONG_SEQ)
+    train_ds, val_ds, eng_vec, spa_vec, test_df = dataReader(VOC_SIZE, LONG_SEQ, BUCKETING)
     model = createModel(VOC_SIZE)
-    trainerTester(model, train_ds, val_ds, EPOCHS, 'textTranslator_LSTM', spa_vec, eng_vec, test_df) 
\ No newline at end of file
+    trainerTester(model, train_ds, val_ds, EPOCHS, 'textTranslator_LSTM', spa_vec, eng_vec, test_df, PATIENCE) 
\ No newline at end of file
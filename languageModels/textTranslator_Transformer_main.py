@@ -54,10 +54,12 @@ def createModel(vocabSize, seqLen):
 # Carga de datos, entrenamiento y test del modelo anteriormente definido.
 #-------------------------------------------------------------------------------
 EPOCHS = 30 # Número de iteraciones en los datos a entrenar. Necesita GPU
+PATIENCE = 3 # Epochs sin mejorar el error de validación tras los que se para el entrenamiento.
 VOC_SIZE = 15000 # Tamaño del diccionario de palabras. Si son más palabras, se puede perder.
 LONG_SEQ = 20 # Longitud de las frases.
+BUCKETING = False # Si es True, los batches agrupan frases de longitud parecida y se rellenan solo hasta la más larga del batch.
 if __name__ == "__main__":
     set_random_seed(42) # Fijamos las semillas de los generadores de números aleatorios usados para tener reproducibilidad.
-    train_ds, val_ds, eng_vec, spa_vec, test_df = dataReader(VOC_SIZE, LONG_SEQ) # El fichero con los datos es fijo en la práctica
+    train_ds, val_ds, eng_vec, spa_vec, test_df = dataReader(VOC_SIZE, LONG_SEQ, BUCKETING) # El fichero con los datos es fijo en la práctica
     model = createModel(VOC_SIZE, LONG_SEQ)
-    trainerTester(model, train_ds, val_ds, EPOCHS, 'textTranslator_Transformer', spa_vec, eng_vec, test_df)
+    trainerTester(model, train_ds, val_ds, EPOCHS, 'textTranslator_Transformer', spa_vec, eng_vec, test_df, PATIENCE)
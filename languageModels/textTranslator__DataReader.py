@@ -5,8 +5,11 @@
 
 # Importaciones requeridas.
 import pandas as pd
-from commonFunctions import cleanTexts, tf_data, TextVectorization
+from commonFunctions import cleanTexts, tf_data, TextVectorization, bucketByLength
 from sklearn.model_selection import train_test_split
+import tensorflow
+
+BUCKET_BOUNDARIES = [6, 8, 10, 12, 15] # Límites de longitud de los grupos de frases cuando se agrupa por longitud.
 
 #-------------------------------------------------------------------------------
 # Método para leer los ficheros tabulares del ejemplo de traducción (Inglés, Español)
@@ -24,13 +27,27 @@ def __readDataframe(file_path, val_split=0.15, test_split=0.15, random_state=42)
     train_df, val_df = train_test_split(train_val_df, test_size=val_split / (1 - test_split), random_state=random_state)
     return train_df, val_df, test_df
 
+#-------------------------------------------------------------------------------
+# Organiza en batches las frases agrupándolas por longitud. Se quita el relleno de los vectorizadores y cada batch
+# se rellena solo hasta la frase más larga que contiene, de modo que el modelo no procesa posiciones vacías.
+#-------------------------------------------------------------------------------
+def __bucketedDataset(eng_vectorized, spa_vectorized, batch_size):
+    eng = tensorflow.RaggedTensor.from_tensor(eng_vectorized, padding=0)
+    spa = tensorflow.RaggedTensor.from_tensor(spa_vectorized, padding=0)
+    ds = tf_data.Dataset.from_tensor_slices((eng, spa))
+    ds = ds.map(lambda e, s: ({"encoder_inputs": e, "decoder_inputs": s[:-1]}, s[1:]), num_parallel_calls=tf_data.AUTOTUNE)
+    length = lambda inputs, targets: tensorflow.maximum(tensorflow.shape(inputs["encoder_inputs"])[0], tensorflow.shape(targets)[0])
+    maxLength = max(eng_vectorized.shape[1], spa_vectorized.shape[1] - 1) # El objetivo no tiene la primera palabra ([start])
+    return bucketByLength(ds, length, BUCKET_BOUNDARIES, batch_size, maxLength).prefetch(tf_data.AUTOTUNE)
+
 #-------------------------------------------------------------------------------
 # Método convertir los textos de ingles y español en vectores numéricos
 #-------------------------------------------------------------------------------
-def __vectorizeModelInput(df, batch_size, eng_vec, spa_vec):
+def __vectorizeModelInput(df, batch_size, eng_vec, spa_vec, bucketing=False):
     # Vectorizamos los textos
     eng_vectorized = eng_vec(df['English'].tolist())
     spa_vectorized = spa_vec(df['Spanish'].tolist())
+    if bucketing: return __bucketedDataset(eng_vectorized, spa_vectorized, batch_size)
     
     # Crear las entradas del modelo. Encoder: Inglés, Decoder: Español (Sin start). Target: Español (Sin end).
     # El decoder_input se usa en el entrenamiento como entrada del decoder (contexto de la siguiente palabra a predecir)
@@ -48,8 +65,9 @@ def __vectorizeModelInput(df, batch_size, eng_vec, spa_vec):
 # Devuelve los datos de entrenamiento, validación y test del traductor de texto, limpios, segmentados, transformados a codificación numérica.
 # También devuelve los vectorizadores usados para hacer la transformación inversa.
 # A pesar del coste de entrenamiento, es necesario utilizar todos los datos para que el modelo aprenda minimamente bien.
+# Con bucketing=True los batches agrupan frases de longitud parecida y se rellenan solo hasta la más larga de cada batch.
 #-------------------------------------------------------------------------------
-def dataReader(vocabSize, seqLen):
+def dataReader(vocabSize, seqLen, bucketing=False):
     BATCH_SIZE = 64
     # Cargamos los datos de entrenamiento y test.
     train_df, val_df, test_df = __readDataframe('data/traductorFrasesEnEs.csv')
@@ -61,8 +79,8 @@ def dataReader(vocabSize, seqLen):
     spa_vec.adapt(train_df['Spanish']) # type: ignore
     
     # Crear datasets optimizados directamente desde los DataFrames
-    train_ds = __vectorizeModelInput(train_df, BATCH_SIZE, eng_vec, spa_vec)
-    val_ds = __vectorizeModelInput(val_df, BATCH_SIZE, eng_vec, spa_vec)
+    train_ds = __vectorizeModelInput(train_df, BATCH_SIZE, eng_vec, spa_vec, bucketing)
+    val_ds = __vectorizeModelInput(val_df, BATCH_SIZE, eng_vec, spa_vec, bucketing)
     
     # Devuelve las colecciones de entrenamiento y validación vectorizadas, los vectorizadores y el dataframe de test.
     return train_ds, val_ds, eng_vec, spa_vec, test_df
\ No newline at end of file
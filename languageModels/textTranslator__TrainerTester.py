@@ -4,7 +4,7 @@
 
 # Importaciones requeridas.
 import numpy as np, os, random
-from commonFunctions import Chronometer, saveResults
+from commonFunctions import Chronometer, EpochTimer, saveResults, configureModel, trainingCallbacks, trainedEpochs
 
 #-------------------------------------------------------------------------------
 # Traduce una sentencia del ingles al español usando el modelo y los vectorizadores.
@@ -49,8 +49,9 @@ def evaluate_translator_accuracy(model, spa_vec, eng_vec, test_df, sample_size=N
 #-------------------------------------------------------------------------------
 # Método para entrenar un modelo, con los datos pasados como parámetro, y cierto número de epoch.
 # El modelo y métricas de entrenamiento y test, los deja en el directorio indicado por parámetro.
+# El entrenamiento se puede reanudar si se interrumpe y, con patience, se para antes si la validación deja de mejorar.
 #-------------------------------------------------------------------------------
-def trainerTester(model, train_ds, val_ds, epochs, dir, spa_vec, eng_vec, test_df):
+def trainerTester(model, train_ds, val_ds, epochs, dir, spa_vec, eng_vec, test_df, patience=None):
     # Se crea una carpeta donde guardar los resultados.
     dir='results/'+dir
     os.makedirs(dir, exist_ok=True)
@@ -59,9 +60,12 @@ def trainerTester(model, train_ds, val_ds, epochs, dir, spa_vec, eng_vec, test_d
     print('Training the model')
     print('----------------------------------------------------')
     print('-     -     -     -     -     -     -     -     -     ')
-    # Entrenamos el modelo con los datos disponibles.
+    # Entrenamos el modelo con los datos disponibles, con la configuración del perfil de entrenamiento activo.
+    # Se mide también el tiempo de cada epoch.
+    configureModel(model)
+    epochTimer = EpochTimer()
     with Chronometer() as chronometer:
-        history = model.fit(train_ds, epochs=epochs, validation_data=val_ds) # verbose=0)
+        history = model.fit(train_ds, epochs=epochs, validation_data=val_ds, callbacks=[epochTimer] + trainingCallbacks(dir, patience)) # verbose=0)
 
     # Guardamos el modelo y los resultados del entrenamiento.
     saveResults(model, history, chronometer.message, dir)
@@ -69,6 +73,8 @@ def trainerTester(model, train_ds, val_ds, epochs, dir, spa_vec, eng_vec, test_d
     # Traduce 5 frases aleatorias de test_df y muestra todas juntas
     with open(dir+'/testResults.txt', 'a', encoding='utf-8', errors='ignore') as f:
         printAll = lambda *args: (print(*args), print(*args, file=f))
+        printAll('Mean epoch time: ' + epochTimer.message())
+        printAll(f'Epochs trained: {trainedEpochs(model, history)} of {epochs}')
         
         # Precisión del modelo en el test set.
         accuracy = evaluate_translator_accuracy(model, spa_vec, eng_vec, test_df, sample_size=200)
@@ -5,8 +5,10 @@
 # definirlos manualmente.
 # ------------------------------------------------------
 import os
+import re
+from functools import lru_cache
 from rdflib import Graph, URIRef, Literal
-from rdflib.namespace import FOAF, RDF, Namespace
+from rdflib.namespace import FOAF, RDF, DC, DCTERMS, Namespace
 
 # ------------------------------------------------------
 # Creación de un grafo RDF de cero, definiendo las URIs de todos los elementos explícitamente
@@ -70,6 +72,117 @@ def createGraphPredefined():
     model.add((louise, FOAF.knows, marc))
     return model
 
+# ------------------------------------------------------
+# Creación masiva de grafos a partir de registros (filas de un CSV, registros Dublin Core...)
+# Añadir las tripletas de una en una y crear los mismos URIRef en cada llamada es lento para grafos de millones de tripletas.
+# ------------------------------------------------------
+
+BATCH_SIZE = 10000 # Tripletas que se añaden al grafo de una vez
+INVALID_IRI = re.compile(r'[\x00-\x20<>"{}|^`\\]') # Caracteres que no pueden aparecer en una IRI de N-Triples
+NAMESPACES = {'rdf': RDF, 'foaf': FOAF, 'dc': DC, 'dcterms': DCTERMS, 'ex': Namespace(BASE_URI)} # Prefijos de los predicados
+
+# Escribe un texto como literal de N-Triples (entre comillas y con los caracteres especiales escapados).
+def ntLiteral(value, lang=None):
+    text = '"' + value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n').replace('\r', '\\r') + '"'
+    return text + '@' + lang if lang else text
+
+# Constructor de grafos a partir de registros. Cada registro es un diccionario campo -> valor (o lista de valores).
+# El sujeto de las tripletas de un registro se obtiene del campo subject_field (si no es una URI se le añade base_uri delante)
+# y cada campo con predicado genera una tripleta por valor con el valor como literal. El predicado de un campo es el indicado
+# en mapping o, sin mapping, el propio nombre del campo si tiene la forma prefijo:nombre ('dc:title', 'foaf:name'...).
+# Los campos sin predicado se ignoran. Los predicados se crean una sola vez, y los literales repetidos se reutilizan.
+# Las tripletas se pueden añadir a un grafo por bloques (addN) o escribir directamente en N-Triples sin crear el grafo.
+class BulkGraphBuilder:
+    def __init__(self, subject_field, mapping=None, rdf_type=None, lang=None, base_uri=BASE_URI, namespaces=NAMESPACES, batch_size=BATCH_SIZE):
+        self.subject_field = subject_field
+        self.mapping = mapping
+        self.rdf_type = rdf_type
+        self.lang = lang
+        self.base_uri = base_uri
+        self.namespaces = namespaces
+        self.batch_size = batch_size
+        self.predicates = {} # Predicado de cada campo ya usado (None si el campo no tiene predicado)
+        self.ntPredicates = {} # Lo mismo en formato N-Triples
+
+    # Predicado de un campo.
+    def predicate(self, field):
+        if field not in self.predicates:
+            name = self.mapping.get(field) if self.mapping is not None else field
+            prefix, _, local = (name or '').partition(':')
+            if prefix in self.namespaces: self.predicates[field] = self.namespaces[prefix][local]
+            elif prefix in ['http', 'https']: self.predicates[field] = URIRef(name)
+            else: self.predicates[field] = None
+            self.ntPredicates[field] = self.predicates[field] and self.predicates[field].n3()
+        return self.predicates[field]
+
+    # URI del sujeto de un registro. Se rechazan las URIs con caracteres no válidos, que darían N-Triples incorrectos.
+    def subject(self, record):
+        id = record[self.subject_field]
+        uri = id if id.startswith(('http://', 'https://')) else self.base_uri + id
+        if INVALID_IRI.search(uri): raise ValueError(f'Invalid subject IRI {uri!r}')
+        return uri
+
+    # Valores de un campo, que puede tener un valor o una lista. Los valores vacíos se ignoran.
+    @staticmethod
+    def __values(values):
+        return [value for value in (values if isinstance(values, (list, tuple)) else [values]) if value is not None and value != '']
+
+    @staticmethod
+    @lru_cache(maxsize=100000, typed=True) # typed: 1, 1.0 y True son literales distintos
+    def __literal(value, lang):
+        return Literal(value, lang=lang if isinstance(value, str) else None)
+
+    # Tripletas de un registro.
+    def triples(self, record):
+        subject = URIRef(self.subject(record))
+        if self.rdf_type is not None: yield subject, RDF.type, self.rdf_type
+        for field, values in record.items():
+            predicate = self.predicate(field)
+            if predicate is not None:
+                for value in self.__values(values):
+                    yield subject, predicate, self.__literal(value, self.lang)
+
+    # Añade al grafo las tripletas de los registros por bloques. Devuelve el número de tripletas añadidas.
+    def addToGraph(self, model, records):
+        batch, count = [], 0
+        for record in records:
+            batch.extend((s, p, o, model) for s, p, o in self.triples(record))
+            if len(batch) >= self.batch_size:
+                model.addN(batch)
+                count += len(batch)
+                batch = []
+        model.addN(batch)
+        return count + len(batch)
+
+    # Líneas N-Triples de un registro, generadas directamente como texto sin crear los términos de RDFLIB.
+    # Los valores repetidos de un campo darían tripletas repetidas, que solo se escriben una vez.
+    def ntLines(self, record):
+        subject = '<' + self.subject(record) + '> '
+        lines = [subject + RDF.type.n3() + ' ' + self.rdf_type.n3() + ' .\n'] if self.rdf_type is not None else []
+        for field, values in record.items():
+            if self.predicate(field) is not None:
+                prefix = subject + self.ntPredicates[field] + ' '
+                for value in self.__values(values):
+                    if isinstance(value, str): lines.append(prefix + ntLiteral(value, self.lang) + ' .\n')
+                    else: lines.append(prefix + self.__literal(value, None).n3() + ' .\n') # Números, fechas...
+        return list(dict.fromkeys(lines))
+
+    # Escribe en un fichero N-Triples las tripletas de los registros a medida que se generan, sin guardarlas en memoria.
+    # Devuelve el número de tripletas escritas (las de registros distintos con el mismo sujeto pueden repetirse).
+    def writeNTriples(self, file, records):
+        count = 0
+        with open(file, 'w', encoding='utf-8', buffering=1 << 20) as f:
+            for record in records:
+                lines = self.ntLines(record)
+                f.writelines(lines)
+                count += len(lines)
+        return count
+
+# Registros de ejemplo con los datos de personas de los ejemplos anteriores.
+PEOPLE = [{'id': 'MarcSmith', 'name': 'Marc Smith', 'givenName': 'Marc', 'familyName': 'Smith'},
+          {'id': 'LouiseDoe', 'name': 'Louise Doe', 'givenName': 'Louise', 'familyName': 'Doe'}]
+PEOPLE_MAPPING = {'name': 'foaf:name', 'givenName': 'foaf:givenName', 'familyName': 'foaf:familyName'}
+
 # ------------------------------------------------------
 # Función main que crea los dos grafos anteriores, uno lo muestra en pantalla y el otro lo guarda en fichero,
 # para posteriormente cargarlo y mostrarlo por pantalla.
@@ -93,3 +206,15 @@ if __name__ == "__main__":
     model3.parse(outputDir+"foafGraph.ttl", format="turtle")
     print(model3.serialize(format="turtle"))
 
+    print('----------------------------------------------------')
+    print('Modelo creado en bloque a partir de registros')
+    print('----------------------------------------------------')
+    builder = BulkGraphBuilder('id', PEOPLE_MAPPING, rdf_type=FOAF.Person)
+    model4 = Graph()
+    model4.bind("ex", Namespace(BASE_URI))
+    builder.addToGraph(model4, PEOPLE)
+    print(model4.serialize(format="turtle"))
+    # Los mismos registros escritos directamente en N-Triples, sin pasar por un grafo.
+    count = builder.writeNTriples(outputDir+"foafGraph.nt", PEOPLE)
+    print(f'{count} tripletas escritas en {outputDir}foafGraph.nt')
+
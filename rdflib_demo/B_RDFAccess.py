@@ -2,7 +2,27 @@
 # Este programa muestra como recorrer un grafo RDF via API y mediante consultas SPARQL.
 # ------------------------------------------------------
 
+import os
 from rdflib import Graph, URIRef, Literal
+from sqliteStore import persistentGraph
+from rdflib.plugins.sparql import prepareQuery
+from queryProfiler import QueryProfiler
+
+# Las consultas SPARQL se ejecutan con un perfilador, que mide el coste de cada una. Las que tardan más de
+# SLOW_QUERY_SECONDS se guardan en QUERY_LOG (JSON lines) y al final se muestra un resumen de todas.
+QUERY_LOG = "results/slowQueries.jsonl"
+SLOW_QUERY_SECONDS = 0.01
+profiler = QueryProfiler(QUERY_LOG, SLOW_QUERY_SECONDS)
+
+# Consultas preparadas: cada texto de consulta se analiza y traduce al álgebra de SPARQL una sola vez, la primera vez
+# que se usa, y las siguientes ejecuciones solo lo evalúan. Los valores de la consulta no se insertan en el texto sino
+# que se asocian a sus variables al ejecutarla (initBindings), lo que además evita la inyección de código.
+PREPARED_QUERIES = {}
+
+def prepared(query):
+    if query not in PREPARED_QUERIES:
+        PREPARED_QUERIES[query] = prepareQuery(query)
+    return PREPARED_QUERIES[query]
 
 # ------------------------------------------------------
 # Búsqueda recorriendo el grafo mediante el API.
@@ -56,7 +76,7 @@ def searchLiteralTriplesSPARQL(model):
         FILTER isLiteral(?o)
     }
     """
-    results = model.query(query)
+    results = profiler.query(model, prepared(query))
     for row in results:
         print(f"{row.s} - {row.p} - {row.o}")
     print("----------------------------------------")
@@ -71,7 +91,7 @@ def searchTriplesOfSubjectSPARQL(model, resource_uri):
     }
     """
     # En la consulta se asocia una variable (?subject) a un valor en el programa.
-    results = model.query(query, initBindings={'subject': resource_uri})
+    results = profiler.query(model, prepared(query), initBindings={'subject': resource_uri})
     for row in results:
         print(f"{resource_uri} - {row.p} - {row.o}")
     print("----------------------------------------")
@@ -87,7 +107,7 @@ def searchTriplesOfPredicateSPARQL(model, prop):
         FILTER isLiteral(?o)
     }
     """
-    results = model.query(query, initBindings={'predicate': prop})
+    results = profiler.query(model, prepared(query), initBindings={'predicate': prop})
     for row in results:
         print(f"{row.s} - {prop} - {row.o}")
     print("----------------------------------------")
@@ -96,8 +116,8 @@ def searchTriplesOfPredicateSPARQL(model, prop):
 # del recurso indicado. Esta consulta devuelve un grafo RDF, no una lista de resultados
 def describeAResource(model, subject):
     print(f"Contenido del recurso: {subject}:")
-    query = "Describe <"+subject+">"
-    result = model.query(query)
+    query = "DESCRIBE ?subject WHERE { }"
+    result = profiler.query(model, prepared(query), initBindings={'subject': URIRef(subject)})
     print(result.graph.serialize(format="turtle"))
     print("----------------------------------------")
 
@@ -105,8 +125,8 @@ def describeAResource(model, subject):
 # Esta consulta devuelve un boolano, no una lista de resultados
 def askIfThereAreResults(model, subject):
     print(f"Hay tripletas con este sujeto?: {subject}:")
-    query = "Ask {<"+subject+"> ?x ?y}"
-    result = model.query(query)
+    query = "ASK { ?subject ?x ?y }"
+    result = profiler.query(model, prepared(query), initBindings={'subject': URIRef(subject)})
     print(bool(result.askAnswer))
     print("----------------------------------------")
 
@@ -122,18 +142,27 @@ def constructAGraph(model):
             ?person foaf:name "Timothy Berners-Lee" .
         }
         """
-    result = model.query(query)
+    result = profiler.query(model, prepared(query))
     print(result.graph.serialize(format="turtle"))
     print("----------------------------------------")
 
 # ------------------------------------------------------
 # Función main que carga un grafo rdf con la representación FOAF de Tim Berners Lee y
 # llama a los métodos de consulta anteriores
+# Con PERSISTENT_STORE el grafo se guarda en una base de datos SQLite la primera vez y las siguientes ejecuciones
+# la abren directamente, sin volver a leer el fichero. Los métodos de consulta funcionan igual con los dos tipos de grafo.
 # ------------------------------------------------------
 
+PERSISTENT_STORE = True
+STORE_FILE = "results/tblFoafGraph.sqlite"
+
 if __name__ == "__main__":
-    model = Graph()
-    model.parse("data/tblFoafGraph.rdf", format="turtle")
+    os.makedirs("results", exist_ok=True)
+    if PERSISTENT_STORE:
+        model = persistentGraph(STORE_FILE, "data/tblFoafGraph.rdf", format="turtle")
+    else:
+        model = Graph()
+        model.parse("data/tblFoafGraph.rdf", format="turtle")
 
     # Definimos los recursos usados en las consultas
     resource_uri = URIRef("http://dig.csail.mit.edu/2008/webdav/timbl/foaf.rdf")
@@ -150,9 +179,11 @@ if __name__ == "__main__":
     searchTriplesOfSubjectSPARQL(model, resource_uri)
     searchTriplesOfPredicateSPARQL(model, prop)
 
-    # Otras operaciones. Se muestra también como construir las consultas insertando el parametro en la cadena de texto.
-    # No es lo recomendable, ya que puede dar lugar a inyección de código.
+    # Otras operaciones. El recurso se pasa como cadena de texto, las consultas lo convierten en URI y lo asocian a su variable.
     resource2_uri = "http://www.w3.org/People/Berners-Lee/card#i" # Es una cadena de texto no un objeto URI como antes.
     describeAResource(model,resource2_uri)
     askIfThereAreResults(model, resource2_uri)
     constructAGraph(model)
+
+    print("Perfil de las consultas SPARQL:")
+    print(profiler.summary())
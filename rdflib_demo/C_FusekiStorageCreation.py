@@ -1,7 +1,13 @@
 # ------------------------------------------------------
 # Este programa define un almacén RDF en Fuseki y carga datos en el
 # ------------------------------------------------------
-import requests, time
+import requests, time, os, re, json, random, uuid
+from itertools import islice
+from threading import Lock
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from sparqlClient import session, cache
+from rdflib import Graph
+from rdflib.util import guess_format
 
 # Configuración del servicio FUSEKI
 FUSEKI_HOST = 'http://localhost:3030'
@@ -9,11 +15,21 @@ DATASET_NAME = 'datasetExample2'
 ADMIN_USER = 'admin'
 ADMIN_PASS = 'admin'
 
+# Configuración de la carga masiva por fragmentos
+CHUNK_SIZE = 50000 # Tripletas por fragmento
+CONCURRENCY = 4 # Fragmentos que se envían a la vez como máximo
+RETRIES = 5 # Reintentos de cada fragmento antes de abandonar la carga
+BACKOFF = 1.0 # Espera (s) antes del primer reintento, se duplica en cada reintento
+SKOLEM_BASE = 'https://rdflib.github.io/.well-known/genid/fuseki/' # Prefijo de los IRIs que sustituyen a los nodos en blanco
+
+# Los nodos en blanco de N-Triples/N-Quads, saltando los literales y los IRIs (que pueden contener '_:')
+BNODE_PATTERN = re.compile(r'("(?:[^"\\]|\\.)*"|<[^>]*>)|_:([A-Za-z0-9_](?:[A-Za-z0-9_.\-]*[A-Za-z0-9_\-])?)')
+
 # Crea un almacén RDF nuevo en el servicio de FUSEKI
 # La configuración de dicho almacén es la indicada en el fichero config_file
 def datasetCreation(config_file):
     with open(config_file, 'rb') as f:
-        response = requests.post(
+        response = session().post(
             f"{FUSEKI_HOST}/$/datasets",
             files={
                 "config": (config_file, f, "text/turtle")
@@ -25,30 +41,159 @@ def datasetCreation(config_file):
 # Carga un fichero RDF en el almacén que se ha creado. El rdf tiene una estructura con los índices ya creados.
 def rdfLoad(dataset_name, rdf_file):
     with open(rdf_file, "rb") as f:
-        response = requests.post(
+        response = session().post(
             f"{FUSEKI_HOST}/{dataset_name}/data",
             data=f,
             headers={"Content-Type": "text/turtle"},
             auth=(ADMIN_USER, ADMIN_PASS)
         )
+    cache.invalidate(f"{FUSEKI_HOST}/{dataset_name}") # Los resultados guardados de este almacén ya no son válidos
     return response
 
-# Crea un almacén con el nombre y configuración indicada.
+# Espera a que el almacén esté activo consultando el API de administración de Fuseki, en vez de esperar un tiempo fijo.
+# La espera entre consultas crece hasta un máximo de 2 segundos. Devuelve False si no está listo en timeout segundos.
+def waitForDataset(dataset_name, timeout=30, interval=0.1, host=FUSEKI_HOST):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            response = session().get(f"{host}/$/datasets/{dataset_name}", auth=(ADMIN_USER, ADMIN_PASS))
+            if response.status_code == 200 and response.json().get('ds.state', True):
+                return True
+        except (requests.RequestException, ValueError):
+            pass # El servicio todavía no responde
+        if time.monotonic() + interval > deadline:
+            return False
+        time.sleep(interval)
+        interval = min(interval * 2, 2)
+
+# Prefijo de los IRIs de los nodos en blanco de una carga. Fuseki trata las etiquetas de los nodos en blanco como locales
+# a cada envío, así que un nodo cuyas tripletas caen en dos fragmentos se convertiría en dos nodos distintos. Por eso se
+# sustituyen (skolemización) por IRIs con un prefijo aleatorio, distinto en cada carga para que los nodos de dos cargas
+# no se mezclen. Se guarda en el fichero de progreso para que una carga que se continúa use los mismos IRIs.
+def skolemPrefix():
+    return SKOLEM_BASE + uuid.uuid4().hex + '/'
+
+# Sustituye los nodos en blanco (_:etiqueta) de una línea N-Triples/N-Quads por IRIs con el prefijo indicado.
+def skolemizeLine(line, prefix):
+    return BNODE_PATTERN.sub(lambda m: m.group(1) or f'<{prefix}{m.group(2)}>', line)
+
+# Divide un fichero N-Triples/N-Quads en fragmentos de chunk_size tripletas, leyéndolo línea a línea sin cargarlo en memoria.
+# Devuelve pares (texto del fragmento, número de tripletas). Los fragmentos cuyo índice está en skip no se generan (texto None).
+# Los nodos en blanco se sustituyen por IRIs con el prefijo de la carga para que no se dividan entre fragmentos.
+def rdfChunks(rdf_file, prefix, chunk_size=CHUNK_SIZE, skip=()):
+    with open(rdf_file, encoding='utf-8') as f:
+        lines = (skolemizeLine(line.rstrip('\n'), prefix) + '\n' for line in f if line.strip() and not line.lstrip().startswith('#'))
+        for index, chunk in enumerate(iter(lambda: list(islice(lines, chunk_size)), [])):
+            yield (None if index in skip else ''.join(chunk)), len(chunk)
+
+# Fichero N-Triples con el contenido de un fichero RDF en otro formato (Turtle, RDF/XML...), que no se puede partir por
+# líneas. Se convierte una sola vez con rdflib y se guarda junto al fichero de progreso hasta que termina la carga, porque
+# rdflib da a los nodos en blanco etiquetas distintas en cada análisis y una carga que se continúa debe usar las mismas.
+def ntriplesFile(dataset_name, rdf_file):
+    nt_file = f'{rdf_file}.{dataset_name}.nt'
+    if not os.path.exists(nt_file):
+        graph = Graph()
+        graph.parse(rdf_file, format=guess_format(rdf_file))
+        graph.serialize(destination=nt_file + '.tmp', format='nt', encoding='utf-8')
+        os.replace(nt_file + '.tmp', nt_file) # Una conversión interrumpida no deja un fichero a medias
+    return nt_file
+
+# Fichero donde se guardan los fragmentos ya confirmados por el servidor, para poder continuar una carga interrumpida.
+def progressFile(dataset_name, rdf_file):
+    return f'{rdf_file}.{dataset_name}.progress'
+
+# Envía un fragmento al servidor. Los errores de conexión y las respuestas 5xx/429 se reintentan con espera exponencial,
+# el resto de errores (por ejemplo, datos mal formados) no se pueden arreglar reintentando y se devuelven directamente.
+def __sendChunk(url, content_type, data, retries, backoff):
+    for attempt in range(retries + 1):
+        try:
+            response = session().post(url, data=data.encode('utf-8'), headers={"Content-Type": content_type}, auth=(ADMIN_USER, ADMIN_PASS))
+            if response.status_code in [200, 201, 204]:
+                return
+            error = f'{response.status_code} - {response.text}'
+            if response.status_code < 500 and response.status_code != 429:
+                break
+        except requests.RequestException as e:
+            error = str(e)
+        if attempt < retries:
+            time.sleep(backoff * 2 ** attempt * random.uniform(0.5, 1)) # Espera aleatoria para no reintentar todos a la vez
+    raise RuntimeError(error)
+
+# Carga masiva de un fichero RDF en el almacén. El fichero se envía en fragmentos N-Triples/N-Quads de chunk_size tripletas,
+# con un máximo de concurrency fragmentos en paralelo (por las conexiones de la sesión compartida) y sin tener en memoria más que unos pocos fragmentos a la vez.
+# Cada fragmento se reintenta por separado; si aun así la carga falla, al volver a llamar a la función con el mismo
+# tamaño de fragmento solo se envían los fragmentos no confirmados.
+# Devuelve las tripletas cargadas, las ya cargadas en una ejecución anterior, el tiempo y las tripletas por segundo.
+def rdfBulkLoad(dataset_name, rdf_file, chunk_size=CHUNK_SIZE, concurrency=CONCURRENCY, retries=RETRIES, backoff=BACKOFF, host=FUSEKI_HOST):
+    # Las tripletas se añaden al grafo por defecto, las cuádruplas se envían al almacén para que vayan a su grafo.
+    quads = rdf_file.endswith('.nq')
+    url = f"{host}/{dataset_name}" if quads else f"{host}/{dataset_name}/data"
+    content_type = "application/n-quads" if quads else "application/n-triples"
+
+    progress_file = progressFile(dataset_name, rdf_file)
+    acknowledged = set()
+    prefix = skolemPrefix()
+    if os.path.exists(progress_file):
+        with open(progress_file) as f:
+            progress = json.load(f)
+        if progress['chunkSize'] == chunk_size: acknowledged = set(progress['acknowledged'])
+        prefix = progress.get('skolemPrefix', prefix) # Los fragmentos ya cargados usaron este prefijo
+    nt_file = rdf_file if rdf_file.endswith(('.nt', '.nq')) else ntriplesFile(dataset_name, rdf_file)
+    lock = Lock()
+
+    def send(index, data):
+        __sendChunk(url, content_type, data, retries, backoff)
+        cache.invalidate(f"{host}/{dataset_name}") # Los resultados guardados de este almacén ya no son válidos
+        with lock:
+            acknowledged.add(index)
+            with open(progress_file, 'w') as f:
+                json.dump({'chunkSize': chunk_size, 'skolemPrefix': prefix, 'acknowledged': sorted(acknowledged)}, f)
+
+    triples = skipped = 0
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        pending = {}
+        for index, (data, count) in enumerate(rdfChunks(nt_file, prefix, chunk_size, acknowledged.copy())):
+            if data is None:
+                skipped += count
+                continue
+            # Como mucho se generan fragmentos por delante de los envíos en curso, así la memoria está acotada.
+            while len(pending) >= 2 * concurrency:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    future.result()
+                    triples += pending.pop(future)
+            pending[executor.submit(send, index, data)] = count
+        for future in list(pending):
+            future.result()
+            triples += pending.pop(future)
+    seconds = time.perf_counter() - start
+    if os.path.exists(progress_file): os.remove(progress_file) # Carga completa, ya no hace falta continuarla
+    if nt_file != rdf_file: os.remove(nt_file)
+    return {'triples': triples, 'skipped': skipped, 'seconds': seconds, 'triplesPerSecond': triples / seconds if seconds else 0}
+
+# Crea un almacén con el nombre y configuración indicada y carga en él el fichero RDF.
+# Si el almacén ya existe y quedó una carga a medias, la continúa.
 def fusekiConfiguration(dataset_name, config_file, rdf_file):
     response = datasetCreation(config_file)
-    if response.status_code == 200:
-        time.sleep(2) #Esperamos a que el servicio se actualice correctamente
-        response = rdfLoad(dataset_name, rdf_file)
-        if response.status_code == 200:
-            print(f" Archivo '{rdf_file}' cargado")
-        else:
-            print(f' Error cargando archivo: {response.status_code} - {response.text}')
+    resume = response.status_code == 409 and os.path.exists(progressFile(dataset_name, rdf_file))
+    if response.status_code == 200 or resume:
+        if not waitForDataset(dataset_name):
+            print(f" Error: el dataset '{dataset_name}' no está disponible")
+            return
+        try:
+            stats = rdfBulkLoad(dataset_name, rdf_file)
+            print(f" Archivo '{rdf_file}' cargado: {stats['triples']} tripletas en {stats['seconds']:.1f} s "
+                  f"({stats['triplesPerSecond']:.0f} tripletas/s)" + (f", {stats['skipped']} ya cargadas antes" if stats['skipped'] else ''))
+        except RuntimeError as e:
+            print(f' Error cargando archivo: {e}. Al volver a ejecutar el programa se continúa la carga.')
     else:
         print(f'Error creando dataset: {response.status_code} - {response.text}')
 
 # ------------------------------------------------------
 # Función main que define almacénes rdf y carga un fichero en él.
 # Este programa solo puede ejecutarse una vez, ya que la segunda ya tiene el almacén creado y por tanto falla.
+# La excepción es una carga interrumpida, que al volver a ejecutarlo continúa desde el último fragmento confirmado.
 # La carga por API web es lenta, le costará un minuto o más ejecutarse.
 # ------------------------------------------------------
 
@@ -2,7 +2,7 @@
 # Este programa muestra un ejemplo de los 4 tipos de consultas SPARQL (Select, Describe, Ask, Construct)
 # ------------------------------------------------------
 
-from SPARQLWrapper import SPARQLWrapper, JSON, TURTLE
+from sparqlClient import SparqlClient, queryAll, cache, JSON, TURTLE
 
 # Configuración del servicio FUSEKI
 FUSEKI_HOST = 'http://localhost:3030'
@@ -12,9 +12,7 @@ ADMIN_PASS = 'admin'
 ENDPOINT = f'{FUSEKI_HOST}/{DATASET_NAME}/sparql'
 
 # Ejemplo de consulta SPARQL de tipo select
-def selectExample(sparql):
-    print('\n[1] Listado de autores:')
-    query = """
+SELECT_QUERY = """
     PREFIX foaf: <http://xmlns.com/foaf/0.1/>
     PREFIX dct: <http://purl.org/dc/terms/>
     
@@ -29,14 +27,16 @@ def selectExample(sparql):
     }
     ORDER BY ?nombre
     """
-    sparql.setQuery(query)
-    sparql.setReturnFormat(JSON)
-    results = sparql.query().convert() # El método convert extae la información devuelta por la petición HTML
+
+# Muestra las filas del resultado de la consulta select. Pueden ser una lista o el iterador de client.select(SELECT_QUERY),
+# que va mostrando las filas según llegan del servidor.
+def selectExample(rows):
+    print('\n[1] Listado de autores:')
     print('{:<40} {:<25} {:<15} {:<15} {:<15} {:<30}'.format(
         "Autor", "Nombre", "Nacimiento", "Muerte", "País", "Descripción"))
     print('-'*140)
 
-    for result in results["results"]["bindings"]:
+    for result in rows:
         autor = result["autor"]["value"].split("/")[-1]
         nombre = result["nombre"]["value"]
         nacimiento = result["nacimiento"]["value"]
@@ -48,35 +48,29 @@ def selectExample(sparql):
             autor, nombre, nacimiento, muerte, pais, descripcion))
 
 
-# Ejemplo de consulta SPARQL tipo ASK.
-def describeExample(sparql):
-    print('\n[2] Datos completos de Miguel de Cervantes:')
-    query_describe = """
+# Ejemplo de consulta SPARQL tipo DESCRIBE.
+DESCRIBE_QUERY = """
     PREFIX ej: <http://ejemplo.org/>
     DESCRIBE <http://ejemplo.org/autor/MigueldeCervantes>
     """
-    sparql.setQuery(query_describe)
-    sparql.setReturnFormat(TURTLE)
-    result = sparql.query().convert()
+
+def describeExample(result):
+    print('\n[2] Datos completos de Miguel de Cervantes:')
     print(result.decode('utf-8'))
 
 
 # Ejemplo de consulta SPARQL tipo ASK
-def askExample(sparql):
-    print('\n[3] ¿Existen libros en la colección?:')
-    query = """
+ASK_QUERY = """
     PREFIX dct: <http://purl.org/dc/terms/>
     ASK { ?libro a dct:BibliographicResource }
     """
-    sparql.setQuery(query)
-    sparql.setReturnFormat(JSON)
-    result = sparql.query().convert()
+
+def askExample(result):
+    print('\n[3] ¿Existen libros en la colección?:')
     print(f"Respuesta: {'Sí' if result['boolean'] else 'No'}")
 
 # Ejemplo de consulta SPARQL tipo Construct
-def constructExample(sparql):
-    print('\n[4] Relación inversa autor-libro (primeros 5):')
-    query = """
+CONSTRUCT_QUERY = """
     PREFIX dc: <http://purl.org/dc/elements/1.1/>
     PREFIX ej: <http://ejemplo.org/>
     
@@ -86,17 +80,25 @@ def constructExample(sparql):
     }
     LIMIT 5
     """
-    sparql.setQuery(query)
-    sparql.setReturnFormat(TURTLE)
-    result = sparql.query().convert()
+
+def constructExample(result):
+    print('\n[4] Relación inversa autor-libro (primeros 5):')
     print(result.decode('utf-8'))
 
 # ------------------------------------------------------
 # Main del programa de ejemplo de realización de consultas SPARQL en FUSEKI
+# El resto de consultas se lanzan todas a la vez y sus resultados se muestran en orden cuando terminan.
 # ------------------------------------------------------
+
+# Consultas de ejemplo: consulta, formato de respuesta y función que muestra su resultado.
+EXAMPLES = [(DESCRIBE_QUERY, TURTLE, describeExample), (ASK_QUERY, JSON, askExample), (CONSTRUCT_QUERY, TURTLE, constructExample)]
+
 if __name__ == "__main__":
-    sparql = SPARQLWrapper(ENDPOINT)
-    selectExample(sparql)
-    describeExample(sparql)
-    askExample(sparql)
-    constructExample(sparql)
\ No newline at end of file
+    client = SparqlClient(ENDPOINT)
+    # Las filas de la consulta select se muestran según llegan del servidor, sin esperar a la respuesta completa.
+    selectExample(client.select(SELECT_QUERY))
+    results = queryAll(client, [(query, format) for query, format, _ in EXAMPLES])
+    for (_, _, example), result in zip(EXAMPLES, results):
+        example(result)
+    print()
+    cache.printStats()
\ No newline at end of file
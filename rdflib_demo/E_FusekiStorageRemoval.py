@@ -4,7 +4,7 @@
 # Si solo se quiere borrar el contenido´y mantener el almacén habría que quitar el código correspondiente.
 # ------------------------------------------------------
 
-import requests
+from sparqlClient import session, cache
 
 # Configuración del servicio FUSEKI
 FUSEKI_HOST = 'http://localhost:3030'
@@ -14,20 +14,22 @@ ADMIN_PASS = 'admin'
 
 # Borra el contenido del almacén rdf usando una consulta SPARQL.
 def rdfDelete():
-    response = requests.post(
+    response = session().post(
         f"{FUSEKI_HOST}/{DATASET_NAME}/update",
         data="DELETE { ?s ?p ?o } WHERE { ?s ?p ?o }",
         headers={"Content-Type": "application/sparql-update"},
         auth=(ADMIN_USER, ADMIN_PASS)
     )
+    cache.invalidate(f"{FUSEKI_HOST}/{DATASET_NAME}") # Los resultados guardados de este almacén ya no son válidos
     return response
 
 # Borra el almacén de rdf.
 def datasetRemoval():
-    response = requests.delete(
+    response = session().delete(
         f"{FUSEKI_HOST}/$/datasets/{DATASET_NAME}",
         auth=(ADMIN_USER, ADMIN_PASS)
     )
+    cache.invalidate(f"{FUSEKI_HOST}/{DATASET_NAME}")
     return response
 
 # ------------------------------------------------------
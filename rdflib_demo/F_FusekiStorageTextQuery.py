@@ -3,7 +3,10 @@
 # y como hacerlas correctamente.
 # ------------------------------------------------------
 
-from SPARQLWrapper import SPARQLWrapper, JSON
+from rdflib import Graph
+from rdflib.namespace import FOAF, DCTERMS
+from sparqlClient import SparqlClient, selectAll, cache
+from textIndex import TextIndex
 
 # Configuración del servicio FUSEKI
 FUSEKI_HOST = 'http://localhost:3030'
@@ -12,9 +15,14 @@ ADMIN_USER = 'admin'
 ADMIN_PASS = 'admin'
 ENDPOINT = f'{FUSEKI_HOST}/{DATASET_NAME}/sparql'
 
-# Método de impresión de resultados por pantalla, usado por varias consultas
-def printResults(results):
-    for result in results["results"]["bindings"]:
+# Fichero RDF con el que hacer las consultas en local, sin Fuseki, usando el índice de texto de textIndex (None para usar Fuseki).
+# Se indexan los mismos predicados que en el almacén de Fuseki (data/datasetExample3.ttl).
+LOCAL_RDF_FILE = None # Por ejemplo 'data/bbcColeccion.ttl'
+
+# Método de impresión de resultados por pantalla, usado por varias consultas.
+# Las filas pueden ser una lista o el iterador de client.select, que las muestra según llegan del servidor.
+def printResults(rows):
+    for result in rows:
         print(f"{result['x']['value']} - "
             f"Name score: {result.get('score1', {}).get('value', '0')} - "
             f"Desc score: {result.get('score2', {}).get('value', '0')} - "
@@ -22,9 +30,7 @@ def printResults(results):
 
 # Consulta basada en filtros, NO tiene ordenación de relevancia,
 # por tánto sus resultados no sirven en un sistema de recuperación de información.
-def filterQuery(sparql):
-    print('\n[1] Consulta con filtros y sin ranking:')
-    query = """
+FILTER_QUERY = """
     PREFIX foaf: <http://xmlns.com/foaf/0.1/>
     PREFIX text: <http://jena.apache.org/text#>
     PREFIX dct: <http://purl.org/dc/terms/>
@@ -33,17 +39,15 @@ def filterQuery(sparql):
         FILTER(REGEX(?y, "music", "i"))
     }
     """
-    sparql.setQuery(query)
-    sparql.setReturnFormat(JSON)
-    results = sparql.query().convert()
-    for result in results["results"]["bindings"]:
+
+def filterQuery(rows):
+    print('\n[1] Consulta con filtros y sin ranking:')
+    for result in rows:
         print(result["x"]["value"])
 
 # Consulta basada en índices de texto con operaciones de unión. Esta forma de consultar NO integra
 # los resultados de los índices usados y por tanto no está proporcionando una ordenación adecuada.
-def icorrectTextQuery(sparql):
-    print('\n[2] Consulta con índice de texto pero ranking incorrecto:')
-    query = """
+INCORRECT_TEXT_QUERY = """
     PREFIX foaf: <http://xmlns.com/foaf/0.1/>
     PREFIX text: <http://jena.apache.org/text#>
     PREFIX dct: <http://purl.org/dc/terms/>
@@ -53,16 +57,14 @@ def icorrectTextQuery(sparql):
         BIND (COALESCE(?score1,0) + COALESCE(?score2,0) AS ?scoretot)
     } ORDER BY DESC(?scoretot)
     """
-    sparql.setQuery(query)
-    sparql.setReturnFormat(JSON)
-    results = sparql.query().convert()
-    printResults(results)
+
+def icorrectTextQuery(rows):
+    print('\n[2] Consulta con índice de texto pero ranking incorrecto:')
+    printResults(rows)
 
 # Consulta basada en índices de texto con optional, esta forma de construir la consulta SI que permite integrar
 # información de múltiples índices. El único problema es la existencia de duplicados según se construya la consulta.
-def correctTextQueryWithDuplicates(sparql):
-    print('\n[3] Consulta con índice de texto, ranking correcto pero con duplicados:')
-    query = """
+TEXT_QUERY_WITH_DUPLICATES = """
     PREFIX foaf: <http://xmlns.com/foaf/0.1/>
     PREFIX text: <http://jena.apache.org/text#>
     PREFIX dct: <http://purl.org/dc/terms/>
@@ -72,15 +74,13 @@ def correctTextQueryWithDuplicates(sparql):
         BIND (COALESCE(?score1,0) + COALESCE(?score2,0) AS ?scoretot)
     } ORDER BY DESC(?scoretot)
     """
-    sparql.setQuery(query)
-    sparql.setReturnFormat(JSON)
-    results = sparql.query().convert()
-    printResults(results)
+
+def correctTextQueryWithDuplicates(rows):
+    print('\n[3] Consulta con índice de texto, ranking correcto pero con duplicados:')
+    printResults(rows)
 
 # Igual que la anterior pero eliminando los duplicados y por tanto obteniendo el resultado deseado.
-def correctTextQueryWithoutDuplicates(sparql):
-    print('\n[4] Consulta con índice de texto, ranking correcto y sin duplicados:')
-    query = """
+TEXT_QUERY_WITHOUT_DUPLICATES = """
     PREFIX foaf: <http://xmlns.com/foaf/0.1/>
     PREFIX text: <http://jena.apache.org/text#>
     PREFIX dct: <http://purl.org/dc/terms/>
@@ -90,19 +90,38 @@ def correctTextQueryWithoutDuplicates(sparql):
         BIND (COALESCE(?score1,0) + COALESCE(?score2,0) AS ?scoretot)
     } ORDER BY DESC(?scoretot)
     """
-    sparql.setQuery(query)
-    sparql.setReturnFormat(JSON)
-    results = sparql.query().convert()
-    printResults(results)
+
+def correctTextQueryWithoutDuplicates(rows):
+    print('\n[4] Consulta con índice de texto, ranking correcto y sin duplicados:')
+    printResults(rows)
 
 # ------------------------------------------------------
 # Función main que realiza diferentes tipos de consultas de texto
 # ------------------------------------------------------
 
+# Ejecuta las consultas sobre un grafo en memoria con índice de texto. Las filas tienen el mismo formato que las de Fuseki.
+def localQueries(rdf_file, queries):
+    graph = Graph()
+    graph.parse(rdf_file)
+    TextIndex(graph, [FOAF.name, DCTERMS.description])
+    return [[{str(variable): {'value': str(term)} for variable, term in row.asdict().items()} for row in graph.query(query)]
+            for query in queries]
+
+# Consultas de ejemplo y función que muestra el resultado de cada una.
+EXAMPLES = [(FILTER_QUERY, filterQuery), (INCORRECT_TEXT_QUERY, icorrectTextQuery),
+            (TEXT_QUERY_WITH_DUPLICATES, correctTextQueryWithDuplicates), (TEXT_QUERY_WITHOUT_DUPLICATES, correctTextQueryWithoutDuplicates)]
+
 if __name__ == "__main__":
-    sparql = SPARQLWrapper(ENDPOINT)
     print('\nDiferentes consultas que devuelven recursos que en la descripción o en el nombre tengan "music"')
-    filterQuery(sparql)
-    icorrectTextQuery(sparql)
-    correctTextQueryWithDuplicates(sparql)
-    correctTextQueryWithoutDuplicates(sparql)
\ No newline at end of file
+    if LOCAL_RDF_FILE:
+        results = localQueries(LOCAL_RDF_FILE, [query for query, _ in EXAMPLES])
+        for (_, example), result in zip(EXAMPLES, results):
+            example(result)
+    else:
+        # Las consultas se ejecutan a la vez, cada una leyendo sus filas en streaming en un hilo aparte, y se muestran en orden.
+        client = SparqlClient(ENDPOINT)
+        results = selectAll(client, [query for query, _ in EXAMPLES])
+        for (_, example), result in zip(EXAMPLES, results):
+            example(result)
+        print()
+        cache.printStats()
\ No newline at end of file
@@ -0,0 +1,117 @@
+# ------------------------------------------------------
+# Este programa convierte una colección de registros Dublin Core en XML (OAI-DC, CSW...) a RDF y la carga en Fuseki.
+# Los ficheros se leen en streaming con iterparse y se convierten en paralelo a fragmentos (shards) N-Triples sin crear
+# ningún grafo en memoria. Después los fragmentos se envían al almacén con la carga masiva de C_FusekiStorageCreation.
+# ------------------------------------------------------
+import os, glob, time, requests
+from urllib.parse import quote
+import xml.etree.ElementTree as ET
+from multiprocessing import Pool
+from A_RDFCreation import BulkGraphBuilder
+from C_FusekiStorageCreation import rdfBulkLoad, waitForDataset, FUSEKI_HOST, ADMIN_USER, ADMIN_PASS
+from sparqlClient import session
+
+# Espacios de nombres de Dublin Core y prefijo con el que se nombran sus campos en los registros.
+DC_NAMESPACES = {'{http://purl.org/dc/elements/1.1/}': 'dc:', '{http://purl.org/dc/terms/}': 'dcterms:'}
+FILES_PER_SHARD = 2000 # Ficheros XML que se convierten en cada fragmento N-Triples
+URI_SAFE = ":/?#[]@!$&'()*+,;=%~" # Caracteres de las URIs que no se codifican (los reservados y los ya codificados)
+
+# Lee en streaming los registros Dublin Core de un fichero XML. Cada registro es un diccionario campo -> lista de valores,
+# con los campos nombrados como 'dc:title', 'dcterms:spatial'... Un fichero puede tener uno o varios registros
+# (por ejemplo, una respuesta ListRecords de OAI-PMH): un registro termina al cerrarse el elemento que contiene sus campos.
+# Los elementos ya procesados se vacían, por lo que la memoria apenas depende del tamaño del fichero.
+def dublinCoreRecords(file):
+    record, record_depth, depth = {}, None, 0
+    for event, element in ET.iterparse(file, events=('start', 'end')):
+        if event == 'start':
+            depth += 1
+            continue
+        namespace, _, name = element.tag.rpartition('}')
+        prefix = DC_NAMESPACES.get(namespace + '}')
+        if prefix is not None:
+            text = (element.text or '').strip()
+            if text: record.setdefault(prefix + name, []).append(text)
+            record_depth = depth - 1 # Profundidad del elemento que contiene los campos del registro
+        elif depth == record_depth:
+            yield record
+            record, record_depth = {}, None
+        element.clear()
+        depth -= 1
+
+# Identificador de un registro: su primer dc:identifier, salvo que tenga una URI bajo la URI base de la colección, que
+# identifica al propio registro. Otras URIs (la web del editor, un enlace de descarga...) no identifican el registro.
+# Los registros sin identificador se identifican con el nombre del fichero. El resto de identificadores se codifican
+# para poder añadirlos a la URI base, y en las URIs se codifican los caracteres que no admite N-Triples.
+def recordId(record, file, index, base_uri):
+    identifiers = record.get('dc:identifier', [])
+    uris = [identifier for identifier in identifiers if identifier.startswith(base_uri)]
+    if uris: return quote(uris[0], safe=URI_SAFE)
+    return quote(identifiers[0] if identifiers else os.path.splitext(os.path.basename(file))[0] + (f'-{index}' if index else ''))
+
+# Convierte un grupo de ficheros XML en un fragmento N-Triples. Se ejecuta en un proceso aparte por fragmento.
+# Devuelve el fichero del fragmento, el número de registros y el de tripletas (sin las repetidas dentro de un registro).
+def convertShard(args):
+    files, shard_file, base_uri = args
+    builder = BulkGraphBuilder('id', base_uri=base_uri)
+    records = triples = 0
+    with open(shard_file + '.tmp', 'w', encoding='utf-8', buffering=1 << 20) as f:
+        for file in files:
+            try:
+                for index, record in enumerate(dublinCoreRecords(file)):
+                    record['id'] = recordId(record, file, index, base_uri)
+                    lines = builder.ntLines(record)
+                    f.writelines(lines)
+                    records += 1
+                    triples += len(lines)
+            except ET.ParseError as e:
+                print(f' Fichero {file} ignorado, XML no válido: {e}')
+    os.replace(shard_file + '.tmp', shard_file) # Un fragmento a medias no se confunde con uno completo
+    return shard_file, records, triples
+
+# Convierte todos los ficheros XML de un directorio en fragmentos N-Triples en shards_dir, usando processes procesos.
+# Devuelve la lista de fragmentos y el número de registros y tripletas convertidos.
+def convertCollection(records_dir, shards_dir, base_uri, processes=None, files_per_shard=FILES_PER_SHARD):
+    files = sorted(glob.glob(os.path.join(records_dir, '*.xml')))
+    os.makedirs(shards_dir, exist_ok=True)
+    tasks = [(files[i:i + files_per_shard], os.path.join(shards_dir, f'part-{i // files_per_shard:05d}.nt'), base_uri)
+             for i in range(0, len(files), files_per_shard)]
+    shards, records, triples = [], 0, 0
+    with Pool(processes) as pool:
+        for shard_file, shard_records, shard_triples in pool.imap_unordered(convertShard, tasks):
+            shards.append(shard_file)
+            records += shard_records
+            triples += shard_triples
+    return sorted(shards), records, triples
+
+# Crea (si no existe) un almacén TDB2 vacío con el nombre indicado, sin fichero de configuración.
+def datasetCreationByName(dataset_name):
+    response = session().post(f"{FUSEKI_HOST}/$/datasets", data={'dbName': dataset_name, 'dbType': 'tdb2'}, auth=(ADMIN_USER, ADMIN_PASS))
+    return response.status_code in [200, 409] # 409: el almacén ya existe
+
+# ------------------------------------------------------
+# Función main que convierte las colecciones Dublin Core del repositorio y las carga en un almacén de Fuseki.
+# Si Fuseki no está disponible solo se hace la conversión, los fragmentos quedan en results/ para cargarlos después.
+# ------------------------------------------------------
+
+COLLECTIONS = [('../recordsdc', 'results/recordsdc_nt', 'http://zaguan.unizar.es/record/'),
+               ('../dublinCore', 'results/dublinCore_nt', 'http://example.org/dublinCore/')]
+DATASET_NAME = 'dublinCore'
+
+if __name__ == "__main__":
+    for records_dir, shards_dir, base_uri in COLLECTIONS:
+        start = time.perf_counter()
+        shards, records, triples = convertCollection(records_dir, shards_dir, base_uri)
+        seconds = time.perf_counter() - start
+        print(f"{records_dir}: {records} registros convertidos a {triples} tripletas en {len(shards)} fragmentos, "
+              f"{seconds:.1f} s ({triples / seconds:.0f} tripletas/s)")
+
+        try:
+            available = datasetCreationByName(DATASET_NAME) and waitForDataset(DATASET_NAME, timeout=10)
+        except requests.RequestException:
+            available = False
+        if not available:
+            print(f" Fuseki no está disponible, los fragmentos se pueden cargar después desde {shards_dir}")
+            continue
+        for shard in shards:
+            stats = rdfBulkLoad(DATASET_NAME, shard)
+            print(f" {shard} cargado: {stats['triples']} tripletas en {stats['seconds']:.1f} s ({stats['triplesPerSecond']:.0f} tripletas/s)")
@@ -0,0 +1,84 @@
+# ------------------------------------------------------
+# Perfilado de las consultas SPARQL que se ejecutan sobre grafos de RDFLIB.
+# Ejecuta las consultas igual que Graph.query pero separando sus fases: análisis del texto (parse), traducción al
+# álgebra de SPARQL (translate) y evaluación sobre el grafo (eval). De cada consulta se mide el tiempo de cada fase,
+# las filas (o tripletas) del resultado y las búsquedas de patrones de tripletas que hace en el almacén.
+# Las consultas que superan el umbral de consulta lenta se guardan en un fichero JSON lines (un objeto JSON por línea),
+# para localizar las consultas que conviene reescribir o que necesitan un índice.
+# ------------------------------------------------------
+import json, re, time
+from collections import Counter
+from datetime import datetime, timezone
+from rdflib.plugins.sparql.parser import parseQuery
+from rdflib.plugins.sparql.algebra import translateQuery
+from rdflib.plugins.sparql.evaluate import evalQuery
+from rdflib.plugins.sparql.processor import SPARQLResult
+
+SLOW_QUERY_SECONDS = 0.1 # Consultas que se consideran lentas y se guardan en el fichero de registro
+TOP_PATTERNS = 5 # Patrones de tripletas más buscados que se guardan de cada consulta
+
+# Cuenta las búsquedas de tripletas que se hacen en un almacén mientras está activo (dentro de un with).
+# Sustituye temporalmente el método triples del almacén por uno que anota cada patrón buscado, con ? en las partes libres.
+class LookupCounter:
+    def __init__(self, store):
+        self.store = store
+        self.patterns = Counter()
+
+    def __enter__(self):
+        triples = self.store.triples
+        def countedTriples(triple_pattern, context=None):
+            self.patterns[' '.join('?' if term is None else term.n3() for term in triple_pattern)] += 1
+            return triples(triple_pattern, context)
+        self.store.triples = countedTriples
+        return self
+
+    def __exit__(self, *args):
+        del self.store.triples # Vuelve a quedar el método de la clase
+
+# Perfilador de consultas. Guarda las medidas de todas las consultas en records y escribe las lentas en log_file.
+# Con slow_threshold=0 se registran todas las consultas.
+class QueryProfiler:
+    def __init__(self, log_file=None, slow_threshold=SLOW_QUERY_SECONDS):
+        self.log_file = log_file
+        self.slow_threshold = slow_threshold
+        self.records = []
+
+    # Ejecuta una consulta (texto o consulta ya preparada con prepareQuery) sobre el grafo y devuelve el mismo resultado
+    # que model.query. A diferencia de Graph.query el resultado se evalúa completo antes de devolverlo, para medirlo.
+    def query(self, graph, query, initBindings=None, initNs=None, base=None):
+        start = time.perf_counter()
+        text = query
+        if isinstance(query, str):
+            parsed = parseQuery(query)
+            parsed_at = time.perf_counter()
+            query = translateQuery(parsed, base, initNs if initNs is not None else dict(graph.namespaces()))
+        else:
+            text = query._original_args[0] if hasattr(query, '_original_args') else str(query.algebra.name)
+            parsed_at = start
+        translated_at = time.perf_counter()
+        with LookupCounter(graph.store) as lookups:
+            result = dict(evalQuery(graph, query, initBindings or {}, base))
+            if result.get('bindings') is not None:
+                result['bindings'] = list(result['bindings'])
+        end = time.perf_counter()
+
+        type = result['type_']
+        rows = len(result['bindings']) if type == 'SELECT' else len(result['graph']) if result.get('graph') is not None else 1
+        record = {'time': datetime.now(timezone.utc).isoformat(timespec='milliseconds'), 'type': type,
+                  'query': re.sub(r'\s+', ' ', text).strip(), 'bindings': {str(k): str(v) for k, v in (initBindings or {}).items()},
+                  'parseSeconds': parsed_at - start, 'translateSeconds': translated_at - parsed_at,
+                  'evalSeconds': end - translated_at, 'totalSeconds': end - start, 'rows': rows,
+                  'lookups': sum(lookups.patterns.values()), 'topPatterns': dict(lookups.patterns.most_common(TOP_PATTERNS))}
+        self.records.append(record)
+        if self.log_file and record['totalSeconds'] >= self.slow_threshold:
+            with open(self.log_file, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(record, ensure_ascii=False) + '\n')
+        return SPARQLResult(result)
+
+    # Resumen de las consultas ejecutadas, de la más lenta a la más rápida.
+    def summary(self):
+        lines = [f"{'total (s)':>10} {'parse':>8} {'transl.':>8} {'eval':>8} {'filas':>7} {'búsq.':>7}  consulta"]
+        for record in sorted(self.records, key=lambda record: -record['totalSeconds']):
+            lines.append(f"{record['totalSeconds']:10.4f} {record['parseSeconds']:8.4f} {record['translateSeconds']:8.4f} "
+                         f"{record['evalSeconds']:8.4f} {record['rows']:7d} {record['lookups']:7d}  {record['query'][:60]}")
+        return '\n'.join(lines)
@@ -0,0 +1,319 @@
+# ------------------------------------------------------
+# Cliente SPARQL común a los programas que trabajan con FUSEKI.
+# Todas las peticiones comparten una sesión HTTP con un conjunto (pool) de conexiones abiertas (keep-alive), en vez de
+# abrir una conexión nueva en cada consulta. Incluye una versión asíncrona que lanza varias consultas a la vez.
+# ------------------------------------------------------
+import asyncio, requests, io, csv, json, re, time, os, pickle
+from collections import OrderedDict
+from urllib.parse import quote
+from threading import Lock
+from requests.adapters import HTTPAdapter
+
+POOL_SIZE = 10 # Conexiones abiertas que se mantienen con cada servidor
+CONCURRENCY = 8 # Consultas simultáneas como máximo en la versión asíncrona
+
+CACHE_TTL = 600 # Segundos que se guarda en caché el resultado de una consulta
+CACHE_SIZE = 256 # Resultados guardados en caché como máximo
+CACHE_ROWS = 10000 # Filas que puede tener como máximo un resultado de select para guardarlo en caché
+CACHE_DIR = 'results/queryCache' # Directorio donde se guarda la caché, un fichero por almacén (None para no guardarla)
+STREAM_BLOCK = 65536 # Caracteres que se leen de la respuesta cada vez al procesarla en streaming
+
+# Formatos de respuesta de las consultas: JSON para SELECT y ASK, TURTLE para CONSTRUCT y DESCRIBE.
+# Las consultas SELECT también se pueden pedir en TSV o CSV, que se procesan en streaming más fácilmente que JSON.
+JSON = 'json'
+TURTLE = 'turtle'
+TSV = 'tsv'
+CSV = 'csv'
+ACCEPT = {JSON: 'application/sparql-results+json', TURTLE: 'text/turtle', TSV: 'text/tab-separated-values', CSV: 'text/csv'}
+
+__session = None
+
+# Devuelve la sesión HTTP compartida. Se crea en la primera llamada y el resto de llamadas reutilizan sus conexiones.
+# Se puede usar igual que el módulo requests (session().post, session().get...).
+def session():
+    global __session
+    if __session is None:
+        __session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=POOL_SIZE)
+        __session.mount('http://', adapter)
+        __session.mount('https://', adapter)
+    return __session
+
+QUERY_TOKENS = re.compile(r'("""[\s\S]*?"""|\'\'\'[\s\S]*?\'\'\'|"(?:[^"\\]|\\.)*"|\'(?:[^\'\\]|\\.)*\'|<[^<>"{}|^`\\\s]*>)'
+                          r'|(?:\s|#[^\r\n]*)+') # Literales e IRIs, que se mantienen, o comentarios y espacios
+
+# Caché de resultados de consultas en el cliente, para las consultas que se repiten sobre almacenes que cambian poco.
+# La clave es el endpoint, el formato y el texto de la consulta normalizado: sin comentarios (# hasta el final de la línea)
+# y sin diferencias de espacios, ambos fuera de los literales y de las IRIs (<http://ejemplo.org/a#b>).
+# Cada resultado caduca a los ttl segundos y, si se llena, se descarta el usado hace más tiempo (LRU).
+# Los resultados de cada almacén se guardan también en un fichero de directory, así una consulta que se repite en otra
+# ejecución del programa (o en otro programa) no vuelve al servidor mientras no caduque.
+# Los programas que modifican un almacén (C y E) invalidan sus resultados con invalidate.
+# Cuenta aciertos, fallos y el tiempo de consulta ahorrado con los aciertos.
+class QueryCache:
+    def __init__(self, ttl=CACHE_TTL, size=CACHE_SIZE, directory=None):
+        self.ttl = ttl
+        self.size = size
+        self.directory = directory
+        self.entries = OrderedDict() # clave -> (caducidad, resultado, tiempo que costó la consulta)
+        self.loaded = set() # Almacenes cuyo fichero ya se ha leído
+        self.lock = Lock()
+        self.hits = self.misses = 0
+        self.savedSeconds = 0.0
+
+    @staticmethod
+    def key(endpoint, query, format):
+        normalized = QUERY_TOKENS.sub(lambda m: m.group(1) or ' ', query).strip()
+        return endpoint, format, normalized
+
+    # Almacén de un endpoint de Fuseki (http://localhost:3030/datasetExample2/sparql -> http://localhost:3030/datasetExample2).
+    @staticmethod
+    def dataset(endpoint):
+        return endpoint.rsplit('/', 1)[0]
+
+    def __file(self, dataset_url):
+        return os.path.join(self.directory, quote(dataset_url, safe='') + '.pickle')
+
+    # Lee los resultados guardados de un almacén la primera vez que se usa. Un fichero dañado se ignora.
+    def __load(self, dataset_url):
+        if self.directory is None or dataset_url in self.loaded:
+            return
+        self.loaded.add(dataset_url)
+        try:
+            with open(self.__file(dataset_url), 'rb') as f:
+                entries = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            return
+        now = time.time()
+        for key, entry in entries.items():
+            if entry[0] >= now: self.entries.setdefault(key, entry)
+
+    # Guarda en su fichero los resultados de un almacén. Se escribe en otro fichero y se renombra, para que un programa
+    # que lo lee a la vez no encuentre un fichero a medias.
+    def __save(self, dataset_url):
+        if self.directory is None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        file = self.__file(dataset_url)
+        with open(file + '.tmp', 'wb') as f:
+            pickle.dump({key: entry for key, entry in self.entries.items() if self.dataset(key[0]) == dataset_url}, f)
+        os.replace(file + '.tmp', file)
+
+    # Devuelve el resultado guardado o None si no está o ha caducado.
+    def get(self, key):
+        with self.lock:
+            self.__load(self.dataset(key[0]))
+            entry = self.entries.get(key)
+            if entry is None or entry[0] < time.time():
+                self.entries.pop(key, None)
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            self.savedSeconds += entry[2]
+            return entry[1]
+
+    def put(self, key, result, seconds):
+        with self.lock:
+            dataset_url = self.dataset(key[0])
+            self.__load(dataset_url)
+            self.entries[key] = (time.time() + self.ttl, result, seconds)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+            self.__save(dataset_url)
+
+    # Borra los resultados de todos los endpoints de un almacén (por ejemplo http://localhost:3030/datasetExample2),
+    # o toda la caché si no se indica almacén, también de los ficheros.
+    def invalidate(self, dataset_url=None):
+        with self.lock:
+            for key in [key for key in self.entries if dataset_url is None or key[0] == dataset_url or key[0].startswith(dataset_url + '/')]:
+                del self.entries[key]
+            if self.directory is None:
+                return
+            if dataset_url is None:
+                files = [os.path.join(self.directory, file) for file in os.listdir(self.directory)] if os.path.isdir(self.directory) else []
+            else:
+                files = [self.__file(dataset_url)]
+            for file in files:
+                if os.path.exists(file): os.remove(file)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses, 'hitRate': self.hits / total if total else 0,
+                'savedSeconds': self.savedSeconds, 'size': len(self.entries)}
+
+    # Muestra los aciertos, fallos y tiempo ahorrado de la caché.
+    def printStats(self):
+        stats = self.stats()
+        print(f"Caché de consultas: {stats['hits']} aciertos, {stats['misses']} fallos ({stats['hitRate']:.0%} de aciertos), "
+              f"{stats['savedSeconds']:.2f} s ahorrados, {stats['size']} resultados guardados")
+
+# Caché compartida por todos los clientes del programa, guardada en CACHE_DIR.
+cache = QueryCache(directory=CACHE_DIR)
+
+# Cliente de un endpoint SPARQL. Sustituye a SPARQLWrapper usando la sesión compartida.
+# Los resultados completos (query) y las filas de select se guardan en la caché indicada, None para no usar caché.
+# Los resultados exportados a un fichero (export) no se guardan.
+class SparqlClient:
+    def __init__(self, endpoint, auth=None, timeout=60, cache=cache):
+        self.endpoint = endpoint
+        self.auth = auth
+        self.timeout = timeout
+        self.cache = cache
+
+    # Envía la consulta por POST (no depende de la longitud máxima de una URL) y devuelve la respuesta HTTP.
+    def request(self, query, format=JSON, stream=False):
+        response = session().post(self.endpoint, data={'query': query}, headers={'Accept': ACCEPT[format]},
+                                  auth=self.auth, timeout=self.timeout, stream=stream)
+        response.raise_for_status()
+        return response
+
+    # Ejecuta una consulta. En JSON devuelve el diccionario de resultados (igual que sparql.query().convert() de SPARQLWrapper),
+    # en TURTLE los bytes del grafo devuelto y en TSV/CSV la lista de filas de select.
+    # Los resultados de la caché se comparten entre llamadas, no se deben modificar.
+    def query(self, query, format=JSON):
+        if format in [TSV, CSV]:
+            return list(self.select(query, format)) # select ya guarda las filas en la caché
+        if self.cache is not None:
+            key = QueryCache.key(self.endpoint, query, format)
+            result = self.cache.get(key)
+            if result is not None:
+                return result
+        start = time.perf_counter()
+        response = self.request(query, format)
+        result = response.json() if format == JSON else response.content
+        if self.cache is not None:
+            self.cache.put(key, result, time.perf_counter() - start)
+        return result
+
+    # Ejecuta una consulta SELECT y devuelve sus filas a medida que llegan del servidor, sin esperar a la respuesta completa
+    # y sin tenerla entera en memoria. Cada fila es un diccionario variable -> {'value': ...} igual que las filas de
+    # results["results"]["bindings"] en JSON; las variables sin valor no aparecen en la fila.
+    # En CSV los valores no indican su tipo (URI, literal...), por eso por defecto se usa TSV.
+    # Si se leen todas las filas y no son más de CACHE_ROWS, se guardan en la caché y la próxima vez se devuelven de ella.
+    def select(self, query, format=TSV):
+        if self.cache is None:
+            yield from self.__rows(query, format)
+            return
+        key = QueryCache.key(self.endpoint, query, format + ' rows') # Distinta de la clave de query en JSON
+        rows = self.cache.get(key)
+        if rows is not None:
+            yield from rows
+            return
+        start = time.perf_counter()
+        rows = []
+        for row in self.__rows(query, format):
+            if rows is not None:
+                rows.append(row)
+                if len(rows) > CACHE_ROWS: rows = None # Demasiadas filas para guardarlas
+            yield row
+        if rows is not None:
+            self.cache.put(key, rows, time.perf_counter() - start)
+
+    # Filas de una consulta SELECT leídas en streaming de la respuesta.
+    def __rows(self, query, format):
+        with self.request(query, format, stream=True) as response:
+            response.raw.decode_content = True # Descomprime la respuesta si el servidor la comprime
+            response.raw.auto_close = False # La conexión se cierra (o se devuelve al pool) al salir del with, no al leer el último byte
+            text = io.TextIOWrapper(response.raw, encoding='utf-8', newline='')
+            if format == TSV: yield from tsvRows(text)
+            elif format == CSV: yield from csvRows(text)
+            else: yield from jsonRows(text)
+
+    # Guarda en un fichero el resultado de una consulta copiándolo por bloques según llega, sin procesarlo.
+    # Sirve para exportar resultados de millones de filas con memoria constante.
+    def export(self, query, file, format=CSV):
+        with self.request(query, format, stream=True) as response, open(file, 'wb') as f:
+            for block in response.iter_content(STREAM_BLOCK):
+                f.write(block)
+
+# Convierte un valor de un resultado TSV (sintaxis de Turtle) al diccionario de un resultado JSON.
+def tsvTerm(value):
+    if value.startswith('<'):
+        return {'type': 'uri', 'value': value[1:-1]}
+    if value.startswith('_:'):
+        return {'type': 'bnode', 'value': value[2:]}
+    if value.startswith('"'):
+        end = value.rindex('"')
+        term = {'type': 'literal', 'value': re.sub(r'\\(.)', lambda m: {'t': '\t', 'n': '\n', 'r': '\r'}.get(m.group(1), m.group(1)), value[1:end])}
+        if value[end + 1:].startswith('@'): term['xml:lang'] = value[end + 2:]
+        elif value[end + 1:].startswith('^^'): term['datatype'] = value[end + 4:-1]
+        return term
+    # Números y booleanos sin comillas
+    datatype = 'boolean' if value in ['true', 'false'] else 'integer' if re.fullmatch(r'[+-]?\d+', value) else 'double' if 'e' in value.lower() else 'decimal'
+    return {'type': 'literal', 'value': value, 'datatype': 'http://www.w3.org/2001/XMLSchema#' + datatype}
+
+# Filas de un resultado TSV: una cabecera con las variables (?x) y una línea por fila con los valores separados por tabuladores.
+def tsvRows(text):
+    variables = [variable[1:] for variable in text.readline().rstrip('\r\n').split('\t')]
+    for line in text:
+        values = line.rstrip('\r\n').split('\t')
+        yield {variable: tsvTerm(value) for variable, value in zip(variables, values) if value}
+
+# Filas de un resultado CSV: una cabecera con las variables y una fila por resultado. Solo contiene los valores.
+def csvRows(text):
+    reader = csv.reader(text)
+    variables = next(reader)
+    for values in reader:
+        yield {variable: {'value': value} for variable, value in zip(variables, values) if value}
+
+# Filas de un resultado JSON. Se localiza la lista "bindings" y se decodifica cada fila en cuanto está completa,
+# leyendo la respuesta por bloques.
+def jsonRows(text):
+    decoder = json.JSONDecoder()
+    buffer, position = '', None
+    while True:
+        block = text.read(STREAM_BLOCK)
+        buffer += block
+        if position is None:
+            match = re.search(r'"bindings"\s*:\s*\[', buffer)
+            if not match:
+                if not block: return # Respuesta sin filas (por ejemplo, ASK)
+                continue
+            position = match.end()
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n,': position += 1
+            if position < len(buffer) and buffer[position] == ']': return
+            try:
+                row, position = decoder.raw_decode(buffer, position)
+            except ValueError:
+                if not block: raise # La respuesta termina con una fila incompleta
+                break # Falta el resto de la fila, se lee otro bloque
+            yield row
+        buffer, position = buffer[position:], 0 # Se descarta lo ya procesado
+
+# Versión asíncrona del cliente. requests es bloqueante, por lo que cada consulta se ejecuta en un hilo aparte y
+# un semáforo limita cuántas hay en curso a la vez. Las conexiones se reutilizan igualmente desde la sesión compartida.
+class AsyncSparqlClient:
+    def __init__(self, client, concurrency=CONCURRENCY):
+        self.client = client
+        self.concurrency = min(concurrency, POOL_SIZE) # Con más consultas que conexiones se abrirían conexiones nuevas
+        self.semaphore = asyncio.Semaphore(self.concurrency)
+
+    async def query(self, query, format=JSON):
+        async with self.semaphore:
+            return await asyncio.to_thread(self.client.query, query, format)
+
+    # Ejecuta una consulta SELECT leyendo sus filas en streaming en un hilo aparte y devuelve la lista de filas.
+    async def select(self, query, format=TSV):
+        async with self.semaphore:
+            return await asyncio.to_thread(lambda: list(self.client.select(query, format)))
+
+    # Ejecuta a la vez una lista de pares (consulta, formato) y devuelve sus resultados en el mismo orden.
+    async def queryAll(self, queries):
+        return await asyncio.gather(*(self.query(query, format) for query, format in queries))
+
+    # Ejecuta a la vez una lista de consultas SELECT y devuelve sus filas en el mismo orden.
+    async def selectAll(self, queries, format=TSV):
+        return await asyncio.gather(*(self.select(query, format) for query in queries))
+
+# Ejecuta en paralelo una lista de pares (consulta, formato) desde código no asíncrono.
+# El tiempo total es aproximadamente el de la consulta más lenta (si no hay más consultas que concurrency).
+def queryAll(client, queries, concurrency=CONCURRENCY):
+    return asyncio.run(AsyncSparqlClient(client, concurrency).queryAll(queries))
+
+# Ejecuta en paralelo una lista de consultas SELECT desde código no asíncrono. Cada consulta lee su propia respuesta en
+# streaming (select) y devuelve la lista de sus filas.
+def selectAll(client, queries, format=TSV, concurrency=CONCURRENCY):
+    return asyncio.run(AsyncSparqlClient(client, concurrency).selectAll(queries, format))
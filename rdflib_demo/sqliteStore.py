@@ -0,0 +1,181 @@
+# ------------------------------------------------------
+# Almacén persistente de RDFLIB sobre SQLite. Permite trabajar con grafos que no caben en memoria o que tardan en
+# cargarse: el fichero RDF se carga una sola vez y las ejecuciones posteriores abren la base de datos directamente.
+# Se usa como cualquier grafo de RDFLIB (API, SPARQL...) creando el grafo con Graph(store=SQLiteStore()).
+# ------------------------------------------------------
+import os, sqlite3
+from collections import OrderedDict
+from rdflib import Graph, URIRef, BNode, Literal
+from rdflib.store import Store, VALID_STORE, NO_STORE, TripleRemovedEvent
+
+BATCH_SIZE = 10000 # Tripletas que se insertan de una vez en addN
+CACHE_SIZE = 100000 # Términos que se guardan en memoria como máximo (los usados hace más tiempo se descartan)
+
+# Los términos (URIs, nodos en blanco y literales) se guardan una sola vez en la tabla terms y las tripletas son tres
+# identificadores de términos. Las tripletas están ordenadas por sujeto-predicado-objeto (SPO) y tienen dos índices más,
+# POS y OSP, de forma que cualquier patrón de búsqueda con alguna parte conocida se resuelve con un índice.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS terms (id INTEGER PRIMARY KEY, kind TEXT, value TEXT, datatype TEXT, lang TEXT);
+CREATE UNIQUE INDEX IF NOT EXISTS terms_key ON terms (value, kind, datatype, lang);
+CREATE TABLE IF NOT EXISTS triples (s INTEGER, p INTEGER, o INTEGER, PRIMARY KEY (s, p, o)) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS triples_pos ON triples (p, o, s);
+CREATE INDEX IF NOT EXISTS triples_osp ON triples (o, s, p);
+CREATE TABLE IF NOT EXISTS namespaces (prefix TEXT PRIMARY KEY, uri TEXT);
+"""
+
+class SQLiteStore(Store):
+    context_aware = False
+    formula_aware = False
+    transaction_aware = True
+
+    def __init__(self, configuration=None, identifier=None):
+        self.connection = None
+        self.ids = OrderedDict() # Identificadores de los términos ya usados, para no consultarlos cada vez
+        self.terms = OrderedDict()
+        super().__init__(configuration, identifier)
+
+    # Abre (o crea) la base de datos del fichero indicado en configuration.
+    def open(self, configuration, create=False):
+        if not create and not os.path.exists(configuration):
+            return NO_STORE
+        self.connection = sqlite3.connect(configuration)
+        self.connection.executescript(SCHEMA)
+        return VALID_STORE
+
+    def close(self, commit_pending_transaction=False):
+        if self.connection is not None:
+            if commit_pending_transaction: self.connection.commit()
+            self.connection.close()
+            self.connection = None
+        self.__clearCaches()
+
+    def commit(self):
+        self.connection.commit()
+
+    # Al deshacer la transacción desaparecen los términos insertados en ella, así que sus identificadores guardados en
+    # memoria ya no son válidos (y podrían pasar a ser de otros términos).
+    def rollback(self):
+        self.connection.rollback()
+        self.__clearCaches()
+
+    def __clearCaches(self):
+        self.ids.clear()
+        self.terms.clear()
+
+    # Guarda un valor en una de las cachés de términos, descartando el usado hace más tiempo si está llena.
+    @staticmethod
+    def __remember(cache, key, value):
+        cache[key] = value
+        if len(cache) > CACHE_SIZE:
+            cache.popitem(last=False)
+
+    # Clave de un término en la tabla terms.
+    @staticmethod
+    def __key(term):
+        if isinstance(term, Literal):
+            return str(term), 'L', str(term.datatype or ''), term.language or ''
+        return str(term), 'B' if isinstance(term, BNode) else 'U', '', ''
+
+    # Identificador de un término. Si no existe y create es False devuelve None.
+    def __id(self, term, create=False):
+        key = self.__key(term)
+        id = self.ids.get(key)
+        if id is None:
+            row = self.connection.execute('SELECT id FROM terms WHERE value=? AND kind=? AND datatype=? AND lang=?', key).fetchone()
+            if row is None:
+                if not create: return None
+                row = (self.connection.execute('INSERT INTO terms (value, kind, datatype, lang) VALUES (?, ?, ?, ?)', key).lastrowid,)
+            id = row[0]
+            self.__remember(self.ids, key, id)
+        else:
+            self.ids.move_to_end(key)
+        return id
+
+    # Término a partir de los valores de la tabla terms.
+    def __term(self, id, value, kind, datatype, lang):
+        term = self.terms.get(id)
+        if term is None:
+            if kind == 'U': term = URIRef(value)
+            elif kind == 'B': term = BNode(value)
+            else: term = Literal(value, lang=lang or None, datatype=datatype or None, normalize=False)
+            self.__remember(self.terms, id, term)
+        else:
+            self.terms.move_to_end(id)
+        return term
+
+    def add(self, triple, context, quoted=False):
+        self.connection.execute('INSERT OR IGNORE INTO triples VALUES (?, ?, ?)', [self.__id(term, True) for term in triple])
+        super().add(triple, context, quoted) # Avisa a quien esté suscrito a los cambios del grafo
+
+    # Añade las tripletas por bloques, con una sola sentencia por bloque.
+    def addN(self, quads):
+        batch = []
+        for s, p, o, context in quads:
+            batch.append((self.__id(s, True), self.__id(p, True), self.__id(o, True)))
+            super().add((s, p, o), context)
+            if len(batch) == BATCH_SIZE:
+                self.connection.executemany('INSERT OR IGNORE INTO triples VALUES (?, ?, ?)', batch)
+                batch = []
+        self.connection.executemany('INSERT OR IGNORE INTO triples VALUES (?, ?, ?)', batch)
+
+    # Condición SQL y parámetros para un patrón de tripleta (None en las partes no conocidas).
+    # Devuelve None si algún término del patrón no está en el almacén, y por tanto no hay tripletas que lo cumplan.
+    def __where(self, triple_pattern):
+        conditions, parameters = [], []
+        for column, term in zip('spo', triple_pattern):
+            if term is not None:
+                id = self.__id(term)
+                if id is None: return None
+                conditions.append(f't.{column}=?')
+                parameters.append(id)
+        return (' WHERE ' + ' AND '.join(conditions) if conditions else ''), parameters
+
+    def remove(self, triple_pattern, context=None):
+        where = self.__where(triple_pattern)
+        if where is None: return
+        self.connection.execute('DELETE FROM triples AS t' + where[0], where[1])
+        self.dispatcher.dispatch(TripleRemovedEvent(triple=triple_pattern, context=context))
+
+    def triples(self, triple_pattern, context=None):
+        where = self.__where(triple_pattern)
+        if where is None: return
+        cursor = self.connection.execute(
+            'SELECT t.s, s.value, s.kind, s.datatype, s.lang, t.p, p.value, p.kind, p.datatype, p.lang, '
+            't.o, o.value, o.kind, o.datatype, o.lang FROM triples AS t '
+            'JOIN terms AS s ON s.id=t.s JOIN terms AS p ON p.id=t.p JOIN terms AS o ON o.id=t.o' + where[0], where[1])
+        for row in cursor:
+            yield (self.__term(*row[0:5]), self.__term(*row[5:10]), self.__term(*row[10:15])), iter(())
+
+    def __len__(self, context=None):
+        return self.connection.execute('SELECT COUNT(*) FROM triples').fetchone()[0]
+
+    def contexts(self, triple=None):
+        return iter(())
+
+    def bind(self, prefix, namespace, override=True):
+        if override or self.prefix(namespace) is None:
+            self.connection.execute('DELETE FROM namespaces WHERE uri=?', (str(namespace),))
+            self.connection.execute('INSERT OR REPLACE INTO namespaces VALUES (?, ?)', (prefix, str(namespace)))
+
+    def namespace(self, prefix):
+        row = self.connection.execute('SELECT uri FROM namespaces WHERE prefix=?', (prefix,)).fetchone()
+        return URIRef(row[0]) if row else None
+
+    def prefix(self, namespace):
+        row = self.connection.execute('SELECT prefix FROM namespaces WHERE uri=?', (str(namespace),)).fetchone()
+        return row[0] if row else None
+
+    def namespaces(self):
+        for prefix, uri in self.connection.execute('SELECT prefix, uri FROM namespaces').fetchall():
+            yield prefix, URIRef(uri)
+
+# Abre el grafo persistente guardado en db_file. Si la base de datos no existe o está vacía, antes carga en ella el
+# fichero RDF indicado; la carga se confirma al final, por lo que una carga interrumpida no deja el almacén a medias.
+def persistentGraph(db_file, rdf_file=None, format=None):
+    graph = Graph(store=SQLiteStore())
+    graph.open(db_file, create=True)
+    empty = graph.store.connection.execute('SELECT 1 FROM triples LIMIT 1').fetchone() is None
+    if empty and rdf_file:
+        graph.parse(rdf_file, format=format)
+        graph.commit()
+    return graph
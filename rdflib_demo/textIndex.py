@@ -0,0 +1,183 @@
+# ------------------------------------------------------
+# Índice de texto completo en memoria sobre los literales de un grafo de RDFLIB, con ordenación por relevancia BM25.
+# Se construye una vez al crearlo y se actualiza solo al añadir tripletas al grafo. Las consultas SPARQL del grafo pueden
+# usarlo igual que el índice de texto de Fuseki (jena-text), por lo que las consultas de F_FusekiStorageTextQuery
+# funcionan en local sin servidor:
+#   (?x ?score) text:query (foaf:name 'music')    busca en el índice los recursos cuyo nombre contiene 'music'
+#   ?x text:query 'music'                         busca en todos los literales indexados
+# y ofrece la función text:score(?x, 'music') para usar la relevancia de un recurso en BIND, FILTER u ORDER BY.
+# ------------------------------------------------------
+import math, re, unicodedata
+from collections import defaultdict, Counter
+from weakref import WeakKeyDictionary
+from rdflib import Literal, URIRef, BNode, Namespace
+from rdflib.namespace import RDF
+from rdflib.store import TripleAddedEvent, TripleRemovedEvent
+from rdflib.plugins.sparql import CUSTOM_EVALS
+from rdflib.plugins.sparql.evaluate import evalBGP
+from rdflib.plugins.sparql.operators import register_custom_function
+from rdflib.plugins.sparql.parserutils import value
+
+TEXT = Namespace('http://jena.apache.org/text#') # Mismo espacio de nombres que jena-text
+K1 = 1.2 # Saturación de la frecuencia de los términos en BM25
+B = 0.75 # Normalización por la longitud del literal en BM25
+CACHE_SIZE = 128 # Búsquedas cuyo resultado se guarda (text:score se evalúa una vez por fila)
+
+INDEXES = WeakKeyDictionary() # Índice de cada almacén de grafos, para encontrarlo al evaluar las consultas SPARQL
+
+# Separa un texto en términos: minúsculas, sin acentos y solo caracteres alfanuméricos.
+def tokenize(text):
+    text = ''.join(c for c in unicodedata.normalize('NFD', text.lower()) if unicodedata.category(c) != 'Mn')
+    return re.findall(r'\w+', text)
+
+# Índice invertido de los literales de texto del grafo. Cada documento es el texto de un recurso en un predicado
+# (sujeto, predicado), de forma que se puede buscar en un predicado concreto o en todos.
+# Si se indica predicates solo se indexan los literales de esos predicados.
+# Los borrados se aplican en los almacenes que los notifican (como SQLiteStore); el almacén en memoria por defecto de
+# RDFLIB no lo hace, por lo que después de borrar tripletas de un grafo en memoria hay que llamar a rebuild.
+class TextIndex:
+    def __init__(self, graph, predicates=None, k1=K1, b=B):
+        self.graph = graph
+        self.predicates = set(predicates) if predicates else None
+        self.k1 = k1
+        self.b = b
+        self.rebuild()
+        graph.store.dispatcher.subscribe(TripleAddedEvent, self.__onAdded)
+        graph.store.dispatcher.subscribe(TripleRemovedEvent, self.__onRemoved)
+        INDEXES[graph.store] = self
+
+    # Construye el índice desde cero con los literales del grafo.
+    def rebuild(self):
+        self.postings = defaultdict(dict) # término -> {(sujeto, predicado): frecuencia}
+        self.lengths = Counter() # (sujeto, predicado) -> número de términos
+        self.fieldLengths = Counter() # predicado -> número de términos en todos sus documentos
+        self.fieldDocs = Counter() # predicado -> número de documentos
+        self.indexed = set() # Tripletas indexadas, para no contar dos veces una tripleta añadida de nuevo
+        self.cache = {}
+        self.stale = False
+        for triple in self.graph:
+            self.add(triple)
+
+    # Añade al índice una tripleta si su objeto es un literal de texto de un predicado indexado.
+    def add(self, triple):
+        s, p, o = triple
+        if not isinstance(o, Literal) or not isinstance(o.value or str(o), str) or triple in self.indexed: return
+        if self.predicates is not None and p not in self.predicates: return
+        self.__update(triple, 1)
+
+    # Quita del índice una tripleta indexada.
+    def remove(self, triple):
+        if triple in self.indexed: self.__update(triple, -1)
+
+    def __update(self, triple, sign):
+        s, p, o = triple
+        doc = (s, p)
+        terms = Counter(tokenize(str(o)))
+        if sign > 0: self.indexed.add(triple)
+        else: self.indexed.discard(triple)
+        if self.lengths[doc] == 0: self.fieldDocs[p] += 1
+        for term, frequency in terms.items():
+            frequency = self.postings[term].get(doc, 0) + sign * frequency
+            if frequency > 0: self.postings[term][doc] = frequency
+            else: self.postings[term].pop(doc, None)
+        length = sum(terms.values())
+        self.lengths[doc] += sign * length
+        self.fieldLengths[p] += sign * length
+        if self.lengths[doc] <= 0:
+            del self.lengths[doc]
+            self.fieldDocs[p] -= 1
+        self.cache.clear()
+
+    def __onAdded(self, event):
+        self.add(event.triple)
+
+    # Las tripletas borradas con un patrón (alguna parte None) no se pueden quitar una a una, el índice se reconstruye
+    # en la siguiente búsqueda.
+    def __onRemoved(self, event):
+        if any(term is None for term in event.triple): self.stale = True
+        else: self.remove(event.triple)
+
+    # Busca los recursos que contienen algún término de la consulta, en el predicado indicado o en todos.
+    # Devuelve la lista de pares (recurso, relevancia) ordenada de mayor a menor relevancia. Con todos los predicados,
+    # la relevancia de un recurso es la suma de su relevancia BM25 en cada predicado.
+    def search(self, query, predicate=None, limit=None):
+        if self.stale: self.rebuild()
+        key = (query, predicate)
+        if key not in self.cache:
+            scores = Counter()
+            for term in set(tokenize(query)):
+                docs = [(doc, frequency) for doc, frequency in self.postings.get(term, {}).items() if predicate is None or doc[1] == predicate]
+                df = Counter(doc[1] for doc, _ in docs) # Documentos de cada predicado que contienen el término
+                for (subject, field), frequency in docs:
+                    n = self.fieldDocs[field]
+                    idf = math.log(1 + (n - df[field] + 0.5) / (df[field] + 0.5))
+                    norm = 1 - self.b + self.b * self.lengths[(subject, field)] / (self.fieldLengths[field] / n)
+                    scores[subject] += idf * frequency * (self.k1 + 1) / (frequency + self.k1 * norm)
+            if len(self.cache) >= CACHE_SIZE: self.cache.clear()
+            self.cache[key] = scores.most_common(), scores
+        return self.cache[key][0][:limit]
+
+    # Relevancia de un recurso para una consulta (0 si no la cumple).
+    def score(self, subject, query, predicate=None):
+        self.search(query, predicate)
+        return self.cache[(query, predicate)][1].get(subject, 0.0)
+
+# ------------------------------------------------------
+# Integración con las consultas SPARQL de RDFLIB.
+# ------------------------------------------------------
+
+# Elementos de una lista de la consulta, como (?x ?score), que RDFLIB representa con tripletas rdf:first/rdf:rest.
+def __listItems(node, firsts, rests, used):
+    if not (isinstance(node, BNode) and node in firsts): return [node]
+    items = []
+    while node in firsts:
+        used.add(node)
+        items.append(firsts[node])
+        node = rests.get(node)
+    return items
+
+# Resuelve las búsquedas de texto de un patrón una a una, asignando en cada resultado el recurso y su relevancia a las
+# variables de la búsqueda, y luego el resto del patrón con las variables ya asignadas.
+def __evalSearches(ctx, index, searches, rest):
+    if not searches:
+        yield from evalBGP(ctx, rest)
+        return
+    (variables, arguments), searches = searches[0], searches[1:]
+    predicate = arguments[0] if isinstance(arguments[0], URIRef) else None
+    texts = [argument for argument in arguments if isinstance(argument, Literal) and isinstance(argument.value, str)]
+    limits = [argument.value for argument in arguments if isinstance(argument, Literal) and isinstance(argument.value, int)]
+    if not texts: return
+    hits = index.search(str(texts[0]), predicate, limits[0] if limits else None)
+    subject = ctx[variables[0]]
+    if subject is not None: # Recurso ya asignado (por ejemplo, en un OPTIONAL): se consulta su relevancia sin recorrer los resultados
+        score = index.score(subject, str(texts[0]), predicate)
+        hits = [(subject, score)] if score and (not limits or (subject, score) in hits) else []
+    for resource, score in hits:
+        child = ctx.push()
+        if subject is None: child[variables[0]] = resource
+        if len(variables) > 1: child[variables[1]] = Literal(score)
+        yield from __evalSearches(child, index, searches, rest)
+
+# Evaluación de los patrones (BGP) que contienen text:query. Los demás patrones los evalúa RDFLIB normalmente.
+def textQueryEval(ctx, part):
+    if part.name != 'BGP' or not any(p == TEXT.query for _, p, _ in part.triples): raise NotImplementedError()
+    index = INDEXES.get(ctx.graph.store) if ctx.graph is not None else None
+    if index is None: raise NotImplementedError() # Grafo sin índice de texto
+    firsts = {s: o for s, p, o in part.triples if p == RDF.first}
+    rests = {s: o for s, p, o in part.triples if p == RDF.rest}
+    used, searches = set(), []
+    for s, p, o in part.triples:
+        if p == TEXT.query:
+            searches.append((__listItems(s, firsts, rests, used), __listItems(o, firsts, rests, used)))
+    rest = [triple for triple in part.triples if triple[1] != TEXT.query and triple[0] not in used]
+    return __evalSearches(ctx, index, searches, rest)
+
+# Función text:score(?x, 'consulta') o text:score(?x, 'consulta', predicado).
+def textScore(expression, ctx):
+    arguments = [value(ctx, argument, variables=True) for argument in expression.expr]
+    index = INDEXES.get(ctx.ctx.graph.store)
+    if index is None or arguments[0] is None: return Literal(0.0)
+    return Literal(index.score(arguments[0], str(arguments[1]), arguments[2] if len(arguments) > 2 else None))
+
+CUSTOM_EVALS['textQuery'] = textQueryEval
+register_custom_function(TEXT.score, textScore, override=True, raw=True)